@@ -0,0 +1,216 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict
+
+from metrics import ADMISSION_REJECTIONS, ADMISSION_REQUESTS
+
+
+class Rejected(Exception):
+    """A request turned away before doing any work"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self) -> str:
+        """Whole seconds for the Retry-After header, at least 1"""
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class Overloaded(Rejected):
+    """The server is at capacity (queue full or queue wait deadline passed)"""
+
+
+class RateLimited(Rejected):
+    """The caller exceeded its request rate"""
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue for one event loop.
+
+    Up to `max_concurrent` requests run at once; up to `max_queue` more wait
+    in FIFO order for at most `queue_timeout` seconds. Requests arriving to a
+    full queue, or still waiting at their deadline, are rejected with
+    Overloaded at once instead of piling up behind the LLM.
+
+    Args:
+        max_concurrent: Requests allowed to run at the same time
+        max_queue: Requests allowed to wait for a slot
+        queue_timeout: Longest a request may wait for a slot, in seconds
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._wait_seconds = 0.0
+        self._service_seconds = 0.0
+        self._completed = 0
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a concurrency slot for the enclosed block, or raise Overloaded"""
+        queued_at = time.perf_counter()
+        await self._acquire()
+        started = time.perf_counter()
+        self._wait_seconds += started - queued_at
+        try:
+            yield
+        finally:
+            self._service_seconds += time.perf_counter() - started
+            self._completed += 1
+            self._release()
+
+    async def _acquire(self):
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            self._publish()
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_full += 1
+            ADMISSION_REJECTIONS.inc("queue_full")
+            raise Overloaded("Server is at capacity", self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot arrived just as the deadline passed; hand it on
+                self._release()
+            else:
+                waiter.cancel()
+            self.rejected_timeout += 1
+            ADMISSION_REJECTIONS.inc("timeout")
+            raise Overloaded("Timed out waiting for capacity", self.retry_after())
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+        self.admitted += 1
+
+    def _release(self):
+        """Pass the slot to the oldest live waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._publish()
+                return
+        self.in_flight -= 1
+        self._publish()
+
+    def _publish(self):
+        """Export the current slot holders and waiters"""
+        ADMISSION_REQUESTS.set(self.in_flight, "in_flight")
+        ADMISSION_REQUESTS.set(len(self._waiters), "waiting")
+
+    def retry_after(self) -> float:
+        """Rough seconds until a new request would be served"""
+        average = self._service_seconds / self._completed if self._completed else 1.0
+        return average * (len(self._waiters) + 1) / self.max_concurrent
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "queue_limit": self.max_queue,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_queue_wait_ms": 1000 * self._wait_seconds / self.admitted if self.admitted else 0.0,
+        }
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; each request takes `cost` (one by default)"""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def ready_in(self, now: float, cost: float = 1.0) -> float:
+        """Seconds until `cost` tokens are available (0 if they are now); takes nothing"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        cost = min(cost, self.burst)  # A request larger than the bucket waits for a full one
+        if self.tokens >= cost:
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Take `cost` tokens; returns 0 on success, else seconds until they are available"""
+        wait = self.ready_in(now, cost)
+        if not wait:
+            self.tokens -= min(cost, self.burst)
+        return wait
+
+
+class ClientRateLimiter:
+    """
+    Per-key token buckets (one per client address), bounded to the
+    `max_keys` most recently seen keys.
+
+    Args:
+        per_minute: Sustained requests allowed per key per minute
+        burst: Requests a key may make back to back
+        max_keys: Buckets kept; the least recently used are dropped beyond this
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, key: str):
+        """Count a request for key, raising RateLimited if it is over its rate"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst, now)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            wait = bucket.take(now)
+            if wait:
+                self.limited += 1
+        if wait:
+            ADMISSION_REJECTIONS.inc("rate_limited")
+            raise RateLimited("Too many requests from this client", wait)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tracked_keys": len(self._buckets), "rate_limited": self.limited}
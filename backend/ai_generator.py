@@ -1,5 +1,13 @@
+import time
 import anthropic
+import httpx
 from typing import List, Optional, Dict, Any
+from request_context import current_context, RequestCancelled
+from llm_scheduler import LLMScheduler
+from model_router import ModelRouter
+from metrics import time_stage
+from tracing import span
+from usage import TokenUsage
 
 class AIGenerator:
     """Handles interactions with Anthropic's Claude API for generating responses"""
@@ -29,9 +37,22 @@ All responses must be:
 Provide only the direct answer to what was asked.
 """
     
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(self, api_key: str, model: str, base_url: Optional[str] = None,
+                 scheduler: Optional[LLMScheduler] = None, router: Optional[ModelRouter] = None,
+                 http_client: Optional[httpx.Client] = None, client: Optional[anthropic.Anthropic] = None):
+        # base_url points the client at a compatible local server, e.g. for load tests.
+        # With a scheduler, it owns retries so backoff is shared across requests.
+        # http_client is a tuned, shared connection pool (see llm_connections.py).
+        # client replaces the Anthropic client outright, e.g. with a fake in tests
+        if client is None:
+            max_retries = 0 if scheduler is not None else anthropic.DEFAULT_MAX_RETRIES
+            client = anthropic.Anthropic(api_key=api_key, base_url=base_url, max_retries=max_retries,
+                                         http_client=http_client)
+        self.client = client
         self.model = model
+        self.scheduler = scheduler
+        # Picks a faster model per call when one is configured; otherwise `model` answers everything
+        self.router = router
         
         # Pre-build base API parameters
         self.base_params = {
@@ -43,7 +64,8 @@ Provide only the direct answer to what was asked.
     def generate_response(self, query: str,
                          conversation_history: Optional[str] = None,
                          tools: Optional[List] = None,
-                         tool_manager=None) -> str:
+                         tool_manager=None,
+                         context: Optional[str] = None) -> str:
         """
         Generate AI response with optional tool usage and conversation context.
         
@@ -52,39 +74,49 @@ Provide only the direct answer to what was asked.
             conversation_history: Previous messages for context
             tools: Available tools the AI can use
             tool_manager: Manager to execute tools
+            context: Pre-retrieved course material to answer from in a single call
             
         Returns:
             Generated response as string
         """
         
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history 
-            else self.SYSTEM_PROMPT
-        )
-        
-        # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content
-        }
-        
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
-        
-        # Get response from Claude
-        response = self.client.messages.create(**api_params)
-        
-        # Handle tool execution if needed
-        if response.stop_reason == "tool_use" and tool_manager:
-            return self._handle_tool_execution(response, api_params, tool_manager)
-        
-        # Return direct response
-        return response.content[0].text
+        with span("ai.generate_response", tools=bool(tools), has_context=bool(context)):
+            # Build system content efficiently - avoid string ops when possible
+            system_content = (
+                f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
+                if conversation_history 
+                else self.SYSTEM_PROMPT
+            )
+            
+            # Answering from pre-retrieved material is synthesis, like the call after a tool
+            model, route = self._route("llm_call", query, bool(conversation_history), synthesis=bool(context))
+            
+            # Inject pre-retrieved material ahead of the question
+            if context:
+                query = f"Course material retrieved for this question:\n<context>\n{context}\n</context>\n\n{query}"
+            
+            # Prepare API call parameters efficiently
+            api_params = {
+                **self.base_params,
+                "model": model,
+                "messages": [{"role": "user", "content": query}],
+                "system": system_content
+            }
+            
+            # Add tools if available
+            if tools:
+                api_params["tools"] = tools
+                api_params["tool_choice"] = {"type": "auto"}
+            
+            # Get response from Claude
+            response = self._create(api_params, "llm_call", route)
+            
+            # Handle tool execution if needed
+            if response.stop_reason == "tool_use" and tool_manager:
+                return self._handle_tool_execution(response, api_params, tool_manager)
+            
+            # Return direct response
+            return response.content[0].text
     
     def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager):
         """
@@ -108,6 +140,7 @@ Provide only the direct answer to what was asked.
         tool_results = []
         for content_block in initial_response.content:
             if content_block.type == "tool_use":
+                # ToolManager skips the tool if the request was cancelled meanwhile
                 tool_result = tool_manager.execute_tool(
                     content_block.name, 
                     **content_block.input
@@ -124,12 +157,84 @@ Provide only the direct answer to what was asked.
             messages.append({"role": "user", "content": tool_results})
         
         # Prepare final API call without tools
+        model, route = self._route("llm_followup", messages[0]["content"], synthesis=bool(tool_results))
         final_params = {
             **self.base_params,
+            "model": model,
             "messages": messages,
             "system": base_params["system"]
         }
         
         # Get final response
-        final_response = self.client.messages.create(**final_params)
-        return final_response.content[0].text
\ No newline at end of file
+        final_response = self._create(final_params, "llm_followup", route)
+        return final_response.content[0].text
+    
+    def _route(self, stage: str, query: str, has_history: bool = False, synthesis: bool = False):
+        """The (model, routing reason) for one call"""
+        if self.router is None:
+            return self.base_params["model"], "default"
+        return self.router.choose(stage, query, has_history, synthesis)
+    
+    def _create(self, params: Dict[str, Any], stage: str, route: str = "default"):
+        """
+        Make one API call on behalf of the current request.
+        
+        Requests that can be cancelled or have a deadline stream the response
+        instead, so a cancellation closes the connection mid-generation rather
+        than paying for the rest of the output; the deadline also bounds the
+        HTTP timeout. Other calls are a plain `messages.create`.
+        
+        With a scheduler, the call first waits its turn under the rate limits
+        (by the request's priority) and retryable failures are retried.
+        
+        Raises:
+            RequestCancelled: If the request is cancelled before or during the call
+            LLMRateLimited: If the scheduler finds no capacity for the call in time
+        """
+        request = current_context()
+        with span(f"llm.{stage}", model=params["model"], route=route) as llm_span:
+            if self.scheduler is not None:
+                response = self.scheduler.run(lambda: self._timed_call(params, stage), params, request)
+            else:
+                response = self._timed_call(params, stage)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                tokens = TokenUsage.from_response(usage)
+                if request is not None:
+                    request.record_usage(stage, tokens)
+                llm_span.set(input_tokens=tokens.input_tokens, output_tokens=tokens.output_tokens,
+                             cache_read_input_tokens=tokens.cache_read_input_tokens,
+                             stop_reason=response.stop_reason)
+            return response
+    
+    def _timed_call(self, params: Dict[str, Any], stage: str):
+        """`_call`, recording how long the model took for routing decisions"""
+        started = time.perf_counter()
+        response = self._call(params, stage)
+        if self.router is not None:
+            self.router.record(params["model"], time.perf_counter() - started)
+        return response
+    
+    def _call(self, params: Dict[str, Any], stage: str):
+        request = current_context()
+        if request is None or not request.interruptible:
+            with time_stage(stage):
+                return self.client.messages.create(**params)
+        
+        request.check(stage)
+        timeout = request.remaining()
+        if timeout is not None:
+            params = {**params, "timeout": timeout}
+        try:
+            with time_stage(stage), self.client.messages.stream(**params) as stream:
+                with request.on_cancel(stream.close):
+                    for _ in stream:
+                        request.check(stage)
+                    return stream.get_final_message()
+        except RequestCancelled:
+            raise
+        except Exception:
+            # Closing the stream from another thread surfaces as a read error;
+            # a timeout at the deadline likewise means the request ran out of time
+            request.check(stage)
+            raise
\ No newline at end of file
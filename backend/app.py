@@ -1,16 +1,25 @@
 import warnings
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
-from fastapi import FastAPI, HTTPException
+import tempfile
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import hmac
 import os
+import time
+import asyncio
 
 from config import config
 from rag_system import RAGSystem
+from metrics import REGISTRY
+from request_context import RequestCancelled, RequestContext
+from admission import AdmissionController, ClientRateLimiter, Overloaded, Rejected
+from ingestion import BackgroundIngestor, IngestionJobQueue, IngestQueueFull, check_readiness
 
 # Initialize FastAPI app
 app = FastAPI(title="Course Materials RAG System", root_path="")
@@ -33,6 +42,20 @@ app.add_middleware(
 
 # Initialize RAG system
 rag_system = RAGSystem(config)
+ingestor = BackgroundIngestor(rag_system.add_course_folder)
+ingest_jobs = IngestionJobQueue(
+    rag_system.add_course_document, config.INGEST_JOB_WORKERS, config.INGEST_QUEUE_SIZE
+)
+
+# Load shedding in front of the query pipeline
+admission = AdmissionController(
+    config.MAX_CONCURRENT_QUERIES, config.QUERY_QUEUE_SIZE, config.QUERY_QUEUE_TIMEOUT
+)
+rate_limiter = ClientRateLimiter(config.CLIENT_QUERIES_PER_MINUTE, config.CLIENT_QUERY_BURST)
+
+# Document types accepted for ingestion, as in add_course_folder
+SUPPORTED_UPLOADS = ('.pdf', '.docx', '.txt')
+INGEST_RETRY_AFTER_SECONDS = 5
 
 # Pydantic models for request/response
 class QueryRequest(BaseModel):
@@ -58,25 +81,111 @@ class CourseStats(BaseModel):
     total_courses: int
     course_titles: List[str]
 
+class RuntimeStats(BaseModel):
+    """Response model for query and session counters"""
+    queries_executed: int
+    queries_coalesced: int
+    queries_in_flight: int
+    sessions_live: int
+    sessions_evicted: int
+    sessions_expired: int
+    session_bytes: int
+    executors: Dict[str, Dict[str, float]]  # Per-stage pool stats, see executors.py
+    cancellations: Dict[str, Any]           # Requests abandoned on disconnect or deadline
+    llm_scheduler: Dict[str, Any]           # LLM queue depth, waits and retries, see llm_scheduler.py
+    model_routing: Optional[Dict[str, Any]]  # Model choices and per-model latency, see model_router.py
+    llm_connections: Dict[str, Any]         # LLM API connection reuse and warm-up, see llm_connections.py
+    admission: Dict[str, float]             # Query concurrency limiter and rate limiting
+
+class TokenUsageStats(BaseModel):
+    """Billed tokens and estimated cost of one or more LLM calls"""
+    input_tokens: int
+    output_tokens: int
+    cache_creation_input_tokens: int
+    cache_read_input_tokens: int
+    calls: int
+    cost_usd: float
+
+class UsageReport(BaseModel):
+    """Response model for token usage accounting"""
+    requests: int
+    total: TokenUsageStats
+    stages: Dict[str, TokenUsageStats]        # "llm_call" and "llm_followup"
+    top_sessions: Dict[str, TokenUsageStats]  # Sessions that used the most tokens
+    tracked_sessions: int
+    pending_records: int
+    dropped_records: int
+
+class IngestJobStatus(BaseModel):
+    """Status of one uploaded document"""
+    job_id: str
+    file_name: str
+    status: str
+    course_title: Optional[str] = None
+    chunks: int
+    error: Optional[str] = None
+    queued_at: float
+    queue_wait_ms: float
+    processing_ms: Optional[float] = None
+
+class IngestResponse(BaseModel):
+    """Response model for document uploads"""
+    jobs: List[IngestJobStatus]
+
 # API Endpoints
 
 @app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+async def query_documents(request: QueryRequest, http_request: Request):
     """Process a query and return response with sources"""
+    # Shed load before doing any work: 429 for a client over its rate,
+    # 503 when the wait queue is full or the wait deadline passes, and also
+    # when the LLM's own rate limits leave no capacity (LLMRateLimited)
+    client = http_request.client.host if http_request.client else "unknown"
+    # The deadline covers queue wait too; the context is cancelled if the client leaves
+    context = RequestContext(deadline=time.monotonic() + config.QUERY_TIMEOUT_SECONDS, cancellable=True)
+    try:
+        # Keyed on the address: session ids come from the client, so a fresh one per request would evade the limit
+        rate_limiter.check(client)
+        async with admission.admit():
+            watcher = asyncio.create_task(watch_disconnect(http_request, context))
+            try:
+                return await process_query(request, context)
+            finally:
+                watcher.cancel()
+    except Rejected as e:
+        raise HTTPException(
+            status_code=503 if isinstance(e, Overloaded) else 429,
+            detail=str(e),
+            headers={"Retry-After": e.retry_after_header}
+        )
+    except RequestCancelled as e:
+        # 499 is only seen in logs: the client that disconnected gets no response
+        raise HTTPException(status_code=504 if e.reason == "deadline_exceeded" else 499, detail=str(e))
+
+async def watch_disconnect(http_request: Request, context: RequestContext):
+    """Cancel the request's remaining work once its client disconnects"""
+    while not await http_request.is_disconnected():
+        await asyncio.sleep(config.DISCONNECT_POLL_SECONDS)
+    context.cancel("client_disconnected")
+
+async def process_query(request: QueryRequest, context: RequestContext) -> QueryResponse:
     try:
         # Create session if not provided
         session_id = request.session_id
         if not session_id:
-            session_id = rag_system.session_manager.create_session()
+            # A blocking database write with the sqlite session backend
+            session_id = await asyncio.to_thread(rag_system.session_manager.create_session)
         
         # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        answer, sources = await rag_system.aquery(request.query, session_id, context)
         
         return QueryResponse(
             answer=answer,
             sources=sources,
             session_id=session_id
         )
+    except (RequestCancelled, Rejected):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -92,17 +201,131 @@ async def get_course_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stats", response_model=RuntimeStats)
+async def get_runtime_stats():
+    """Get query and session counters for this worker"""
+    stats = await asyncio.to_thread(rag_system.get_runtime_stats)
+    return RuntimeStats(**stats, admission={**admission.get_stats(), **rate_limiter.get_stats()})
+
+def require_admin(http_request: Request):
+    """Allow admin endpoints only with `Authorization: Bearer <ADMIN_TOKEN>`; without a token they are off"""
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = http_request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Admin token required", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/api/admin/usage", response_model=UsageReport, dependencies=[Depends(require_admin)])
+async def get_usage(top_sessions: int = 10):
+    """Token usage and cost by stage, and the heaviest sessions, for this worker"""
+    return UsageReport(**rag_system.usage_ledger.get_stats(top_sessions))
+
+@app.get("/api/admin/usage/{session_id}", response_model=TokenUsageStats, dependencies=[Depends(require_admin)])
+async def get_session_usage(session_id: str):
+    """Token usage and cost of one session"""
+    usage = rag_system.usage_ledger.get_session(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for session '{session_id}'")
+    return TokenUsageStats(**usage)
+
+def save_upload(file_name: str, data: bytes) -> str:
+    """Write an upload to its own temporary directory, keeping its name as the title fallback"""
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(tempfile.mkdtemp(dir=config.UPLOAD_DIR), file_name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+def discard_uploads(paths: List[str]):
+    for path in paths:
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            pass
+
+@app.post("/api/ingest", response_model=IngestResponse, status_code=202)
+async def ingest_documents(files: List[UploadFile] = File(...)):
+    """Queue uploaded course documents for ingestion and return their job ids"""
+    queue_full = HTTPException(
+        status_code=429,
+        detail="Ingestion queue is full, retry later",
+        headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)}
+    )
+    # Refuse before reading any upload if the queue can't take them all
+    if not ingest_jobs.has_room(len(files)):
+        raise queue_full
+    
+    saved = []
+    try:
+        for upload in files:
+            file_name = os.path.basename(upload.filename or "")
+            if not file_name.lower().endswith(SUPPORTED_UPLOADS):
+                raise HTTPException(status_code=400, detail=f"Unsupported file type: '{file_name}'")
+            data = await upload.read(config.MAX_UPLOAD_BYTES + 1)
+            if len(data) > config.MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"'{file_name}' is too large")
+            path = await asyncio.to_thread(save_upload, file_name, data)
+            saved.append((file_name, path))
+        jobs = ingest_jobs.submit(saved)
+    except IngestQueueFull:
+        await asyncio.to_thread(discard_uploads, [path for _, path in saved])
+        raise queue_full
+    except BaseException:
+        await asyncio.to_thread(discard_uploads, [path for _, path in saved])
+        raise
+    
+    return IngestResponse(jobs=[IngestJobStatus(**job.to_dict()) for job in jobs])
+
+@app.get("/api/ingest/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(job_id: str):
+    """Get the status, chunk count and timings of an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'")
+    return IngestJobStatus(**job)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Per-stage latency histograms and error counters in the Prometheus text format"""
+    body = await asyncio.to_thread(REGISTRY.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: enough content is indexed to answer queries (see READY_* config)"""
+    course_count = await asyncio.to_thread(rag_system.vector_store.get_course_count)
+    ready, reasons = check_readiness(
+        ingestor.progress, course_count, config.READY_MIN_COURSES, config.READY_REQUIRE_INGESTION
+    )
+    body = {
+        "ready": ready,
+        "reasons": reasons,
+        "courses": course_count,
+        "ingestion": ingestor.progress.snapshot(),
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
 @app.on_event("startup")
 async def startup_event():
-    """Load initial documents on startup"""
+    """Start metrics and usage flushing, warm LLM connections, and load initial documents in the background"""
+    REGISTRY.share_between_processes(config.METRICS_DIR, config.METRICS_FLUSH_SECONDS)
+    rag_system.usage_ledger.start_flusher(config.USAGE_FLUSH_SECONDS)
+    rag_system.llm_connections.start_warmer()
     docs_path = "../docs"
-    if os.path.exists(docs_path):
-        print("Loading initial documents...")
-        try:
-            courses, chunks = rag_system.add_course_folder(docs_path, clear_existing=False)
-            print(f"Loaded {courses} courses with {chunks} chunks")
-        except Exception as e:
-            print(f"Error loading documents: {e}")
+    print("Loading initial documents in the background...")
+    ingestor.start(docs_path, clear_existing=False)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Write out usage records still buffered and close LLM connections"""
+    await asyncio.to_thread(rag_system.usage_ledger.flush)
+    rag_system.llm_connections.close()
 
 # Custom static file handler with no-cache headers for development
 from fastapi.staticfiles import StaticFiles
@@ -0,0 +1 @@
+"""Benchmarks for the RAG backend. Run from the backend directory, e.g. `python -m benchmarks.bench_query_modes`"""
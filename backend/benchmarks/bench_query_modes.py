@@ -0,0 +1,90 @@
+"""
+Latency benchmark comparing the tool-based and routed query pipelines.
+
+Both pipelines run against the same ChromaDB index and an in-process fake LLM
+with a fixed per-call latency, so the difference reflects LLM round trips plus
+local routing and retrieval overhead.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_query_modes --llm-latency 0.3 --repeat 3
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+from config import Config
+from rag_system import RAGSystem
+from benchmarks.fake_llm import FakeAnthropicClient
+
+DOCS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
+
+# (query, expects course content)
+QUERIES = [
+    ("What does lesson 2 of the MCP course cover?", True),
+    ("How does Chroma handle query expansion in Advanced Retrieval for AI?", True),
+    ("Who is the instructor of the prompt compression course?", True),
+    ("Explain how computer use works with Claude", True),
+    ("What is the capital of France?", False),
+    ("How do I reverse a list in Python?", False),
+    ("What is the difference between TCP and UDP?", False),
+    ("Give me a haiku about autumn", False),
+]
+
+COURSE_QUERIES = {query for query, is_course in QUERIES if is_course}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(mode: str, chroma_path: str, embedding_model: str, latency: float, repeat: int) -> Dict:
+    config = Config(CHROMA_PATH=chroma_path, EMBEDDING_MODEL=embedding_model, QUERY_MODE=mode)
+    rag = RAGSystem(config)
+    rag.add_course_folder(DOCS_PATH)
+
+    client = FakeAnthropicClient(latency, wants_tool=lambda prompt: any(q in prompt for q in COURSE_QUERIES))
+    rag.ai_generator.client = client
+
+    timings = []
+    for _ in range(repeat):
+        for query, _ in QUERIES:
+            start = time.perf_counter()
+            rag.query(query)
+            timings.append(time.perf_counter() - start)
+
+    return {
+        "mode": mode,
+        "queries": len(timings),
+        "llm_calls": client.messages.calls,
+        "mean_ms": statistics.mean(timings) * 1000,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p95_ms": percentile(timings, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Seconds per fake messages.create call")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the query set")
+    parser.add_argument("--embedding-model", default="hashing", help="Embedding model ('hashing' runs offline)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as chroma_path:
+        results = [
+            run_mode(mode, chroma_path, args.embedding_model, args.llm_latency, args.repeat)
+            for mode in ("tools", "routed")
+        ]
+
+    print(f"{'mode':<8} {'queries':>8} {'llm calls':>10} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['queries']:>8} {r['llm_calls']:>10} "
+              f"{r['mean_ms']:>10.1f} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Retrieval benchmark over synthetic corpora of increasing size.
+
+For each scale (number of courses) a fresh process generates a corpus,
+ingests it with DocumentProcessor and VectorStore, and measures:
+
+- ingestion throughput (parsing and indexing, chunks/s and courses/s)
+- index size on disk and process RSS growth
+- search latency percentiles unfiltered, with `course_name`, and with
+  `course_name` plus `lesson_number`, with the share of queries whose top
+  result comes from the probed lesson
+
+Results are written as JSON. With --baseline, each metric is compared against
+a stored run and the script exits with status 1 if any got worse by more than
+--tolerance.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_retrieval --scales 10 100 1000 --output results.json
+    python -m benchmarks.bench_retrieval --scales 10 100 --baseline results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+from config import config
+from document_processor import DocumentProcessor
+from vector_store import HASHING_EMBEDDING_MODEL, VectorStore
+from benchmarks.synthetic_corpus import write_corpus
+
+SEARCH_VARIANTS = ("unfiltered", "course", "course_lesson")
+
+# Metric path -> True if higher is better
+COMPARED_METRICS = {
+    "ingest.chunks_per_second": True,
+    "ingest.courses_per_second": True,
+    "index.disk_mb": False,
+    "index.rss_growth_mb": False,
+    **{f"search.{variant}.{stat}": False for variant in SEARCH_VARIANTS for stat in ("p50_ms", "p95_ms", "p99_ms")},
+}
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), falling back to the peak elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def directory_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1e6
+
+
+def latency_stats(seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+
+    def at(fraction):
+        return 1000 * ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {"p50_ms": round(at(0.50), 3), "p95_ms": round(at(0.95), 3), "p99_ms": round(at(0.99), 3),
+            "mean_ms": round(1000 * statistics.fmean(ordered), 3)}
+
+
+def run_scale(courses: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Generate, ingest and search one corpus in this process"""
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = os.path.join(tmp, "corpus")
+        probes = write_corpus(corpus, courses, args.lessons, args.words, args.seed)
+
+        baseline_rss = rss_mb()
+        processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
+        store = VectorStore(os.path.join(tmp, "chroma"), args.embedding_model, config.MAX_RESULTS)
+
+        parse_seconds = index_seconds = 0.0
+        chunks = 0
+        for name in sorted(os.listdir(corpus)):
+            started = time.perf_counter()
+            course, course_chunks = processor.process_course_document(os.path.join(corpus, name))
+            parsed = time.perf_counter()
+            store.add_course_metadata(course)
+            store.add_course_content(course_chunks)
+            parse_seconds += parsed - started
+            index_seconds += time.perf_counter() - parsed
+            chunks += len(course_chunks)
+        ingest_seconds = parse_seconds + index_seconds
+
+        rng = random.Random(args.seed)
+        sample = [rng.choice(probes) for _ in range(args.queries)]
+        search = {}
+        for variant in SEARCH_VARIANTS:
+            timings, hits = [], 0
+            for probe in sample:
+                kwargs = {}
+                if variant != "unfiltered":
+                    kwargs["course_name"] = probe.course_title
+                if variant == "course_lesson":
+                    kwargs["lesson_number"] = probe.lesson_number
+                started = time.perf_counter()
+                results = store.search(probe.query, **kwargs)
+                timings.append(time.perf_counter() - started)
+                top = results.metadata[0] if results.metadata else {}
+                hits += (top.get("course_title"), top.get("lesson_number")) == (probe.course_title, probe.lesson_number)
+            search[variant] = {**latency_stats(timings), "top1_hit_rate": round(hits / len(sample), 3)}
+
+        return {
+            "courses": courses,
+            "chunks": chunks,
+            "ingest": {
+                "seconds": round(ingest_seconds, 3),
+                "parse_seconds": round(parse_seconds, 3),
+                "index_seconds": round(index_seconds, 3),
+                "chunks_per_second": round(chunks / ingest_seconds, 1),
+                "courses_per_second": round(courses / ingest_seconds, 2),
+            },
+            "index": {
+                "disk_mb": round(directory_mb(os.path.join(tmp, "chroma")), 2),
+                "rss_growth_mb": round(rss_mb() - baseline_rss, 2),
+            },
+            "search": search,
+        }
+
+
+def _child(courses: int, args: argparse.Namespace, results):
+    results.put(run_scale(courses, args))
+
+
+def run_isolated(courses: int, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run one scale in a fresh process so memory numbers don't include earlier scales"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_child, args=(courses, args, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def metric(result: Dict[str, Any], path: str) -> float:
+    value = result
+    for key in path.split("."):
+        value = value[key]
+    return value
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[Tuple[str, str, float, float]]:
+    """
+    Metrics that got worse than the baseline by more than `tolerance` (a fraction).
+
+    Returns:
+        List of (scale, metric, baseline value, current value)
+    """
+    regressions = []
+    for scale, result in current["results"].items():
+        previous = baseline.get("results", {}).get(scale)
+        if previous is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            try:
+                old, new = metric(previous, path), metric(result, path)
+            except KeyError:
+                continue
+            if old <= 0:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append((scale, path, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 1000], help="Corpus sizes in courses")
+    parser.add_argument("--lessons", type=int, default=4, help="Lessons per course")
+    parser.add_argument("--words", type=int, default=300, help="Words per lesson")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per variant")
+    parser.add_argument("--embedding-model", default=HASHING_EMBEDDING_MODEL,
+                        help="Embedding model; the default needs no download")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count()},
+        "results": {},
+    }
+    print(f"{'courses':>8} {'chunks':>8} {'chunks/s':>10} {'disk MB':>9} {'RSS MB':>8} "
+          + " ".join(f"{variant + ' p50/p95':>22}" for variant in SEARCH_VARIANTS))
+    for courses in args.scales:
+        result = run_isolated(courses, args)
+        report["results"][str(courses)] = result
+        latencies = " ".join(
+            f"{result['search'][v]['p50_ms']:>10.2f}/{result['search'][v]['p95_ms']:<11.2f}" for v in SEARCH_VARIANTS
+        )
+        print(f"{courses:>8} {result['chunks']:>8} {result['ingest']['chunks_per_second']:>10.0f} "
+              f"{result['index']['disk_mb']:>9.1f} {result['index']['rss_growth_mb']:>8.1f} {latencies}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for scale, path, old, new in regressions:
+            print(f"REGRESSION {scale} courses {path}: {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
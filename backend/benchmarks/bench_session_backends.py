@@ -0,0 +1,76 @@
+"""
+Throughput benchmark for session backends under concurrent worker processes.
+
+Each worker process simulates /api/query traffic against its own store
+instance: every "request" reads a session's history and appends one exchange,
+and one request in `--new-every` starts a new session. The in-memory backend
+is per process, so its numbers are a ceiling; the SQLite backend is shared by
+all workers, the way several uvicorn workers would share it.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_session_backends --workers 1 2 4 8 --duration 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from session_store import Message, create_session_store
+
+
+def worker(backend: str, db_path: str, duration: float, new_every: int, results):
+    store = create_session_store(backend, max_messages=4, max_sessions=100000, ttl_seconds=3600, db_path=db_path)
+    sessions = []
+    ops = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        if not sessions or random.randrange(new_every) == 0:
+            session_id = f"session_{uuid.uuid4().hex}"
+            store.create(session_id)
+            sessions.append(session_id)
+            ops += 1
+        session_id = random.choice(sessions)
+        store.get_messages(session_id)
+        store.append(session_id, Message("user", "What does lesson 3 cover?"))
+        store.append(session_id, Message("assistant", "Lesson 3 covers tool use. " * 20))
+        ops += 3
+    results.put(ops)
+
+
+def run(backend: str, workers: int, duration: float, new_every: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "sessions.db")
+        create_session_store(backend, 4, 100000, 3600, db_path)  # Create schema once up front
+        results = multiprocessing.Queue()
+        procs = [
+            multiprocessing.Process(target=worker, args=(backend, db_path, duration, new_every, results))
+            for _ in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        total = sum(results.get() for _ in procs)
+        for proc in procs:
+            proc.join()
+    return total / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker process counts")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per run")
+    parser.add_argument("--new-every", type=int, default=4, help="One request in N starts a new session")
+    parser.add_argument("--backends", nargs="+", default=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'workers':>8} {'ops/s':>12} {'ops/s/worker':>14}")
+    for backend in args.backends:
+        for workers in args.workers:
+            rate = run(backend, workers, args.duration, args.new_every)
+            print(f"{backend:<8} {workers:>8} {rate:>12.0f} {rate / workers:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
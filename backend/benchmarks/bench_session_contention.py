@@ -0,0 +1,65 @@
+"""
+Contention benchmark for the thread-safe in-memory session store.
+
+Threads hammer a shared SessionManager with the per-request pattern (read
+history, append an exchange) over a pool of sessions. Comparing one stripe
+(effectively a single lock for message access) with many stripes shows how
+much lock striping buys as thread count grows.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_session_contention --threads 1 4 16 --stripes 1 64
+"""
+import argparse
+import random
+import threading
+import time
+
+from session_manager import SessionManager
+from session_store import InMemorySessionStore
+
+
+def run(threads: int, stripes: int, sessions: int, duration: float) -> float:
+    store = InMemorySessionStore(max_messages=4, max_sessions=sessions * 2, stripes=stripes)
+    manager = SessionManager(max_history=2, store=store)
+    assert manager.sessions is store
+    session_ids = [manager.create_session() for _ in range(sessions)]
+    counts = [0] * threads
+    stop = threading.Event()
+
+    def worker(index: int):
+        rng = random.Random(index)
+        ops = 0
+        while not stop.is_set():
+            session_id = rng.choice(session_ids)
+            manager.get_conversation_history(session_id)
+            manager.add_exchange(session_id, "What does lesson 3 cover?", "Lesson 3 covers tool use.")
+            ops += 2
+        counts[index] = ops
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for w in workers:
+        w.start()
+    time.sleep(duration)
+    stop.set()
+    for w in workers:
+        w.join()
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--stripes", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--sessions", type=int, default=1000, help="Sessions shared by all threads")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per run")
+    args = parser.parse_args()
+
+    print(f"{'stripes':>8} {'threads':>8} {'ops/s':>12}")
+    for stripes in args.stripes:
+        for threads in args.threads:
+            rate = run(threads, stripes, args.sessions, args.duration)
+            print(f"{stripes:>8} {threads:>8} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Soak benchmark for the bounded session store.
+
+Creates sessions the way session-less /api/query traffic does (one session and
+one exchange per request) and samples resident memory as it goes. With eviction
+working, RSS flattens once MAX_SESSIONS is reached instead of growing with the
+number of sessions created.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_session_soak --sessions 2000000 --max-sessions 10000
+"""
+import argparse
+import resource
+import time
+
+from session_manager import SessionManager
+from session_store import InMemorySessionStore
+
+
+def rss_mb() -> float:
+    """Current resident set size in MiB (peak RSS where /proc is unavailable)"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1_000_000, help="Sessions to create")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="Store capacity")
+    parser.add_argument("--answer-chars", type=int, default=1200, help="Length of each stored answer")
+    parser.add_argument("--samples", type=int, default=10, help="RSS samples over the run")
+    args = parser.parse_args()
+
+    store = InMemorySessionStore(max_messages=4, max_sessions=args.max_sessions)
+    manager = SessionManager(max_history=2, store=store)
+    answer = "x" * args.answer_chars
+    every = max(1, args.sessions // args.samples)
+
+    print(f"{'created':>10} {'live':>8} {'evicted':>10} {'store MiB':>10} {'RSS MiB':>9} {'ops/s':>10}")
+    start = time.perf_counter()
+    for i in range(1, args.sessions + 1):
+        session_id = manager.create_session()
+        # Distinct strings so memory isn't shared between sessions
+        manager.add_exchange(session_id, f"question {i}", answer + str(i))
+        if i % every == 0:
+            stats = manager.get_stats()
+            elapsed = time.perf_counter() - start
+            print(f"{i:>10} {stats['live_sessions']:>8} {stats['evicted_sessions']:>10} "
+                  f"{stats['approx_bytes'] / 2**20:>10.1f} {rss_mb():>9.1f} {i / elapsed:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""
+Recall-versus-latency evaluation of retrieval configurations.
+
+Builds a golden set from the transcripts in docs/: each question is a short
+passage taken from inside one sentence of a lesson, and its expected answer is
+that (course, lesson) and whichever chunks contain the passage under the
+configuration being evaluated. These are known-item queries, not paraphrases,
+so absolute recall is optimistic; they are meant for comparing configurations.
+
+Every combination of embedding model, CHUNK_SIZE and CHUNK_OVERLAP is indexed
+once, then searched with each MAX_RESULTS value. For each combination the
+report gives chunk recall@k, lesson recall@k, chunk MRR, search latency and
+index size, and recommends the fastest configuration whose chunk recall meets
+--min-recall.
+
+Usage (from the backend directory):
+    python -m benchmarks.eval_retrieval --chunk-sizes 400 800 1200 --overlaps 0 100 --max-results 3 5 10
+    python -m benchmarks.eval_retrieval --golden-out golden.json
+    python -m benchmarks.eval_retrieval --golden golden.json --embedding-models hashing all-MiniLM-L6-v2
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import config
+from document_processor import SENTENCE_ENDINGS, DocumentProcessor
+from models import CourseChunk
+from vector_store import HASHING_EMBEDDING_MODEL, VectorStore
+from benchmarks.bench_retrieval import directory_mb, latency_stats
+
+DOCS_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "docs")
+
+
+@dataclass
+class GoldenQuestion:
+    question: str
+    course_title: str
+    lesson_number: int
+    passage: str  # Text the expected chunk must contain
+
+
+def _course_files(docs_path: str) -> List[str]:
+    return [os.path.join(docs_path, name) for name in sorted(os.listdir(docs_path))
+            if name.lower().endswith((".txt", ".pdf", ".docx"))]
+
+
+def build_golden_set(docs_path: str, per_lesson: int = 5, words: Tuple[int, int] = (8, 12),
+                     seed: int = 0) -> List[GoldenQuestion]:
+    """
+    Sample `per_lesson` passages of 8-12 words from inside sentences of every lesson.
+
+    Passages never cross a sentence boundary, so under sentence-based chunking
+    each is contained in at least one chunk of its lesson.
+    """
+    rng = random.Random(seed)
+    # One chunk per lesson: the whole lesson text
+    processor = DocumentProcessor(chunk_size=10 ** 9, chunk_overlap=0)
+    golden = []
+    for path in _course_files(docs_path):
+        course, lessons = processor.process_course_document(path)
+        for lesson in lessons:
+            text = lesson.content.split(" content: ", 1)[-1]
+            sentences = [s.split() for s in SENTENCE_ENDINGS.split(text)]
+            candidates = [s for s in sentences if len(s) >= words[1] + 4]
+            for sentence in rng.sample(candidates, min(per_lesson, len(candidates))):
+                length = rng.randint(*words)
+                start = rng.randint(1, len(sentence) - length - 1)
+                passage = " ".join(sentence[start:start + length])
+                golden.append(GoldenQuestion(passage, course.title, lesson.lesson_number, passage))
+    return golden
+
+
+def relevant_chunks(chunks: List[CourseChunk], golden: List[GoldenQuestion]) -> List[Set[Tuple[str, int]]]:
+    """For each question, the (course, chunk_index) pairs of chunks containing its passage"""
+    by_lesson: Dict[Tuple[str, int], List[CourseChunk]] = {}
+    for chunk in chunks:
+        by_lesson.setdefault((chunk.course_title, chunk.lesson_number), []).append(chunk)
+    return [
+        {(chunk.course_title, chunk.chunk_index)
+         for chunk in by_lesson.get((question.course_title, question.lesson_number), [])
+         if question.passage in chunk.content}
+        for question in golden
+    ]
+
+
+def evaluate(golden: List[GoldenQuestion], embedding_model: str, chunk_size: int, chunk_overlap: int,
+             max_results: List[int], docs_path: str) -> List[Dict[str, Any]]:
+    """Index docs once with one chunking and score every max_results value"""
+    processor = DocumentProcessor(chunk_size, chunk_overlap)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = VectorStore(os.path.join(tmp, "chroma"), embedding_model, max(max_results))
+        chunks = []
+        started = time.perf_counter()
+        for path in _course_files(docs_path):
+            course, course_chunks = processor.process_course_document(path)
+            store.add_course_metadata(course)
+            store.add_course_content(course_chunks)
+            chunks.extend(course_chunks)
+        index_seconds = time.perf_counter() - started
+        disk_mb = directory_mb(os.path.join(tmp, "chroma"))
+        relevant = relevant_chunks(chunks, golden)
+
+        rows = []
+        for k in max_results:
+            store.search(golden[0].question, limit=k)  # Warm up
+            timings, chunk_hits, lesson_hits, reciprocal_ranks, judged = [], 0, 0, [], 0
+            for question, expected in zip(golden, relevant):
+                started = time.perf_counter()
+                results = store.search(question.question, limit=k)
+                timings.append(time.perf_counter() - started)
+                ranked = [(meta.get("course_title"), meta.get("chunk_index")) for meta in results.metadata]
+                lessons = [(meta.get("course_title"), meta.get("lesson_number")) for meta in results.metadata]
+                lesson_hits += (question.course_title, question.lesson_number) in lessons
+                if not expected:
+                    continue  # Passage split by chunking: only judged at lesson level
+                judged += 1
+                rank = next((i + 1 for i, item in enumerate(ranked) if item in expected), None)
+                chunk_hits += rank is not None
+                reciprocal_ranks.append(1 / rank if rank else 0.0)
+            latency = latency_stats(timings)
+            rows.append({
+                "embedding_model": embedding_model,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+                "max_results": k,
+                "chunks": len(chunks),
+                "questions": len(golden),
+                "judged_questions": judged,
+                "chunk_recall": round(chunk_hits / judged, 4) if judged else 0.0,
+                "lesson_recall": round(lesson_hits / len(golden), 4),
+                "mrr": round(statistics.fmean(reciprocal_ranks), 4) if reciprocal_ranks else 0.0,
+                "p50_ms": latency["p50_ms"],
+                "p95_ms": latency["p95_ms"],
+                "index_seconds": round(index_seconds, 2),
+                "disk_mb": round(disk_mb, 2),
+            })
+        return rows
+
+
+def recommend(rows: List[Dict[str, Any]], min_recall: float) -> Optional[Dict[str, Any]]:
+    """The configuration with the lowest p95 latency among those meeting min_recall"""
+    passing = [row for row in rows if row["chunk_recall"] >= min_recall]
+    return min(passing, key=lambda row: (row["p95_ms"], row["p50_ms"])) if passing else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", default=DOCS_PATH, help="Folder of course transcripts")
+    parser.add_argument("--embedding-models", nargs="+", default=[HASHING_EMBEDDING_MODEL],
+                        help="Models to compare; sentence-transformer models must already be cached offline")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[config.CHUNK_SIZE])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[config.CHUNK_OVERLAP])
+    parser.add_argument("--max-results", type=int, nargs="+", default=[3, config.MAX_RESULTS, 10])
+    parser.add_argument("--per-lesson", type=int, default=5, help="Golden questions sampled per lesson")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--golden", help="Load the golden set from this JSON file instead of sampling")
+    parser.add_argument("--golden-out", help="Save the golden set as JSON")
+    parser.add_argument("--min-recall", type=float, default=0.8, help="Chunk recall a configuration must reach")
+    parser.add_argument("--output", help="Write all rows and the recommendation as JSON")
+    args = parser.parse_args()
+
+    if args.golden:
+        with open(args.golden) as f:
+            golden = [GoldenQuestion(**item) for item in json.load(f)]
+    else:
+        golden = build_golden_set(args.docs, args.per_lesson, seed=args.seed)
+    if args.golden_out:
+        with open(args.golden_out, "w") as f:
+            json.dump([asdict(question) for question in golden], f, indent=2)
+    print(f"Golden set: {len(golden)} questions from {args.docs}\n")
+
+    header = (f"{'model':<18} {'size':>5} {'overlap':>7} {'k':>3} {'chunk R@k':>9} {'lesson R@k':>10} "
+              f"{'MRR':>6} {'p50 ms':>8} {'p95 ms':>8} {'disk MB':>8}")
+    print(header)
+    rows = []
+    for model, size, overlap in itertools.product(args.embedding_models, args.chunk_sizes, args.overlaps):
+        if overlap >= size:
+            continue
+        for row in evaluate(golden, model, size, overlap, args.max_results, args.docs):
+            rows.append(row)
+            print(f"{model:<18} {size:>5} {overlap:>7} {row['max_results']:>3} {row['chunk_recall']:>9.3f} "
+                  f"{row['lesson_recall']:>10.3f} {row['mrr']:>6.3f} {row['p50_ms']:>8.2f} "
+                  f"{row['p95_ms']:>8.2f} {row['disk_mb']:>8.1f}")
+
+    best = recommend(rows, args.min_recall)
+    if best:
+        print(f"\nFastest configuration with chunk recall >= {args.min_recall}: "
+              f"{best['embedding_model']} CHUNK_SIZE={best['chunk_size']} CHUNK_OVERLAP={best['chunk_overlap']} "
+              f"MAX_RESULTS={best['max_results']} (p95 {best['p95_ms']} ms, recall {best['chunk_recall']})")
+    else:
+        print(f"\nNo configuration reached chunk recall {args.min_recall}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"min_recall": args.min_recall, "rows": rows, "recommended": best}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Local HTTP stand-in for the Anthropic Messages API.
+
+Serves `POST /v1/messages` with the same JSON and server-sent-event wire
+format as the real API, so the unmodified `anthropic` client (and therefore
+the whole app) can run against it offline. Point the app at it with
+ANTHROPIC_BASE_URL.
+
+Replies follow the in-process fake (a search tool call when tools are offered,
+then a short answer) unless a script is given. Latency is drawn from a
+configurable distribution; a share of requests can fail with 529/429 to
+exercise retry handling. Given a certificate it serves HTTPS, like the real
+API. `GET /stats` reports request, connection and TLS handshake counts.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_anthropic_server --port 8090 --latency lognormal:0.8,0.4
+    python -m benchmarks.fake_anthropic_server --script replies.json --error-rate 0.05
+    python -m benchmarks.fake_anthropic_server --certfile cert.pem --keyfile key.pem
+"""
+import argparse
+import itertools
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+from benchmarks.fake_llm import build_message
+
+TOKENS_PER_DELTA = 4  # Words of text sent per content_block_delta event
+
+
+class LatencyModel:
+    """
+    Seconds a reply takes, from a spec string:
+
+    - "fixed:0.5"
+    - "uniform:0.2,0.8" (low, high)
+    - "lognormal:0.8,0.4" (median, sigma of the underlying normal)
+    """
+
+    def __init__(self, spec: str, seed: Optional[int] = None):
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.params = [float(value) for value in args.split(",")] if args else []
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._random.uniform(*self.params)
+            median, sigma = self.params
+            return median * self._random.lognormvariate(0.0, sigma)
+
+
+class ScriptedReplies:
+    """
+    Replies taken in turn from a list, cycling when exhausted. Each step is
+    {"type": "text", "text": ...} or {"type": "tool_use", "name": ...,
+    "input": {...}}; a tool_use step is answered with text when the request
+    offers no tools.
+    """
+
+    def __init__(self, steps: List[Dict[str, Any]]):
+        if not steps:
+            raise ValueError("A script needs at least one step")
+        self._steps = itertools.cycle(steps)
+        self._lock = threading.Lock()
+
+    def reply(self, params: Dict[str, Any], call_id: int) -> Message:
+        with self._lock:
+            step = next(self._steps)
+        input_chars = len(json.dumps(params.get("messages", []))) + len(str(params.get("system", "")))
+        if step["type"] == "tool_use" and params.get("tools"):
+            content = [ToolUseBlock(id=f"toolu_{call_id:06d}", type="tool_use",
+                                    name=step.get("name", "search_course_content"),
+                                    input=step.get("input", {}))]
+            stop_reason = "tool_use"
+        else:
+            content = [TextBlock(type="text", text=step.get("text", f"Scripted answer #{call_id}"))]
+            stop_reason = "end_turn"
+        return Message(id=f"msg_{call_id:06d}", type="message", role="assistant", model=params["model"],
+                       content=content, stop_reason=stop_reason,
+                       usage=Usage(input_tokens=input_chars // 4, output_tokens=20))
+
+
+class FakeAnthropicServer:
+    """
+    Threaded HTTP server implementing the Messages API. Use as a context
+    manager, or call start()/stop().
+
+    Args:
+        host: Interface to bind
+        port: Port to bind; 0 picks a free one (see `url`)
+        latency: Reply latency distribution
+        script: Optional scripted replies instead of the default tool-then-answer flow
+        error_rate: Fraction of requests failing with `error_status`
+        error_status: 529 (overloaded) or 429 (rate limited); both send retry-after
+        seed: Seed for latency and error sampling
+        certfile: PEM certificate (with chain) to serve HTTPS; plain HTTP without
+        keyfile: PEM private key, if not in certfile
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: Optional[LatencyModel] = None,
+                 script: Optional[ScriptedReplies] = None, error_rate: float = 0.0,
+                 error_status: int = 529, seed: Optional[int] = None,
+                 certfile: Optional[str] = None, keyfile: Optional[str] = None):
+        self.latency = latency or LatencyModel("fixed:0.05")
+        self.script = script
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "streamed": 0, "errors": 0, "connections": 0, "tls_handshakes": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            # Handshakes run in the connection's handler thread, not the accept loop
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True,
+                                                      do_handshake_on_connect=False)
+            self.scheme = "https"
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self) -> "FakeAnthropicServer":
+        """Serve on a daemon thread"""
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-anthropic", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _next_reply(self, params: Dict[str, Any]) -> Optional[Message]:
+        """The reply to a request, or None if it should fail"""
+        with self._lock:
+            call_id = next(self._ids)
+            fail = self._random.random() < self.error_rate
+        if fail:
+            return None
+        if self.script is not None:
+            return self.script.reply(params, call_id)
+        return build_message(params, call_id, lambda prompt: True)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive, as with the real API
+
+            def setup(self):
+                if isinstance(self.request, ssl.SSLSocket):
+                    self.request.do_handshake()
+                    server._count("tls_handshakes")
+                super().setup()
+                server._count("connections")
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path != "/stats":
+                    return self._send_json(404, _error("not_found_error", "Not found"))
+                with server._lock:
+                    stats = dict(server.stats)
+                self._send_json(200, stats)
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/v1/messages":
+                    return self._send_json(404, _error("not_found_error", "Not found"))
+                length = int(self.headers.get("content-length", 0))
+                try:
+                    params = json.loads(self.rfile.read(length))
+                except ValueError:
+                    return self._send_json(400, _error("invalid_request_error", "Body is not JSON"))
+                server._count("requests")
+
+                latency = server.latency.sample()
+                reply = server._next_reply(params)
+                if reply is None:
+                    time.sleep(latency / 4)
+                    server._count("errors")
+                    kind = "overloaded_error" if server.error_status == 529 else "rate_limit_error"
+                    return self._send_json(server.error_status, _error(kind, "Injected failure"),
+                                           {"retry-after": "1"})
+
+                if params.get("stream"):
+                    server._count("streamed")
+                    return self._stream(reply, latency)
+                time.sleep(latency)
+                self._send_json(200, reply.model_dump(mode="json"))
+
+            def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.send_header("request-id", f"req_fake_{time.monotonic_ns()}")
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, reply: Message, latency: float):
+                """Send reply as SSE: half the latency before the first event, the rest spread over deltas"""
+                events = list(_stream_events(reply))
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("cache-control", "no-cache")
+                self.send_header("transfer-encoding", "chunked")
+                self.end_headers()
+                time.sleep(latency / 2)
+                deltas = sum(1 for name, _ in events if name == "content_block_delta") or 1
+                try:
+                    for name, data in events:
+                        chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                        self.wfile.write(f"{len(chunk):X}\r\n".encode() + chunk + b"\r\n")
+                        self.wfile.flush()
+                        if name == "content_block_delta":
+                            time.sleep(latency / 2 / deltas)
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client aborted the stream, e.g. a cancelled request
+                    self.close_connection = True
+
+        return Handler
+
+
+def _error(kind: str, message: str) -> Dict[str, Any]:
+    return {"type": "error", "error": {"type": kind, "message": message}}
+
+
+def _stream_events(reply: Message):
+    """The Messages API event sequence for a complete reply"""
+    start = reply.model_dump(mode="json")
+    start.update(content=[], stop_reason=None,
+                 usage={**start["usage"], "output_tokens": 1})
+    yield "message_start", {"type": "message_start", "message": start}
+    for index, block in enumerate(reply.content):
+        if block.type == "text":
+            yield "content_block_start", {"type": "content_block_start", "index": index,
+                                          "content_block": {"type": "text", "text": ""}}
+            words = block.text.split(" ")
+            for offset in range(0, len(words), TOKENS_PER_DELTA):
+                text = " ".join(words[offset:offset + TOKENS_PER_DELTA])
+                if offset + TOKENS_PER_DELTA < len(words):
+                    text += " "
+                yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                              "delta": {"type": "text_delta", "text": text}}
+        else:
+            yield "content_block_start", {"type": "content_block_start", "index": index,
+                                          "content_block": {"type": "tool_use", "id": block.id,
+                                                            "name": block.name, "input": {}}}
+            yield "content_block_delta", {"type": "content_block_delta", "index": index,
+                                          "delta": {"type": "input_json_delta",
+                                                    "partial_json": json.dumps(block.input)}}
+        yield "content_block_stop", {"type": "content_block_stop", "index": index}
+    yield "message_delta", {"type": "message_delta",
+                            "delta": {"stop_reason": reply.stop_reason, "stop_sequence": None},
+                            "usage": {"output_tokens": reply.usage.output_tokens}}
+    yield "message_stop", {"type": "message_stop"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", default="fixed:0.5", help="fixed:S, uniform:LOW,HIGH or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--script", help="JSON file with a list of reply steps")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, choices=(429, 529), default=529)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--certfile", help="PEM certificate to serve HTTPS")
+    parser.add_argument("--keyfile", help="PEM private key, if not in --certfile")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script) as f:
+            script = ScriptedReplies(json.load(f))
+    server = FakeAnthropicServer(args.host, args.port, LatencyModel(args.latency, args.seed), script,
+                                 args.error_rate, args.error_status, args.seed, args.certfile, args.keyfile)
+    print(f"Fake Anthropic API listening on {server.url} (set ANTHROPIC_BASE_URL={server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""In-process stand-in for the Anthropic client used by the benchmarks"""
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from anthropic.types import Message, TextBlock, ToolUseBlock, Usage
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    """Plain text of a message whose content may be a string or a list of blocks"""
+    content = message["content"]
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content:
+        if isinstance(block, dict):
+            parts.append(str(block.get("content") or block.get("text") or ""))
+        elif getattr(block, "type", None) == "text":
+            parts.append(block.text)
+    return "\n".join(parts)
+
+
+def build_message(params: Dict[str, Any], call_id: int, wants_tool: Callable[[str], bool]) -> Message:
+    """
+    The fake model's reply to a Messages API request: a search tool call when
+    tools are offered, no tool result is present yet and `wants_tool` accepts
+    the prompt; otherwise a short text answer.
+    """
+    messages: List[Dict[str, Any]] = params["messages"]
+    prompt = _message_text(messages[0])
+    input_chars = len(params.get("system", "")) + sum(len(_message_text(m)) for m in messages)
+
+    has_tool_result = len(messages) > 1
+    if params.get("tools") and not has_tool_result and wants_tool(prompt):
+        content = [ToolUseBlock(
+            id=f"toolu_{call_id:06d}",
+            type="tool_use",
+            name="search_course_content",
+            input={"query": prompt.split(":", 1)[-1].strip()}
+        )]
+        stop_reason = "tool_use"
+    else:
+        content = [TextBlock(type="text", text=f"Fake answer #{call_id}")]
+        stop_reason = "end_turn"
+
+    return Message(
+        id=f"msg_{call_id:06d}",
+        type="message",
+        role="assistant",
+        model=params["model"],
+        content=content,
+        stop_reason=stop_reason,
+        usage=Usage(input_tokens=input_chars // 4, output_tokens=20)
+    )
+
+
+class FakeMessages:
+    """Implements `messages.create` and `messages.stream` with a fixed latency per call"""
+
+    def __init__(self, latency: float, wants_tool: Callable[[str], bool]):
+        self.latency = latency
+        self.wants_tool = wants_tool
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def create(self, **params) -> Message:
+        with self._lock:
+            self.calls += 1
+            call_id = next(self._ids)
+        time.sleep(self.latency)
+        return build_message(params, call_id, self.wants_tool)
+
+    def stream(self, timeout: Optional[float] = None, **params) -> "FakeStream":
+        """Like `messages.stream`: the whole message arrives as a single event"""
+        return FakeStream(self.create(**params))
+
+
+class FakeStream:
+    """Minimal `MessageStream` over an already complete message"""
+
+    def __init__(self, message: Message):
+        self.message = message
+
+    def __enter__(self) -> "FakeStream":
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def __iter__(self):
+        yield self.message
+
+    def close(self):
+        pass
+
+    def get_final_message(self) -> Message:
+        return self.message
+
+
+class FakeAnthropicClient:
+    """
+    Drop-in replacement for `anthropic.Anthropic` in benchmarks.
+
+    Args:
+        latency: Seconds each `messages.create` call takes
+        wants_tool: Decides, from the user prompt, whether the fake model asks
+            for a search when tools are offered
+    """
+
+    def __init__(self, latency: float = 0.5, wants_tool: Optional[Callable[[str], bool]] = None):
+        self.messages = FakeMessages(latency, wants_tool or (lambda prompt: True))
@@ -0,0 +1,241 @@
+"""
+End-to-end load generator for `/api/query`.
+
+Drives a running server over HTTP either closed-loop (a fixed number of
+concurrent virtual users, each sending its next query when the previous one
+returns) or open-loop (queries started at a fixed rate regardless of
+responses, which exposes queueing). Reports throughput, p50/p95/p99 latency,
+error rate and status counts.
+
+With --spawn it runs fully offline: it starts the fake Anthropic server,
+launches the app under uvicorn pointed at it (hashing embeddings, temporary
+ChromaDB), waits for /readyz, runs the load and shuts everything down.
+
+Usage (from the backend directory):
+    python -m benchmarks.loadgen --spawn --concurrency 8 --requests 200
+    python -m benchmarks.loadgen --spawn --rps 20 --duration 30 --llm-latency lognormal:0.8,0.4
+    python -m benchmarks.loadgen --url http://localhost:8000 --concurrency 4 --requests 50
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.fake_anthropic_server import FakeAnthropicServer, LatencyModel
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+QUERIES = [
+    "What does lesson 2 of the MCP course cover?",
+    "How does Chroma handle query expansion in Advanced Retrieval for AI?",
+    "Who is the instructor of the prompt compression course?",
+    "Explain how computer use works with Claude",
+    "What is the capital of France?",
+    "Summarise the first lesson of the retrieval course",
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of values (0 for none)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class LoadResult:
+    """Latencies and outcomes of one load run"""
+
+    def __init__(self):
+        self.latencies: List[float] = []  # Successful requests only, in seconds
+        self.statuses: Counter = Counter()
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def record(self, status: str, seconds: float):
+        self.statuses[status] += 1
+        if status == "200":
+            self.latencies.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        total = sum(self.statuses.values())
+        elapsed = self.finished - self.started
+        ok = self.statuses.get("200", 0)
+        return {
+            "requests": total,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0,
+            "error_rate": round((total - ok) / total, 4) if total else 0.0,
+            "p50_ms": round(1000 * percentile(self.latencies, 0.50), 1),
+            "p95_ms": round(1000 * percentile(self.latencies, 0.95), 1),
+            "p99_ms": round(1000 * percentile(self.latencies, 0.99), 1),
+            "max_ms": round(1000 * max(self.latencies, default=0.0), 1),
+            "statuses": dict(self.statuses),
+        }
+
+
+async def _send(client: httpx.AsyncClient, query: str, session_id: str, result: LoadResult):
+    started = time.perf_counter()
+    try:
+        response = await client.post("/api/query", json={"query": query, "session_id": session_id})
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    result.record(status, time.perf_counter() - started)
+
+
+async def run_load(url: str, requests: Optional[int] = None, duration: Optional[float] = None,
+                   concurrency: Optional[int] = None, rps: Optional[float] = None,
+                   sessions: int = 1000, timeout: float = 120.0) -> LoadResult:
+    """
+    Send queries until `requests` have been sent or `duration` seconds pass.
+
+    Exactly one of `concurrency` (closed loop) and `rps` (open loop) must be
+    given. Each query uses one of `sessions` session ids in turn, so
+    per-session rate limits don't dominate the run.
+    """
+    if (concurrency is None) == (rps is None):
+        raise ValueError("Give exactly one of concurrency and rps")
+    if requests is None and duration is None:
+        raise ValueError("Give requests, duration or both")
+
+    queries = itertools.cycle(QUERIES)
+    session_ids = itertools.cycle(f"load-{i}" for i in range(sessions))
+    deadline = time.perf_counter() + duration if duration else float("inf")
+    sent = itertools.count()
+    result = LoadResult()
+
+    def next_request():
+        if time.perf_counter() >= deadline or (requests is not None and next(sent) >= requests):
+            return None
+        return next(queries), next(session_ids)
+
+    limits = httpx.Limits(max_connections=concurrency or 1000, max_keepalive_connections=concurrency or 100)
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        result.started = time.perf_counter()
+        if concurrency is not None:
+            async def user():
+                while (item := next_request()) is not None:
+                    await _send(client, *item, result)
+
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+        else:
+            tasks = []
+            interval = 1.0 / rps
+            next_start = time.perf_counter()
+            while (item := next_request()) is not None:
+                tasks.append(asyncio.create_task(_send(client, *item, result)))
+                next_start += interval
+                await asyncio.sleep(max(0.0, next_start - time.perf_counter()))
+            await asyncio.gather(*tasks)
+        result.finished = time.perf_counter()
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} before becoming ready")
+        try:
+            if httpx.get(f"{url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"App not ready after {timeout}s")
+
+
+@contextmanager
+def spawned_app(llm_latency: str, error_rate: float, extra_env: Dict[str, str]) -> Iterator[str]:
+    """Run the fake Anthropic server and the app against it; yields the app URL"""
+    with FakeAnthropicServer(latency=LatencyModel(llm_latency), error_rate=error_rate) as llm, \
+            tempfile.TemporaryDirectory() as workdir:
+        port = _free_port()
+        env = {
+            **os.environ,
+            "ANTHROPIC_BASE_URL": llm.url,
+            "ANTHROPIC_API_KEY": "fake-key",
+            "EMBEDDING_MODEL": "hashing",
+            "CHROMA_PATH": os.path.join(workdir, "chroma"),
+            "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+            **extra_env,
+        }
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+        )
+        url = f"http://127.0.0.1:{port}"
+        try:
+            _wait_ready(url, process, timeout=180)
+            yield url
+            print(f"Fake LLM: {httpx.get(f'{llm.url}/stats').json()}")
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument("--spawn", action="store_true", help="Start the fake LLM and the app locally")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--concurrency", type=int, help="Closed loop: concurrent virtual users")
+    mode.add_argument("--rps", type=float, help="Open loop: queries started per second")
+    parser.add_argument("--requests", type=int, help="Stop after this many queries")
+    parser.add_argument("--duration", type=float, help="Stop after this many seconds")
+    parser.add_argument("--sessions", type=int, default=1000, help="Distinct session ids to rotate through")
+    parser.add_argument("--llm-latency", default="fixed:0.3", help="Fake LLM latency with --spawn")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fake LLM failure rate with --spawn")
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra environment for the spawned app")
+    parser.add_argument("--output", help="Also write the summary as JSON to this file")
+    args = parser.parse_args()
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+
+    def run(url: str) -> LoadResult:
+        return asyncio.run(run_load(url, args.requests, args.duration, args.concurrency, args.rps, args.sessions))
+
+    if args.spawn:
+        extra_env = dict(item.split("=", 1) for item in args.app_env)
+        with spawned_app(args.llm_latency, args.llm_error_rate, extra_env) as url:
+            result = run(url)
+    else:
+        result = run(args.url)
+
+    summary = result.summary()
+    load = f"concurrency={args.concurrency}" if args.concurrency else f"rps={args.rps}"
+    print(f"\nLoad: {load}")
+    print(f"{'requests':>10} {'rps':>8} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print(f"{summary['requests']:>10} {summary['throughput_rps']:>8.2f} {summary['error_rate']:>8.2%} "
+          f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} {summary['max_ms']:>9.1f}")
+    print(f"Statuses: {summary['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"load": load, **summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
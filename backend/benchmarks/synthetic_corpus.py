@@ -0,0 +1,125 @@
+"""
+Synthetic course documents in the format DocumentProcessor parses:
+
+    Course Title: ...
+    Course Link: ...
+    Course Instructor: ...
+
+    Lesson 0: ...
+    Lesson Link: ...
+    <transcript text>
+
+Generation is deterministic for a seed. Each lesson mentions a made-up term
+unique to it, so benchmark queries can target a known (course, lesson).
+
+Usage (from the backend directory):
+    python -m benchmarks.synthetic_corpus --courses 1000 --output /tmp/corpus
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass
+from typing import List
+
+TOPICS = [
+    "Retrieval", "Agents", "Embeddings", "Prompting", "Evaluation", "Fine Tuning", "Tool Use",
+    "Vector Databases", "Computer Use", "Multimodal Models", "Guardrails", "Observability",
+]
+NOUNS = ["Foundations", "in Practice", "at Scale", "for Developers", "Deep Dive", "Patterns"]
+INSTRUCTORS = ["Ada Park", "Lin Osei", "Maya Kowalski", "Sam Rivera", "Noor Haddad", "Jon Eriksen"]
+LESSON_TITLES = ["Introduction", "Core Concepts", "Hands-on Lab", "Common Pitfalls", "Advanced Techniques",
+                 "Case Study", "Performance", "Wrap-up"]
+WORDS = (
+    "model context retrieval query document chunk vector index latency prompt token answer search "
+    "score rank filter cache batch pipeline evaluate metric dataset example system user assistant "
+    "tool result embedding similarity distance memory session stream request response course lesson"
+).split()
+SYLLABLES = ["ka", "lo", "mi", "ren", "su", "tav", "zel", "dor", "qui", "bex", "nar", "vo"]
+
+
+@dataclass
+class LessonProbe:
+    """A query answerable only from one lesson"""
+    course_title: str
+    lesson_number: int
+    term: str
+
+    @property
+    def query(self) -> str:
+        return f"Why do we introduce {self.term} here?"
+
+
+def course_title(index: int) -> str:
+    topic = TOPICS[index % len(TOPICS)]
+    noun = NOUNS[(index // len(TOPICS)) % len(NOUNS)]
+    return f"{topic} {noun} {index:05d}"
+
+
+def lesson_term(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(4))
+
+
+def generate_course(index: int, lessons: int, words_per_lesson: int, seed: int = 0):
+    """
+    Text of one synthetic course, and a probe for each of its lessons.
+
+    Returns:
+        Tuple of (document text, list of LessonProbe)
+    """
+    rng = random.Random(seed * 1_000_003 + index)
+    title = course_title(index)
+    slug = title.lower().replace(" ", "-")
+    lines = [
+        f"Course Title: {title}",
+        f"Course Link: https://courses.example.com/{slug}/",
+        f"Course Instructor: {INSTRUCTORS[index % len(INSTRUCTORS)]}",
+        "",
+    ]
+    probes = []
+    for number in range(lessons):
+        term = lesson_term(rng)
+        probes.append(LessonProbe(title, number, term))
+        lines.append(f"Lesson {number}: {LESSON_TITLES[number % len(LESSON_TITLES)]}")
+        lines.append(f"Lesson Link: https://courses.example.com/{slug}/lesson/{number}")
+        sentences = [f"In this lesson of {title} we introduce {term}, a technique for {rng.choice(WORDS)} work."]
+        written = len(sentences[0].split())
+        while written < words_per_lesson:
+            length = rng.randint(8, 16)
+            words = [rng.choice(WORDS) for _ in range(length)]
+            if rng.random() < 0.2:
+                words[rng.randrange(length)] = term
+            sentences.append(" ".join(words).capitalize() + ".")
+            written += length
+        lines.append(" ".join(sentences))
+        lines.append("")
+    return "\n".join(lines), probes
+
+
+def write_corpus(directory: str, courses: int, lessons: int = 4, words_per_lesson: int = 300,
+                 seed: int = 0) -> List[LessonProbe]:
+    """Write `courses` documents into directory and return the probes for all lessons"""
+    os.makedirs(directory, exist_ok=True)
+    probes = []
+    for index in range(courses):
+        text, course_probes = generate_course(index, lessons, words_per_lesson, seed)
+        with open(os.path.join(directory, f"course_{index:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        probes.extend(course_probes)
+    return probes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--lessons", type=int, default=4, help="Lessons per course")
+    parser.add_argument("--words", type=int, default=300, help="Words per lesson")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", required=True, help="Directory to write documents into")
+    args = parser.parse_args()
+
+    probes = write_corpus(args.output, args.courses, args.lessons, args.words, args.seed)
+    print(f"Wrote {args.courses} courses ({len(probes)} lessons) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
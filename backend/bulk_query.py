@@ -0,0 +1,236 @@
+"""
+Offline bulk querying: answer a JSON lines file of questions through RAGSystem.
+
+Each input line is {"query": ...} with optional "id" (defaults to the line
+number) and "session_id". Each answer is appended to the output file as
+{"id", "query", "answer", "sources", "latency_ms"}, or with "error" instead of
+an answer. The output doubles as the checkpoint: rerunning with the same
+output skips ids that already have an answer and retries those that failed,
+so for a retried id the last line wins.
+
+Usage (from the repository root):
+    python main.py queries.jsonl answers.jsonl --concurrency 8 --rate 5
+    python main.py queries.jsonl answers.jsonl --fake-llm lognormal:0.8,0.4
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from admission import TokenBucket
+from config import config
+from rag_system import RAGSystem
+from request_context import BULK, RequestContext
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (query, session_id, context) -> (answer, sources)
+AnswerFn = Callable[[str, Optional[str], RequestContext], Awaitable[Tuple[str, List[Any]]]]
+
+
+@dataclass
+class BulkQuery:
+    id: str
+    query: str
+    session_id: Optional[str] = None
+
+
+def read_queries(path: str) -> List[BulkQuery]:
+    """Parse the input file, raising ValueError with the line number of a bad line"""
+    queries = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                query = BulkQuery(str(item.get("id", number)), item["query"], item.get("session_id"))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f"{path}:{number}: expected a JSON object with a 'query' ({e})") from e
+            if query.id in seen:
+                raise ValueError(f"{path}:{number}: duplicate id '{query.id}'")
+            seen.add(query.id)
+            queries.append(query)
+    return queries
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids already answered in an earlier run; a line cut short by a crash is ignored"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "error" in record:
+                done.discard(record.get("id"))
+            else:
+                done.add(record.get("id"))
+    return done
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+class BulkStats:
+    """Outcomes and latencies of one bulk run"""
+
+    def __init__(self, total: int, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.answered = 0
+        self.failed = 0
+        self.latencies: List[float] = []  # Answered queries only, in seconds
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.finished - self.started
+        ordered = sorted(self.latencies)
+        return {
+            "queries": self.total,
+            "skipped": self.skipped,
+            "answered": self.answered,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_qps": round(self.answered / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(1000 * _percentile(ordered, 0.50), 1),
+            "p95_ms": round(1000 * _percentile(ordered, 0.95), 1),
+            "p99_ms": round(1000 * _percentile(ordered, 0.99), 1),
+            "max_ms": round(1000 * max(ordered, default=0.0), 1),
+        }
+
+
+class BulkQueryRunner:
+    """
+    Runs queries with at most `concurrency` in flight and, if `rate` is set,
+    starts at most `rate` per second, appending each result to the output.
+
+    Args:
+        answer: Coroutine function answering one query, e.g. RAGSystem.aquery
+        concurrency: Queries in flight at once
+        rate: Queries started per second; None or 0 for no limit
+        timeout: Deadline per query in seconds; None for no deadline
+        progress_every: Print progress after this many results; 0 to stay quiet
+    """
+
+    def __init__(self, answer: AnswerFn, concurrency: int, rate: Optional[float] = None,
+                 timeout: Optional[float] = None, progress_every: int = 100):
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.answer = answer
+        self.concurrency = concurrency
+        self.rate = rate or None
+        self.timeout = timeout
+        self.progress_every = progress_every
+
+    async def run(self, queries: List[BulkQuery], output_path: str) -> BulkStats:
+        """Answer the queries not yet in output_path; returns this run's stats"""
+        done = completed_ids(output_path)
+        todo = [query for query in queries if query.id not in done]
+        stats = BulkStats(len(queries), len(queries) - len(todo))
+        pending = iter(todo)  # Shared by the workers
+        bucket = TokenBucket(self.rate, 1, time.monotonic()) if self.rate else None
+
+        with open(output_path, "a", encoding="utf-8") as output:
+            async def worker():
+                for query in pending:
+                    if bucket is not None:
+                        while wait := bucket.take(time.monotonic()):
+                            await asyncio.sleep(wait)
+                    record = await self._answer_one(query, stats)
+                    # One line per result, flushed so an interrupted run loses at most in-flight queries
+                    output.write(json.dumps(record) + "\n")
+                    output.flush()
+                    finished = stats.answered + stats.failed
+                    if self.progress_every and finished % self.progress_every == 0:
+                        print(f"{finished}/{stats.total - stats.skipped} done, {stats.failed} failed")
+
+            stats.started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            stats.finished = time.perf_counter()
+        return stats
+
+    async def _answer_one(self, query: BulkQuery, stats: BulkStats) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        # Bulk priority: the LLM scheduler serves interactive queries first
+        context = RequestContext(deadline=deadline, cancellable=deadline is not None, priority=BULK)
+        record: Dict[str, Any] = {"id": query.id, "query": query.query}
+        started = time.perf_counter()
+        try:
+            answer, sources = await self.answer(query.query, query.session_id, context)
+        except Exception as e:
+            stats.failed += 1
+            record["error"] = f"{type(e).__name__}: {e}"
+            return record
+        seconds = time.perf_counter() - started
+        stats.answered += 1
+        stats.latencies.append(seconds)
+        record.update(answer=answer, sources=sources, latency_ms=round(1000 * seconds, 1))
+        return record
+
+
+def _backend_path(path: str) -> str:
+    """Relative paths in config are relative to backend/, where the server runs"""
+    return path if os.path.isabs(path) else os.path.join(BACKEND_DIR, path)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSON lines file of queries")
+    parser.add_argument("output", help="JSON lines file answers are appended to; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=config.BULK_QUERY_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=config.BULK_QUERIES_PER_SECOND,
+                        help="Queries started per second; 0 for no limit")
+    parser.add_argument("--timeout", type=float, default=config.QUERY_TIMEOUT_SECONDS, help="Deadline per query")
+    parser.add_argument("--docs", default=os.path.join(BACKEND_DIR, "..", "docs"),
+                        help="Course documents to index before querying (already indexed courses are skipped)")
+    parser.add_argument("--no-ingest", action="store_true", help="Query the existing index as is")
+    parser.add_argument("--fake-llm", metavar="LATENCY",
+                        help="Answer with the local stand-in LLM, e.g. fixed:0.3 or lognormal:0.8,0.4")
+    parser.add_argument("--progress-every", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    queries = read_queries(args.input)
+    settings = dataclasses.replace(
+        config, CHROMA_PATH=_backend_path(config.CHROMA_PATH), SESSION_DB_PATH=_backend_path(config.SESSION_DB_PATH)
+    )
+
+    with ExitStack() as stack:
+        if args.fake_llm:
+            from benchmarks.fake_anthropic_server import FakeAnthropicServer, LatencyModel
+            llm = stack.enter_context(FakeAnthropicServer(latency=LatencyModel(args.fake_llm)))
+            settings = dataclasses.replace(settings, ANTHROPIC_BASE_URL=llm.url,
+                                           ANTHROPIC_API_KEY=settings.ANTHROPIC_API_KEY or "fake-key")
+            print(f"Using the stand-in LLM at {llm.url}")
+
+        rag_system = RAGSystem(settings)
+        # Run on Ctrl-C or an error too: close the pool, after keeping the usage recorded so far
+        stack.callback(rag_system.llm_connections.close)
+        stack.callback(rag_system.usage_ledger.flush)
+        if not args.no_ingest:
+            courses, chunks = rag_system.add_course_folder(args.docs, clear_existing=False)
+            print(f"Indexed {courses} new courses ({chunks} chunks) from {args.docs}")
+
+        # One warm connection per concurrent query, so the first wave skips connection setup
+        rag_system.llm_connections.warm(min(args.concurrency, settings.LLM_HTTP_MAX_CONNECTIONS))
+        runner = BulkQueryRunner(rag_system.aquery, args.concurrency, args.rate, args.timeout, args.progress_every)
+        stats = asyncio.run(runner.run(queries, args.output))
+
+    summary = stats.summary()
+    print(f"\n{'queries':>8} {'skipped':>8} {'answered':>9} {'failed':>7} {'q/s':>7} "
+          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print(f"{summary['queries']:>8} {summary['skipped']:>8} {summary['answered']:>9} {summary['failed']:>7} "
+          f"{summary['throughput_qps']:>7.2f} {summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} "
+          f"{summary['p99_ms']:>9.1f} {summary['max_ms']:>9.1f}")
+    print(f"Answers written to {args.output}")
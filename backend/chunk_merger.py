@@ -0,0 +1,149 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set
+from vector_store import SearchResults
+from document_processor import SENTENCE_ENDINGS
+from context_budget import strip_chunk_prefix
+
+
+@dataclass
+class _Passage:
+    """One or more consecutive chunks of a lesson merged into a single text"""
+    sentences: List[str]
+    metadata: Dict[str, Any]
+    distance: Optional[float]
+    rank: int       # Best retrieval position among the merged chunks
+    first_index: int
+    last_index: int
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Split chunk text the same way DocumentProcessor built it"""
+    return [s.strip() for s in SENTENCE_ENDINGS.split(text) if s.strip()]
+
+
+def _overlap(left: List[str], right: List[str]) -> int:
+    """Number of leading sentences of right already at the end of left"""
+    for size in range(min(len(left), len(right)), 0, -1):
+        if left[-size:] == right[:size]:
+            return size
+    return 0
+
+
+def _word_set(text: str) -> Set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class ChunkMerger:
+    """
+    Post-retrieval stage that merges adjacent or overlapping chunks of the same
+    lesson into one passage without repeated sentences, then optionally applies
+    maximal marginal relevance (MMR) to diversify what remains.
+
+    Args:
+        mmr_lambda: Relevance/diversity trade-off in [0, 1]; None disables MMR
+        max_results: Passages to keep after MMR
+        candidate_pool: Chunks to retrieve when MMR is enabled, so it has
+            more than max_results to choose from
+    """
+
+    def __init__(self, mmr_lambda: Optional[float] = None, max_results: int = 5, candidate_pool: int = 10):
+        self.mmr_lambda = mmr_lambda
+        self.max_results = max_results
+        self.candidate_pool = candidate_pool
+
+    @property
+    def search_limit(self) -> Optional[int]:
+        """Result count to request from the vector store, None for its default"""
+        return self.candidate_pool if self.mmr_lambda is not None else None
+
+    def process(self, results: SearchResults) -> SearchResults:
+        """Merge adjacent chunks and, if enabled, select a diverse subset"""
+        passages = self._merge(results)
+        if self.mmr_lambda is not None:
+            passages = self._mmr(passages)
+        return SearchResults(
+            documents=[" ".join(p.sentences) for p in passages],
+            metadata=[p.metadata for p in passages],
+            distances=[p.distance for p in passages] if results.distances else [],
+            error=results.error
+        )
+
+    def _merge(self, results: SearchResults) -> List[_Passage]:
+        """Merge chunks that are adjacent in the same (course_title, lesson_number)"""
+        distances = results.distances if len(results.distances) == len(results.documents) else []
+        groups: Dict[tuple, List[_Passage]] = {}
+        passages: List[_Passage] = []
+
+        for rank, (doc, meta) in enumerate(zip(results.documents, results.metadata)):
+            chunk_index = meta.get("chunk_index")
+            passage = _Passage(
+                sentences=_split_sentences(strip_chunk_prefix(doc)),
+                metadata=dict(meta),
+                distance=distances[rank] if distances else None,
+                rank=rank,
+                first_index=chunk_index if chunk_index is not None else -1,
+                last_index=chunk_index if chunk_index is not None else -1,
+            )
+            if chunk_index is None:
+                passages.append(passage)
+            else:
+                key = (meta.get("course_title"), meta.get("lesson_number"))
+                groups.setdefault(key, []).append(passage)
+
+        for group in groups.values():
+            group.sort(key=lambda p: p.first_index)
+            current = group[0]
+            for nxt in group[1:]:
+                if nxt.first_index <= current.last_index + 1:
+                    self._absorb(current, nxt)
+                else:
+                    passages.append(current)
+                    current = nxt
+            passages.append(current)
+
+        passages.sort(key=lambda p: p.rank)
+        for passage in passages:
+            if passage.last_index > passage.first_index:
+                passage.metadata["merged_chunks"] = passage.last_index - passage.first_index + 1
+        return passages
+
+    @staticmethod
+    def _absorb(current: _Passage, nxt: _Passage):
+        """Append nxt to current, skipping sentences they share"""
+        if nxt.last_index > current.last_index:
+            current.sentences += nxt.sentences[_overlap(current.sentences, nxt.sentences):]
+            current.last_index = nxt.last_index
+        if nxt.distance is not None and (current.distance is None or nxt.distance < current.distance):
+            current.distance = nxt.distance
+        current.rank = min(current.rank, nxt.rank)
+
+    def _mmr(self, passages: List[_Passage]) -> List[_Passage]:
+        """Greedy MMR using lexical similarity between passages"""
+        if len(passages) <= 1:
+            return passages
+
+        words = [_word_set(" ".join(p.sentences)) for p in passages]
+        # Relevance in (0, 1]: retrieval distance when known, else rank
+        relevance = [
+            1.0 / (1.0 + p.distance) if p.distance is not None else 1.0 / (1 + p.rank)
+            for p in passages
+        ]
+
+        selected: List[int] = []
+        candidates = list(range(len(passages)))
+        while candidates and len(selected) < self.max_results:
+            def score(i: int) -> float:
+                redundancy = max((_jaccard(words[i], words[j]) for j in selected), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+            best = max(candidates, key=score)
+            selected.append(best)
+            candidates.remove(best)
+
+        return [passages[i] for i in selected]
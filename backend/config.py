@@ -1,5 +1,6 @@
 import os
 from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -11,18 +12,123 @@ class Config:
     # Anthropic API settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     ANTHROPIC_MODEL: str = "claude-sonnet-4-20250514"
+    ANTHROPIC_BASE_URL: str = os.getenv("ANTHROPIC_BASE_URL", "")  # Empty uses the API; set for a local stand-in
+    ANTHROPIC_FAST_MODEL: str = os.getenv("ANTHROPIC_FAST_MODEL", "")  # Opt-in cascade, e.g. claude-3-5-haiku-20241022
     
-    # Embedding model settings
-    EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
+    # HTTP connections to the Anthropic API (see llm_connections.py)
+    LLM_HTTP_MAX_CONNECTIONS: int = 20     # Connections open at once
+    LLM_HTTP_KEEPALIVE_CONNECTIONS: int = 10  # Idle connections kept for reuse
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 60.0   # Seconds an idle connection is kept
+    LLM_HTTP2: bool = True                 # Use HTTP/2 when the h2 package is installed
+    LLM_WARM_CONNECTIONS: int = 2          # Connections opened at startup and kept warm; 0 disables
+    LLM_WARM_INTERVAL: float = 30.0        # Idle seconds before re-warming; below the keep-alive expiry
+    ANTHROPIC_CA_BUNDLE: str = os.getenv("ANTHROPIC_CA_BUNDLE", "")  # Extra CA, e.g. for a local HTTPS stand-in
+    
+    # Model cascade: which LLM calls go to ANTHROPIC_FAST_MODEL (see model_router.py)
+    ROUTE_SIMPLE_MAX_WORDS: int = 12      # First calls for shorter questions without history or complexity markers; 0 disables
+    ROUTE_SYNTHESIS_TO_FAST: bool = True  # Answers written from tool results or routed context
+    ROUTE_QUEUE_DEPTH: int = 4            # All calls while this many wait for rate limit capacity; 0 disables
+    ROUTE_LATENCY_SLO: float = 10.0       # All calls while the primary model's p95 exceeds this many seconds; 0 disables
+    ROUTE_LATENCY_WINDOW: float = 60.0    # Seconds of recent calls the p95 is taken over
+    
+    # Client-side scheduling of LLM calls under the account's rate limits (see llm_scheduler.py)
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))  # 0 for no limit
+    LLM_INPUT_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_INPUT_TOKENS_PER_MINUTE", "0"))  # 0 for no limit
+    LLM_INTERACTIVE_RESERVE: float = 0.2  # Share of each limit bulk queries leave to interactive ones
+    LLM_MAX_RETRIES: int = 3              # Retries after 429/529, server errors and connection failures
+    LLM_MAX_QUEUE_WAIT: float = 30.0      # Longest a call waits for capacity before 503
+    
+    # Embedding model settings ("hashing" selects the offline, model-free embedder)
+    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
     
     # Document processing settings
     CHUNK_SIZE: int = 800       # Size of text chunks for vector storage
     CHUNK_OVERLAP: int = 100     # Characters to overlap between chunks
     MAX_RESULTS: int = 5         # Maximum search results to return
     MAX_HISTORY: int = 2         # Number of conversation messages to remember
+    MAX_SESSIONS: int = 10000    # Least recently used sessions are evicted beyond this
+    SESSION_TTL_SECONDS: int = 3600  # Sessions idle for longer than this expire
+    SESSION_BACKEND: str = os.getenv("SESSION_BACKEND", "memory")  # "memory" (per process) or "sqlite" (shared)
+    
+    # Adaptive retrieval: return between min and max chunks depending on distances
+    ADAPTIVE_RETRIEVAL: bool = False
+    ADAPTIVE_CANDIDATES: int = 15       # Candidate pool requested from ChromaDB
+    ADAPTIVE_MIN_RESULTS: int = 1       # Chunks kept before score gaps can stop selection
+    ADAPTIVE_MAX_RESULTS: int = 8       # Upper bound on chunks returned
+    ADAPTIVE_MAX_DISTANCE: float = 1.5  # Absolute distance cutoff; nothing further is returned
+    ADAPTIVE_MAX_GAP: float = 0.15      # Distance jump between consecutive hits that ends selection
+    
+    # Post-retrieval settings
+    MERGE_ADJACENT_CHUNKS: bool = True  # Merge neighbouring chunks of a lesson into one passage
+    MMR_LAMBDA: Optional[float] = None  # Enables MMR diversification when set (e.g. 0.7); needs merging on
+    
+    # Token budgets per request (estimated locally, see context_budget.py)
+    RESULTS_TOKEN_BUDGET: int = 1500  # Search results passed to the model per tool call
+    HISTORY_TOKEN_BUDGET: int = 600   # Conversation history included in the system prompt
+    HISTORY_SUMMARY: bool = True      # Fold turns leaving the history into a running summary
+    HISTORY_SUMMARY_TOKENS: int = 150 # Cap on that summary, part of HISTORY_TOKEN_BUDGET; must be below it
+    
+    # Query pipeline settings
+    # "tools": Claude decides whether to search (two LLM calls for course questions)
+    # "routed": a local router retrieves up front and answers in a single LLM call
+    QUERY_MODE: str = os.getenv("QUERY_MODE", "tools")
+    ROUTER_DISTANCE_THRESHOLD: float = 1.0  # Max chunk distance for the router to treat a query as course-specific
+    COALESCE_QUERIES: bool = True  # Share one computation between identical concurrent first-turn queries
+    
+    # Admission control for /api/query (per worker process)
+    MAX_CONCURRENT_QUERIES: int = 8      # Queries processed at once
+    QUERY_QUEUE_SIZE: int = 32           # Queries allowed to wait; more get 503 with Retry-After
+    QUERY_QUEUE_TIMEOUT: float = 10.0    # Seconds a query may wait for a slot before 503
+    CLIENT_QUERIES_PER_MINUTE: float = 30.0  # Sustained rate per client address
+    CLIENT_QUERY_BURST: int = 10         # Back-to-back queries allowed per client address
+    QUERY_TIMEOUT_SECONDS: float = 60.0  # End-to-end deadline for a query, including queue wait; 504 after
+    DISCONNECT_POLL_SECONDS: float = 0.25  # How often a running query checks whether its client left
+    
+    # Readiness (/readyz) while startup ingestion runs in the background
+    READY_MIN_COURSES: int = 1             # Courses that must be searchable before accepting traffic
+    READY_REQUIRE_INGESTION: bool = False  # Also wait until startup ingestion has finished
+    
+    # Document uploads through POST /api/ingest
+    INGEST_JOB_WORKERS: int = 1          # Threads processing uploaded documents
+    INGEST_QUEUE_SIZE: int = 16          # Uploads allowed to wait; more are rejected with 429
+    MAX_UPLOAD_BYTES: int = 10_000_000   # Largest accepted document
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "./uploads")  # Uploads wait here until processed
+    
+    # Bounded thread pools per blocking stage (see executors.py)
+    EMBEDDING_WORKERS: int = 2      # Query embeddings for interactive searches
+    SEARCH_WORKERS: int = 4         # Chroma queries and catalog lookups
+    INGEST_WORKERS: int = 1         # Document writes, including their embeddings
+    STAGE_QUEUE_LIMIT: int = 64     # Tasks allowed to wait per stage before new ones are rejected
+    
+    # Prometheus metrics at /metrics (see metrics.py)
+    METRICS_DIR: str = os.getenv("METRICS_DIR", "")  # Shared by uvicorn --workers; empty keeps metrics per process
+    METRICS_FLUSH_SECONDS: float = 5.0  # How often each worker publishes its metrics to METRICS_DIR
+    
+    # Per-request traces (see tracing.py)
+    TRACE_PATH: str = os.getenv("TRACE_PATH", "")  # JSON lines file for finished traces; empty disables export
+    TRACE_SAMPLE_RATE: float = 1.0       # Fraction of requests traced
+    PROFILE_SLOW_REQUESTS: bool = os.getenv("PROFILE_SLOW_REQUESTS", "") == "1"  # Sample stacks of requests
+    SLOW_REQUEST_SECONDS: float = 5.0    # Requests at least this slow keep their stack profile
+    PROFILE_DIR: str = "./profiles"      # Where slow-request profiles are written
+    
+    # Token usage accounting (see usage.py); prices are USD per million tokens of ANTHROPIC_MODEL
+    INPUT_TOKEN_PRICE: float = 3.0
+    OUTPUT_TOKEN_PRICE: float = 15.0
+    CACHE_WRITE_TOKEN_PRICE: float = 3.75
+    CACHE_READ_TOKEN_PRICE: float = 0.30
+    USAGE_LOG_PATH: str = os.getenv("USAGE_LOG_PATH", "")  # JSON lines file of per-request usage; empty keeps it in memory
+    USAGE_FLUSH_SECONDS: float = 10.0    # How often buffered usage records are appended to USAGE_LOG_PATH
+    
+    # Bearer token for /api/admin/* endpoints; empty disables them
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
+    
+    # Offline bulk querying with `python main.py` (see bulk_query.py)
+    BULK_QUERY_CONCURRENCY: int = 4      # Queries in flight at once
+    BULK_QUERIES_PER_SECOND: float = 0.0  # Start rate limit; 0 starts queries as soon as a slot frees
     
     # Database paths
-    CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
+    CHROMA_PATH: str = os.getenv("CHROMA_PATH", "./chroma_db")  # ChromaDB storage location
+    SESSION_DB_PATH: str = os.getenv("SESSION_DB_PATH", "./sessions.db")  # SQLite session backend database
 
 config = Config()
 
@@ -0,0 +1,129 @@
+import re
+from typing import List, Optional, Sequence
+from vector_store import SearchResults
+
+# Lesson/course prefix that DocumentProcessor prepends to chunk text; redundant
+# once results carry a "[Course - Lesson N]" header
+CHUNK_PREFIX = re.compile(r"^(?:Course .+? )?Lesson \d+ content:\s*")
+
+# Word pieces and punctuation, roughly how BPE tokenizers split English text
+TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    Estimate the number of LLM tokens in text without calling the API.
+
+    Each word or punctuation mark counts as one token, plus one more for every
+    eight characters of a long word. Close enough to Claude's tokenizer for
+    budgeting English course transcripts.
+    """
+    if not text:
+        return 0
+    return sum(1 + len(piece) // 8 for piece in TOKEN_PIECES.findall(text))
+
+
+def strip_chunk_prefix(text: str) -> str:
+    """Remove the "Course X Lesson N content:" prefix from chunk text"""
+    return CHUNK_PREFIX.sub("", text, count=1)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text at a sentence boundary (or word boundary) to fit max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    kept = []
+    used = 0
+    for sentence in SENTENCE_END.split(text):
+        cost = estimate_tokens(sentence)
+        if used + cost > max_tokens:
+            break
+        kept.append(sentence)
+        used += cost
+    if kept:
+        return " ".join(kept)
+
+    # First sentence alone is too long; fall back to whole words
+    words = []
+    for word in text.split():
+        used += estimate_tokens(word)
+        if used > max_tokens:
+            break
+        words.append(word)
+    return " ".join(words) + "..." if words else ""
+
+
+class ContextAssembler:
+    """
+    Fits retrieved chunks and conversation history into per-request token budgets.
+
+    Args:
+        results_budget: Max tokens of search results passed to the model per tool call
+        history_budget: Max tokens of conversation history per request
+        per_chunk_overhead: Tokens reserved for each result's "[Course - Lesson N]" header
+        min_trim_tokens: Smallest partial chunk worth keeping when trimming to fit
+    """
+
+    def __init__(self, results_budget: int, history_budget: int,
+                 per_chunk_overhead: int = 12, min_trim_tokens: int = 40):
+        self.results_budget = results_budget
+        self.history_budget = history_budget
+        self.per_chunk_overhead = per_chunk_overhead
+        self.min_trim_tokens = min_trim_tokens
+
+    def fit_results(self, results: SearchResults) -> SearchResults:
+        """
+        Strip chunk prefixes and drop or trim the lowest-scoring chunks until
+        the results fit the budget. Kept chunks retain their retrieval order.
+        """
+        documents = [strip_chunk_prefix(doc) for doc in results.documents]
+
+        # Best matches first: smallest distance, falling back to retrieval order
+        order = list(range(len(documents)))
+        has_distances = len(results.distances) == len(documents)
+        if has_distances:
+            order.sort(key=lambda i: results.distances[i])
+
+        remaining = self.results_budget
+        kept = {}
+        for i in order:
+            cost = estimate_tokens(documents[i]) + self.per_chunk_overhead
+            if cost <= remaining:
+                kept[i] = documents[i]
+                remaining -= cost
+                continue
+            available = remaining - self.per_chunk_overhead
+            if available >= self.min_trim_tokens:
+                trimmed = truncate_to_tokens(documents[i], available)
+                if trimmed:
+                    kept[i] = trimmed
+            break
+
+        indices = sorted(kept)
+        return SearchResults(
+            documents=[kept[i] for i in indices],
+            metadata=[results.metadata[i] for i in indices],
+            distances=[results.distances[i] for i in indices] if has_distances else [],
+            error=results.error
+        )
+
+    def fit_history(self, lines: Sequence[str]) -> List[str]:
+        """
+        Keep the most recent formatted history lines that fit the budget.
+        The newest line is truncated rather than dropped if it alone is too long.
+        """
+        kept: List[str] = []
+        remaining = self.history_budget
+        for line in reversed(lines):
+            cost = estimate_tokens(line)
+            if cost > remaining:
+                if not kept and remaining >= self.min_trim_tokens:
+                    kept.append(truncate_to_tokens(line, remaining))
+                break
+            kept.append(line)
+            remaining -= cost
+        kept.reverse()
+        return kept
@@ -3,6 +3,11 @@ import re
 from typing import List, Tuple
 from models import Course, Lesson, CourseChunk
 
+# Better sentence splitting that handles abbreviations
+# This regex looks for periods followed by whitespace and capital letters
+# but ignores common abbreviations
+SENTENCE_ENDINGS = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\!|\?)\s+(?=[A-Z])')
+
 class DocumentProcessor:
     """Processes course documents and extracts structured information"""
     
@@ -28,11 +33,7 @@ class DocumentProcessor:
         # Clean up the text
         text = re.sub(r'\s+', ' ', text.strip())  # Normalize whitespace
         
-        # Better sentence splitting that handles abbreviations
-        # This regex looks for periods followed by whitespace and capital letters
-        # but ignores common abbreviations
-        sentence_endings = re.compile(r'(?<!\w\.\w.)(?<![A-Z][a-z]\.)(?<=\.|\!|\?)\s+(?=[A-Z])')
-        sentences = sentence_endings.split(text)
+        sentences = SENTENCE_ENDINGS.split(text)
         
         # Clean sentences
         sentences = [s.strip() for s in sentences if s.strip()]
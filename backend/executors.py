@@ -0,0 +1,157 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from request_context import current_context
+
+
+class ExecutorSaturated(RuntimeError):
+    """Raised when a stage's queue is full and work is rejected"""
+
+
+class BoundedExecutor:
+    """
+    Thread pool for one pipeline stage with a cap on queued work.
+
+    At most `workers` tasks run and `max_queue` more wait; further submissions
+    raise ExecutorSaturated instead of growing an unbounded backlog. Tasks run
+    with a copy of the submitter's context variables, so request-scoped state
+    follows the work into the pool. A task submitted from one of the pool's own
+    threads runs inline, so nested calls can't deadlock waiting for a slot.
+
+    Args:
+        name: Stage name used in stats and thread names
+        workers: Threads executing tasks
+        max_queue: Tasks allowed to wait for a free thread
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-stage")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.queued = 0          # Tasks waiting for a thread right now
+        self.running = 0         # Tasks executing right now
+        self.wait_seconds = 0.0  # Total time tasks spent queued
+        self.busy_seconds = 0.0  # Total time threads spent executing tasks
+        self.max_wait_seconds = 0.0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs), or raise ExecutorSaturated if the queue is full"""
+        if getattr(self._local, "inside", False):
+            future: Future = Future()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            return future
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorSaturated(f"{self.name} queue is full ({self.max_queue} waiting)")
+
+        context = contextvars.copy_context()
+        queued_at = time.perf_counter()
+        with self._lock:
+            self.submitted += 1
+            self.queued += 1
+
+        def task():
+            started = time.perf_counter()
+            with self._lock:
+                self.queued -= 1
+                self.running += 1
+                waited = started - queued_at
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self._local.inside = True
+            try:
+                # Skip work whose request was cancelled while it was queued
+                request = context.run(current_context)
+                if request is not None:
+                    request.check(f"{self.name} stage")
+                return context.run(fn, *args, **kwargs)
+            finally:
+                self._local.inside = False
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+                    self.busy_seconds += time.perf_counter() - started
+                self._slots.release()
+
+        try:
+            return self._pool.submit(task)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Submit fn and wait for its result"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def get_stats(self) -> Dict[str, float]:
+        """Queue depth, throughput, queue wait and thread utilisation since start"""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            return {
+                "workers": self.workers,
+                "queue_limit": self.max_queue,
+                "queued": self.queued,
+                "running": self.running,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": 1000 * self.wait_seconds / self.completed if self.completed else 0.0,
+                "max_wait_ms": 1000 * self.max_wait_seconds,
+                "utilisation": self.busy_seconds / (elapsed * self.workers) if elapsed else 0.0,
+            }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+class StageExecutors:
+    """
+    Separately sized pools for the stages that block on CPU or disk, so a burst
+    of one kind of work (e.g. bulk ingestion) can't starve another
+    (interactive search).
+
+    - embedding: query embeddings for interactive searches
+    - search: Chroma queries and catalog lookups
+    - ingest: document writes, including their embeddings
+    """
+
+    def __init__(self, embedding_workers: int = 2, search_workers: int = 4,
+                 ingest_workers: int = 1, max_queue: int = 64):
+        self.embedding = BoundedExecutor("embedding", embedding_workers, max_queue)
+        self.search = BoundedExecutor("search", search_workers, max_queue)
+        self.ingest = BoundedExecutor("ingest", ingest_workers, max_queue)
+
+    def stage(self, name: str) -> BoundedExecutor:
+        return getattr(self, name)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Stats of every stage pool, keyed by stage name"""
+        return {pool.name: pool.get_stats() for pool in (self.embedding, self.search, self.ingest)}
+
+    def shutdown(self, wait: bool = True):
+        for pool in (self.embedding, self.search, self.ingest):
+            pool.shutdown(wait=wait)
+
+
+def run_in_stage(executors: Optional[StageExecutors], stage: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run fn in the named stage's pool, or inline when no executors are configured"""
+    if executors is None:
+        return fn(*args, **kwargs)
+    return executors.stage(stage).run(fn, *args, **kwargs)
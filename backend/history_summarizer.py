@@ -0,0 +1,58 @@
+from typing import List, Sequence
+from context_budget import SENTENCE_END, estimate_tokens, truncate_to_tokens
+from session_store import Message
+
+
+class ExtractiveSummarizer:
+    """
+    Folds old conversation turns into a short running summary without an LLM call.
+
+    Each folded message contributes its first sentence, shortened to
+    `sentence_tokens`. When the summary grows past `max_tokens` its oldest
+    sentences are dropped, so the most recent topics survive.
+
+    Args:
+        max_tokens: Upper bound on the summary's estimated token count
+        sentence_tokens: Longest excerpt kept from a single message
+    """
+
+    def __init__(self, max_tokens: int = 150, sentence_tokens: int = 30):
+        self.max_tokens = max_tokens
+        self.sentence_tokens = sentence_tokens
+
+    def summarize(self, previous_summary: str, messages: Sequence[Message]) -> str:
+        """
+        Extend a summary with the messages being folded out of the history.
+
+        Args:
+            previous_summary: Current summary, empty if there is none
+            messages: Messages being removed from the history, oldest first
+
+        Returns:
+            The new summary text
+        """
+        sentences = [s for s in SENTENCE_END.split(previous_summary) if s]
+        for message in messages:
+            excerpt = self._excerpt(message.content)
+            if excerpt:
+                label = "User asked" if message.role == "user" else "Assistant answered"
+                sentences.append(f"{label}: {excerpt}")
+        return self._fit(sentences)
+
+    def _excerpt(self, content: str) -> str:
+        """First sentence of content, cut to sentence_tokens and terminated"""
+        first = SENTENCE_END.split(content.strip(), maxsplit=1)[0].strip()
+        first = truncate_to_tokens(" ".join(first.split()), self.sentence_tokens)
+        if first and first[-1] not in ".!?":
+            first += "."
+        return first
+
+    def _fit(self, sentences: List[str]) -> str:
+        """Drop the oldest sentences until the summary fits max_tokens"""
+        costs = [estimate_tokens(s) for s in sentences]
+        total = sum(costs)
+        start = 0
+        while start < len(sentences) and total > self.max_tokens:
+            total -= costs[start]
+            start += 1
+        return " ".join(sentences[start:])
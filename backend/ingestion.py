@@ -0,0 +1,312 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+class IngestionProgress:
+    """
+    Thread-safe progress of a folder ingestion run.
+
+    Updated by the ingesting thread and read by status endpoints; all counters
+    are read together in `snapshot`.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.state = "pending"  # "pending", "running", "done" or "failed"
+        self.files_total = 0
+        self.files_done = 0      # Processed files, including skipped and failed ones
+        self.files_failed = 0
+        self.courses_added = 0
+        self.chunks_embedded = 0
+        self.current_file: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start(self, files_total: int):
+        with self._lock:
+            self.state = "running"
+            self.files_total = files_total
+            self.started_at = self.clock()
+
+    def file_started(self, file_name: str):
+        with self._lock:
+            self.current_file = file_name
+
+    def file_done(self, chunks: int = 0, added: bool = False, failed: bool = False):
+        with self._lock:
+            self.files_done += 1
+            self.chunks_embedded += chunks
+            self.courses_added += 1 if added else 0
+            self.files_failed += 1 if failed else 0
+            self.current_file = None
+
+    def finish(self, error: Optional[str] = None):
+        with self._lock:
+            self.state = "failed" if error else "done"
+            self.error = error
+            self.current_file = None
+            self.finished_at = self.clock()
+
+    @property
+    def complete(self) -> bool:
+        return self.state in ("done", "failed")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters plus derived rate (chunks/s) and ETA for the remaining files"""
+        with self._lock:
+            end = self.finished_at if self.finished_at is not None else self.clock()
+            elapsed = end - self.started_at if self.started_at is not None else 0.0
+            rate = self.chunks_embedded / elapsed if elapsed > 0 else 0.0
+            eta = None
+            if self.state == "running" and self.files_done:
+                remaining = self.files_total - self.files_done
+                eta = elapsed / self.files_done * remaining
+            return {
+                "state": self.state,
+                "files_total": self.files_total,
+                "files_done": self.files_done,
+                "files_failed": self.files_failed,
+                "courses_added": self.courses_added,
+                "chunks_embedded": self.chunks_embedded,
+                "current_file": self.current_file,
+                "elapsed_seconds": elapsed,
+                "chunks_per_second": rate,
+                "eta_seconds": eta,
+                "error": self.error,
+            }
+
+
+class BackgroundIngestor:
+    """
+    Runs a folder ingestion on a daemon thread so the server can accept
+    traffic immediately; queries are answered from whatever is indexed so far.
+
+    Args:
+        ingest: Callable taking (folder_path, clear_existing, progress), e.g.
+            RAGSystem.add_course_folder
+    """
+
+    def __init__(self, ingest: Callable[..., Any]):
+        self.ingest = ingest
+        self.progress = IngestionProgress()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, folder_path: str, clear_existing: bool = False) -> IngestionProgress:
+        """Begin ingesting folder_path in the background and return its progress"""
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("Ingestion is already running")
+        self.progress = IngestionProgress()
+        self._thread = threading.Thread(
+            target=self._run, args=(folder_path, clear_existing, self.progress),
+            name="background-ingestion", daemon=True
+        )
+        self._thread.start()
+        return self.progress
+
+    def _run(self, folder_path: str, clear_existing: bool, progress: IngestionProgress):
+        try:
+            courses, chunks = self.ingest(folder_path, clear_existing, progress)
+            print(f"Loaded {courses} courses with {chunks} chunks")
+            progress.finish()
+        except Exception as e:
+            print(f"Error loading documents: {e}")
+            progress.finish(str(e))
+
+    def join(self, timeout: Optional[float] = None):
+        """Wait for the current run to finish (mainly for tests and scripts)"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def check_readiness(progress: IngestionProgress, course_count: int, min_courses: int,
+                    require_complete: bool) -> Tuple[bool, List[str]]:
+    """
+    Decide whether the server should receive traffic.
+
+    Args:
+        progress: Startup ingestion progress
+        course_count: Courses currently indexed
+        min_courses: Courses that must be searchable before the server is ready
+        require_complete: Also wait for startup ingestion to finish
+
+    Returns:
+        Tuple of (ready, reasons it is not ready)
+    """
+    reasons = []
+    if course_count < min_courses:
+        reasons.append(f"{course_count} of {min_courses} required courses indexed")
+    if require_complete and not progress.complete:
+        reasons.append(f"startup ingestion {progress.state}")
+    return not reasons, reasons
+
+
+class IngestQueueFull(RuntimeError):
+    """Raised when the ingestion job queue has no room for more uploads"""
+
+
+class CourseAlreadyIndexed(ValueError):
+    """Raised when a document's course title is already in the index"""
+
+    def __init__(self, title: str):
+        super().__init__(f"Course already indexed: {title}")
+        self.title = title
+
+
+@dataclass
+class IngestJob:
+    """One uploaded document moving through the ingestion queue"""
+    id: str
+    file_name: str
+    path: str
+    status: str = "queued"  # "queued", "running", "done", "skipped" (already indexed) or "failed"
+    course_title: Optional[str] = None
+    chunks: int = 0
+    error: Optional[str] = None
+    queued_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status with queue wait and processing time in milliseconds"""
+        wait_end = self.started_at if self.started_at is not None else time.time()
+        processing_ms = None
+        if self.started_at is not None and self.finished_at is not None:
+            processing_ms = 1000 * (self.finished_at - self.started_at)
+        return {
+            "job_id": self.id,
+            "file_name": self.file_name,
+            "status": self.status,
+            "course_title": self.course_title,
+            "chunks": self.chunks,
+            "error": self.error,
+            "queued_at": self.queued_at,
+            "queue_wait_ms": 1000 * (wait_end - self.queued_at),
+            "processing_ms": processing_ms,
+        }
+
+
+class IngestionJobQueue:
+    """
+    Bounded queue of uploaded documents processed by background workers.
+    Each job's file is deleted once processed.
+
+    Submissions beyond `max_queue` waiting jobs raise IngestQueueFull so the
+    API can push back instead of buffering without limit. Finished jobs are
+    kept for status queries, up to `max_jobs` most recent.
+
+    Jobs whose course is already indexed end as "skipped"; any other error
+    raised while processing fails the job with that error.
+
+    Args:
+        process: Callable taking a file path and returning (course, chunk
+            count), with course None if the document couldn't be parsed,
+            e.g. RAGSystem.add_course_document
+        workers: Threads processing jobs
+        max_queue: Jobs allowed to wait
+        max_jobs: Job records retained for status queries
+    """
+
+    def __init__(self, process: Callable[[str], Tuple[Any, int]], workers: int = 1,
+                 max_queue: int = 16, max_jobs: int = 1000):
+        self.process = process
+        self.max_queue = max_queue
+        self.max_jobs = max_jobs
+        self._pending: Deque[IngestJob] = deque()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._cond = threading.Condition()
+        self.rejected = 0
+        self._workers = [
+            threading.Thread(target=self._work, name=f"ingest-job-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def has_room(self, count: int = 1) -> bool:
+        with self._cond:
+            return len(self._pending) + count <= self.max_queue
+
+    def submit(self, files: List[Tuple[str, str]]) -> List[IngestJob]:
+        """
+        Queue (file_name, path) pairs as jobs, all or none.
+
+        Raises:
+            IngestQueueFull: If the queue lacks room for every file
+        """
+        with self._cond:
+            if len(self._pending) + len(files) > self.max_queue:
+                self.rejected += 1
+                raise IngestQueueFull(f"Ingestion queue is full ({self.max_queue} jobs waiting)")
+            jobs = [IngestJob(uuid.uuid4().hex, file_name, path) for file_name, path in files]
+            for job in jobs:
+                self._pending.append(job)
+                self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                oldest_id, oldest = next(iter(self._jobs.items()))
+                if oldest.status in ("queued", "running"):
+                    break
+                del self._jobs[oldest_id]
+            self._cond.notify(len(jobs))
+        return jobs
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, or None if unknown"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return job.to_dict() if job else None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                "queued": len(self._pending),
+                "running": statuses.count("running"),
+                "done": statuses.count("done"),
+                "skipped": statuses.count("skipped"),
+                "failed": statuses.count("failed"),
+                "rejected": self.rejected,
+            }
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                job = self._pending.popleft()
+                job.status = "running"
+                job.started_at = time.time()
+            self._run(job)
+
+    def _run(self, job: IngestJob):
+        course, chunks, error, status = None, 0, None, "done"
+        try:
+            course, chunks = self.process(job.path)
+            if course is None:
+                error, status = "Could not parse the document as a course", "failed"
+        except CourseAlreadyIndexed as e:
+            error, status = str(e), "skipped"
+            job.course_title = e.title
+        except Exception as e:
+            print(f"Error ingesting {job.file_name}: {e}")
+            error, status = f"{type(e).__name__}: {e}", "failed"
+        finally:
+            # Uploads are saved alone in a temporary directory; remove both
+            try:
+                os.remove(job.path)
+                os.rmdir(os.path.dirname(job.path))
+            except OSError:
+                pass
+        with self._cond:
+            if course is not None:
+                job.course_title = course.title
+            job.chunks = chunks
+            job.error = error
+            job.status = status
+            job.finished_at = time.time()
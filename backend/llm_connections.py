@@ -0,0 +1,179 @@
+import importlib.util
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Union
+
+import anthropic
+import httpx
+
+from metrics import REGISTRY
+
+LLM_HTTP_REQUESTS = REGISTRY.counter(
+    "rag_llm_http_requests_total", "HTTP requests to the LLM API by connection: new or reused", ("connection",)
+)
+
+# HTTP/2 needs the optional h2 package (pip install "httpx[http2]")
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class _TrackedTransport(httpx.HTTPTransport):
+    """Counts, per request, whether the pool had to open (and TLS-handshake) a new connection"""
+
+    def __init__(self, pool: "LLMConnectionPool", **kwargs: Any):
+        super().__init__(**kwargs)
+        self.pool = pool
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        events = []
+        outer = request.extensions.get("trace")
+
+        def trace(name: str, info: Dict[str, Any]):
+            events.append(name)
+            if outer is not None:
+                outer(name, info)
+
+        request.extensions["trace"] = trace
+        response = super().handle_request(request)
+        # httpcore only emits connect events when it opens a connection for this request
+        self.pool._record(
+            new="connection.connect_tcp.complete" in events,
+            tls="connection.start_tls.complete" in events,
+            http_version=response.extensions.get("http_version", b"").decode() or "unknown",
+            warmup=bool(request.extensions.get("warmup")),
+        )
+        return response
+
+
+class LLMConnectionPool:
+    """
+    Tuned HTTP connection pool for the Anthropic client.
+
+    One httpx client, with keep-alive, a bounded pool and HTTP/2 when the h2
+    package is installed, serves every LLM call. Interactive queries on the
+    event loop and bulk or threaded callers all reach the API through the same
+    synchronous client in worker threads, so they share these connections.
+
+    `warm` opens connections ahead of traffic with cheap unauthenticated
+    requests, so the first query does not pay for TCP and TLS setup;
+    `start_warmer` does so at startup and again whenever no request has used
+    the pool for `warm_interval` seconds, which keeps idle connections from
+    expiring. Each request is counted as using a new or reused connection.
+
+    Args:
+        base_url: API base URL that connections are opened to
+        max_connections: Connections open at once
+        max_keepalive: Idle connections kept for reuse
+        keepalive_expiry: Seconds an idle connection is kept
+        http2: Use HTTP/2 if available
+        warm_connections: Connections `warm` opens; 0 disables warming
+        warm_interval: Idle seconds before connections are re-warmed
+        verify: TLS verification: True, or an SSL context or CA bundle path (e.g. for a local HTTPS stand-in)
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 20, max_keepalive: int = 10,
+                 keepalive_expiry: float = 60.0, http2: bool = True, warm_connections: int = 2,
+                 warm_interval: float = 30.0, verify: Union[bool, str, ssl.SSLContext] = True):
+        self.base_url = base_url.rstrip("/")
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.warm_connections = warm_connections
+        self.warm_interval = warm_interval
+        if isinstance(verify, str):
+            verify = ssl.create_default_context(cafile=verify)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                              keepalive_expiry=keepalive_expiry)
+        transport = _TrackedTransport(self, limits=limits, http2=self.http2, verify=verify)
+        # The SDK's default client settings (timeouts, redirects) on top of our transport
+        self.http_client = anthropic.DefaultHttpxClient(transport=transport)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._warmer: Optional[threading.Thread] = None
+        self.last_used = time.monotonic()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.http_versions: Dict[str, int] = {}
+        self.warm_requests = 0
+        self.warm_failures = 0
+
+    def _record(self, new: bool, tls: bool, http_version: str, warmup: bool):
+        with self._lock:
+            if warmup:
+                self.warm_requests += 1
+            else:
+                self.requests += 1
+                self.new_connections += new
+                self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+                self.last_used = time.monotonic()
+            self.tls_handshakes += tls
+        if not warmup:
+            LLM_HTTP_REQUESTS.inc("new" if new else "reused")
+
+    def warm(self, connections: Optional[int] = None) -> int:
+        """
+        Open up to `connections` (default `warm_connections`) connections at
+        once; over HTTP/2 one multiplexed connection is enough.
+
+        Returns:
+            Number of warm-up requests that got a response
+        """
+        count = self.warm_connections if connections is None else connections
+        if self.http2:
+            count = min(count, 1)
+        if count <= 0:
+            return 0
+
+        def touch(_):
+            try:
+                # Any response will do: only the connection matters, and it returns to the pool
+                self.http_client.get(f"{self.base_url}/", timeout=10.0, extensions={"warmup": True})
+                return True
+            except httpx.HTTPError as e:
+                with self._lock:
+                    self.warm_failures += 1
+                print(f"Warming LLM connection to {self.base_url} failed: {e}")
+                return False
+
+        # Concurrent requests, so each needs its own connection
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return sum(pool.map(touch, range(count)))
+
+    def start_warmer(self):
+        """Warm now, then re-warm whenever the pool sits idle for `warm_interval`"""
+        if self.warm_connections <= 0 or self._warmer is not None:
+            return
+
+        def run():
+            self.warm()
+            while not self._stop.wait(self.warm_interval / 4):
+                with self._lock:
+                    idle = time.monotonic() - self.last_used
+                if idle >= self.warm_interval:
+                    self.warm()
+                    with self._lock:
+                        self.last_used = time.monotonic()  # Next warm-up one interval from now
+
+        self._warmer = threading.Thread(target=run, name="llm-connection-warmer", daemon=True)
+        self._warmer.start()
+
+    def close(self):
+        self._stop.set()
+        self.http_client.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Connection reuse and warm-up counts"""
+        with self._lock:
+            reused = self.requests - self.new_connections
+            return {
+                "http2": self.http2,
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": round(reused / self.requests, 4) if self.requests else None,
+                "tls_handshakes": self.tls_handshakes,
+                "http_versions": dict(self.http_versions),
+                "warm_requests": self.warm_requests,
+                "warm_failures": self.warm_failures,
+                "idle_seconds": round(time.monotonic() - self.last_used, 1),
+            }
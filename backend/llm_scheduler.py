@@ -0,0 +1,280 @@
+import heapq
+import itertools
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import anthropic
+
+from admission import Overloaded, TokenBucket
+from context_budget import estimate_tokens
+from metrics import REGISTRY
+from request_context import INTERACTIVE, PRIORITIES, RequestContext
+
+LLM_QUEUE_SECONDS = REGISTRY.histogram(
+    "rag_llm_queue_wait_seconds", "Time LLM calls waited for rate limit capacity", ("priority",)
+)
+LLM_RETRIES = REGISTRY.counter(
+    "rag_llm_retries_total", "LLM calls retried, by cause: rate_limited, overloaded, server_error, conflict (408/409), connection",
+    ("cause",)
+)
+
+POLL_SECONDS = 0.05  # Longest a waiting call sleeps before re-checking cancellation and its place in line
+
+# Statuses worth another attempt, as the SDK's own retry logic has it: timeout, lock conflict, rate limit;
+# everything from 500 up, including 529 overloaded, is retried too
+RETRYABLE_STATUSES = (408, 409, 429)
+
+
+class LLMRateLimited(Overloaded):
+    """The LLM's rate limits leave no capacity for this call within its wait budget"""
+
+
+def estimate_request_tokens(params: Dict[str, Any]) -> int:
+    """Estimated input tokens of a Messages API call: system prompt, messages and tool definitions"""
+    tokens = estimate_tokens(params.get("system"))
+    for message in params.get("messages", []):
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += estimate_tokens(content)
+            continue
+        for block in content:
+            if isinstance(block, dict):
+                tokens += estimate_tokens(str(block.get("content") or block.get("text") or ""))
+            else:
+                # Content blocks from an earlier response, e.g. a tool call
+                tokens += estimate_tokens(getattr(block, "text", None) or json.dumps(getattr(block, "input", {})))
+    if params.get("tools"):
+        tokens += estimate_tokens(json.dumps(params["tools"]))
+    return tokens
+
+
+def _retryable(error: anthropic.APIError) -> bool:
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUSES or error.status_code >= 500
+    return isinstance(error, anthropic.APIConnectionError)
+
+
+def _retry_after(error: anthropic.APIStatusError) -> Optional[float]:
+    """Seconds the API asked us to wait, from retry-after-ms or retry-after"""
+    headers = error.response.headers
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            return float(headers[name]) * scale
+        except (KeyError, ValueError):
+            continue
+    return None
+
+
+class LLMScheduler:
+    """
+    Client-side admission for LLM calls against the account's rate limits.
+
+    Calls wait in one queue ordered by priority class, then arrival. The call
+    at the head starts once a requests-per-minute bucket and an input-tokens-
+    per-minute bucket (charged with the call's estimated input tokens, then
+    corrected with the billed count) both have room; bulk calls additionally
+    leave `interactive_reserve` of each bucket to interactive ones. A limit
+    of 0 disables that bucket.
+
+    Rate-limited (429), overloaded (529), timed out (408), conflicting (409),
+    other server errors and connection failures are retried up to `max_retries` times with jittered exponential
+    backoff, waiting at least as long as the retry-after header asks. A 429
+    pauses every queued call, since they share the limit. Calls that cannot
+    start within `max_wait` seconds or their request's deadline, or are still
+    rate limited after the last retry, raise LLMRateLimited (503 at the API).
+
+    Args:
+        requests_per_minute: Requests per minute allowed by the account, 0 for no limit
+        input_tokens_per_minute: Input tokens per minute allowed by the account, 0 for no limit
+        interactive_reserve: Fraction of each bucket bulk calls may not use
+        max_retries: Retries per call after a retryable failure
+        backoff_base: First backoff in seconds, doubled per retry
+        backoff_max: Longest backoff in seconds
+        max_wait: Longest a call may wait for capacity in total, in seconds
+    """
+
+    def __init__(self, requests_per_minute: float = 0, input_tokens_per_minute: float = 0,
+                 interactive_reserve: float = 0.2, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 20.0, max_wait: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic, rng: Optional[random.Random] = None):
+        self.requests_per_minute = requests_per_minute
+        self.input_tokens_per_minute = input_tokens_per_minute
+        self.interactive_reserve = interactive_reserve
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_wait = max_wait
+        self.clock = clock
+        self._random = rng or random.Random()
+        now = clock()
+        self._requests = TokenBucket(requests_per_minute / 60, requests_per_minute, now) if requests_per_minute else None
+        self._tokens = (TokenBucket(input_tokens_per_minute / 60, input_tokens_per_minute, now)
+                        if input_tokens_per_minute else None)
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []  # Heap of (priority rank, arrival)
+        self._arrivals = itertools.count()
+        self._paused_until = 0.0  # Set by a 429; nothing starts before this
+        self.waiting = {priority: 0 for priority in PRIORITIES}
+        self.started = {priority: 0 for priority in PRIORITIES}
+        self.wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+        self.max_wait_seconds = {priority: 0.0 for priority in PRIORITIES}
+        self.rate_limited = 0  # 429 responses seen
+        self.retries = 0
+        self.rejected = 0
+
+    def run(self, call: Callable[[], Any], params: Dict[str, Any], request: Optional[RequestContext] = None):
+        """
+        Run `call` (one Messages API request built from `params`) once there is
+        capacity for it, retrying retryable failures.
+
+        Raises:
+            LLMRateLimited: If there is no capacity in time, or 429/529 persist
+            RequestCancelled: If the request is cancelled or its deadline passes while waiting
+        """
+        priority = request.priority if request is not None else INTERACTIVE
+        estimate = estimate_request_tokens(params)
+        for attempt in itertools.count():
+            self._acquire(priority, estimate, request)
+            try:
+                response = call()
+            except (anthropic.APIStatusError, anthropic.APIConnectionError) as e:
+                if not _retryable(e):
+                    raise
+                self._retry_or_raise(e, attempt, request)
+                continue
+            usage = getattr(response, "usage", None)
+            if usage is not None and isinstance(getattr(usage, "input_tokens", None), int):
+                self._settle(estimate, usage.input_tokens)
+            return response
+
+    def _retry_or_raise(self, error: Exception, attempt: int, request: Optional[RequestContext]):
+        """Sleep before the next attempt, or raise if there should be none"""
+        if isinstance(error, anthropic.APIConnectionError) and request is not None:
+            request.check("llm_retry")  # A stream closed by cancellation, or a timeout at the deadline
+        status = getattr(error, "status_code", None)
+        throttled = status == 429
+        overloaded = status == 529
+        retry_after = _retry_after(error) if isinstance(error, anthropic.APIStatusError) else None
+        backoff = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        delay = max(retry_after or 0.0, backoff) + (self._random.uniform(0, self.backoff_base) if retry_after else 0.0)
+
+        if throttled:
+            with self._cond:
+                self.rate_limited += 1
+                # Everyone shares the limit: hold the whole queue, not just this call
+                self._paused_until = max(self._paused_until, self.clock() + delay)
+                self._cond.notify_all()
+        remaining = request.remaining() if request is not None else None
+        if attempt >= self.max_retries or (remaining is not None and delay > remaining):
+            if throttled or overloaded:
+                with self._cond:
+                    self.rejected += 1
+                raise LLMRateLimited("The language model is rate limited; try again shortly", delay) from error
+            raise error
+
+        cause = ("rate_limited" if throttled else "overloaded" if overloaded
+                 else "connection" if status is None else "server_error" if status >= 500 else "conflict")
+        LLM_RETRIES.inc(cause)
+        with self._cond:
+            self.retries += 1
+        if not throttled:
+            # A throttled call waits out the pause in the queue instead
+            time.sleep(delay)
+
+    def _acquire(self, priority: str, estimate: int, request: Optional[RequestContext]):
+        """Wait for this call's turn and capacity, then take it from the buckets"""
+        entry = (PRIORITIES.index(priority), next(self._arrivals))
+        queued_at = self.clock()
+        with self._cond:
+            heapq.heappush(self._queue, entry)
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    if request is not None:
+                        request.check("llm_queue")
+                    now = self.clock()
+                    waited = now - queued_at
+                    if self._queue[0] == entry:
+                        wait = self._ready_in(now, priority, estimate)
+                        if not wait:
+                            self._take(now, estimate)
+                            break
+                        budget = self.max_wait - waited
+                        if request is not None and request.remaining() is not None:
+                            budget = min(budget, request.remaining())
+                        if wait > budget:
+                            self.rejected += 1
+                            raise LLMRateLimited("The language model is at its rate limit", wait)
+                    elif waited > self.max_wait:
+                        self.rejected += 1
+                        raise LLMRateLimited("Timed out waiting for the language model", POLL_SECONDS)
+                    else:
+                        wait = POLL_SECONDS
+                    self._cond.wait(min(wait, POLL_SECONDS))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self.waiting[priority] -= 1
+                self._cond.notify_all()
+            waited = self.clock() - queued_at
+            self.started[priority] += 1
+            self.wait_seconds[priority] += waited
+            self.max_wait_seconds[priority] = max(self.max_wait_seconds[priority], waited)
+        LLM_QUEUE_SECONDS.observe(waited, priority)
+
+    def _ready_in(self, now: float, priority: str, estimate: int) -> float:
+        """Seconds until a call could start; bulk calls leave the reserve untouched"""
+        reserve = 0.0 if priority == INTERACTIVE else self.interactive_reserve
+        wait = max(0.0, self._paused_until - now)
+        if self._requests is not None:
+            wait = max(wait, self._requests.ready_in(now, 1 + reserve * self._requests.burst))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.ready_in(now, estimate + reserve * self._tokens.burst))
+        return wait
+
+    def _take(self, now: float, estimate: int):
+        if self._requests is not None:
+            self._requests.take(now)
+        if self._tokens is not None:
+            self._tokens.take(now, estimate)
+
+    def _settle(self, estimate: int, billed: int):
+        """Correct the token bucket once the billed input tokens are known"""
+        if self._tokens is None:
+            return
+        with self._cond:
+            self._tokens.tokens = min(self._tokens.burst, self._tokens.tokens - (billed - estimate))
+
+    def queue_depth(self) -> int:
+        """Calls currently waiting for capacity"""
+        with self._cond:
+            return len(self._queue)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Remaining capacity, queue depth and wait times per priority, and retry counts"""
+        with self._cond:
+            now = self.clock()
+            available = {}
+            for name, bucket in (("requests", self._requests), ("input_tokens", self._tokens)):
+                if bucket is not None:
+                    bucket.ready_in(now, 0)  # Refill to now
+                    available[name] = round(bucket.tokens, 1)
+            return {
+                "requests_per_minute": self.requests_per_minute,
+                "input_tokens_per_minute": self.input_tokens_per_minute,
+                "available": available,
+                "waiting": dict(self.waiting),
+                "started": dict(self.started),
+                "avg_wait_ms": {
+                    priority: 1000 * self.wait_seconds[priority] / count if count else 0.0
+                    for priority, count in self.started.items()
+                },
+                "max_wait_ms": {priority: 1000 * seconds for priority, seconds in self.max_wait_seconds.items()},
+                "rate_limited_responses": self.rate_limited,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "paused_seconds": max(0.0, self._paused_until - now),
+            }
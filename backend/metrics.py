@@ -0,0 +1,318 @@
+import glob
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Seconds; spans a cached embedding (~1ms) to a slow LLM call (~30s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Counter:
+    """Monotonic counter, one value per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        with self._lock:
+            return self._values.get(labels, 0.0)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = [[list(labels), value] for labels, value in self._values.items()]
+        return {"type": self.kind, "help": self.documentation, "labelnames": list(self.labelnames),
+                "samples": samples}
+
+
+class Gauge(Counter):
+    """Value that goes up and down, e.g. a queue depth; summed across processes like a counter"""
+
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class _Timer:
+    """Observes the elapsed time of a `with` block into a histogram, counting errors if given a counter"""
+
+    __slots__ = ("histogram", "labels", "errors", "started")
+
+    def __init__(self, histogram: "Histogram", labels: Tuple[str, ...], errors: Optional[Counter] = None):
+        self.histogram = histogram
+        self.labels = labels
+        self.errors = errors
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self.started, *self.labels)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc(*self.labels)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, one per combination of label values.
+
+    Observations only bump one bucket count, the sum and the count under a
+    lock, so timing a stage costs about a microsecond.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: [bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager timing its block, e.g. `with STAGE_SECONDS.time("embedding"):`"""
+        return _Timer(self, labels)
+
+    def count(self, *labels: str) -> int:
+        with self._lock:
+            entry = self._values.get(labels)
+            return entry[2] if entry else 0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            samples = [[list(labels), list(counts), total, count]
+                       for labels, (counts, total, count) in self._values.items()]
+        return {"type": self.kind, "help": self.documentation, "labelnames": list(self.labelnames),
+                "buckets": list(self.buckets), "samples": samples}
+
+
+class MetricsRegistry:
+    """
+    Named metrics of this process, rendered in the Prometheus text format.
+
+    With `directory` set, each process writes its snapshot there (see
+    `flush`) and `render` sums the snapshots of every process, so any uvicorn
+    worker can answer a scrape for all of them. Snapshots of processes that
+    have exited are deleted when merging, so a restart does not keep their
+    counts (and gauges) forever; Prometheus treats the drop as a counter
+    reset. The directory is meant for the workers of one host.
+
+    Args:
+        directory: Optional directory shared by the worker processes
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def share_between_processes(self, directory: Optional[str], flush_interval: float):
+        """Publish this process's metrics in `directory`, flushing every `flush_interval` seconds"""
+        if not directory:
+            return
+        self.directory = directory
+        self.flush()
+        self.start_flusher(flush_interval)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def flush(self):
+        """Atomically write this process's snapshot into the shared directory"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(temp_path, path)
+
+    def start_flusher(self, interval: float):
+        """Flush every `interval` seconds on a daemon thread (no-op without a directory)"""
+        if not self.directory or self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Error writing metrics snapshot: {e}")
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def collect(self) -> Dict[str, Dict]:
+        """Snapshot of this process, or the sum over all processes with a directory"""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            pid = os.path.basename(path)[len("metrics-"):-len(".json")]
+            if pid.isdigit() and not _process_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass  # Another worker removed it first
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Skipping unreadable metrics snapshot {path}: {e}")
+        return merge_snapshots(snapshots)
+
+    def render(self) -> str:
+        return render_prometheus(self.collect())
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)  # Signal 0 only checks that the process exists
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Sum per-process snapshots metric by metric and label set"""
+    merged: Dict[str, Dict] = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            for sample in metric["samples"]:
+                labels = tuple(sample[0])
+                if metric["type"] in ("counter", "gauge"):
+                    target["samples"][labels] = target["samples"].get(labels, 0.0) + sample[1]
+                else:
+                    counts, total, count = target["samples"].get(labels, ([0] * len(sample[1]), 0.0, 0))
+                    target["samples"][labels] = (
+                        [a + b for a, b in zip(counts, sample[1])], total + sample[2], count + sample[3]
+                    )
+    for metric in merged.values():
+        metric["samples"] = [[list(labels), *(value if isinstance(value, tuple) else (value,))]
+                             for labels, value in metric["samples"].items()]
+    return merged
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(snapshot: Dict[str, Dict]) -> str:
+    """Render a snapshot in the Prometheus text exposition format (version 0.0.4)"""
+    lines: List[str] = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric["labelnames"]
+        for sample in sorted(metric["samples"], key=lambda s: s[0]):
+            labels = sample[0]
+            if metric["type"] in ("counter", "gauge"):
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(sample[1])}")
+                continue
+            counts, total, count = sample[1], sample[2], sample[3]
+            cumulative = 0
+            for bound, bucket_count in zip([*metric["buckets"], math.inf], counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                lines.append(f"{name}_bucket{_format_labels(labelnames, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{name}_count{_format_labels(labelnames, labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+# Process-wide registry; the app shares it between worker processes via METRICS_DIR
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each query stage: embedding, resolve_course, chroma_query, "
+    "link_lookup, llm_call, llm_followup",
+    ("stage",)
+)
+STAGE_ERRORS = REGISTRY.counter("rag_stage_errors_total", "Query stages that raised an error", ("stage",))
+QUERY_SECONDS = REGISTRY.histogram(
+    "rag_query_duration_seconds", "End-to-end time to answer a query", ("mode",)
+)
+ADMISSION_REQUESTS = REGISTRY.gauge(
+    "rag_admission_requests", "Queries holding or waiting for a concurrency slot", ("state",)
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "rag_admission_rejections_total", "Queries turned away before any work: queue_full, timeout, rate_limited",
+    ("reason",)
+)
+
+
+def time_stage(stage: str) -> _Timer:
+    """Time a query stage into STAGE_SECONDS, counting it in STAGE_ERRORS if it raises"""
+    return _Timer(STAGE_SECONDS, (stage,), STAGE_ERRORS)
@@ -0,0 +1,151 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from metrics import REGISTRY
+
+LLM_ROUTES = REGISTRY.counter(
+    "rag_llm_routes_total", "LLM calls by chosen model and routing reason", ("model", "reason")
+)
+LLM_MODEL_SECONDS = REGISTRY.histogram(
+    "rag_llm_model_duration_seconds", "Duration of successful LLM calls by model", ("model",)
+)
+
+# Wording that suggests a question needs the primary model's reasoning
+COMPLEX_MARKERS = re.compile(
+    r"\b(compare|contrast|differences?|versus|vs|why|explain|how (does|do|can|should)|step[- ]by[- ]step|"
+    r"summari[sz]e|analy[sz]e|pros and cons|trade-?offs?|design|implement|code|debug)\b",
+    re.IGNORECASE,
+)
+
+MIN_LATENCY_SAMPLES = 5  # Primary calls needed in the window before the SLO is judged
+
+
+def is_simple_query(query: str, max_words: int) -> bool:
+    """A short, single question without wording that asks for comparison, explanation or code"""
+    return len(query.split()) <= max_words and query.count("?") <= 1 and not COMPLEX_MARKERS.search(query)
+
+
+class ModelRouter:
+    """
+    Chooses between the primary and a fast model for each LLM call.
+
+    The fast model gets, in order of precedence:
+
+    - synthesis: answering from tool results or pre-retrieved context
+    - queue_depth: calls made while `max_queue_depth` or more LLM calls wait
+      for rate limit capacity
+    - latency_slo: calls made while the primary model's p95 over the last
+      `latency_window` seconds exceeds `latency_slo`; its samples age out of
+      the window, so the primary model is tried again once load passes
+    - simple_query: first calls for short questions without history
+
+    Everything else goes to the primary model ("default"). Each decision and
+    the duration of each successful call are recorded per model.
+
+    Args:
+        primary_model: Model for everything not routed elsewhere
+        fast_model: Cheaper, lower-latency model
+        simple_max_words: Longest query treated as simple; 0 disables
+        synthesis_on_fast: Whether synthesis calls use the fast model
+        max_queue_depth: Waiting LLM calls that switch new calls to the fast model; 0 disables
+        latency_slo: Primary model p95 seconds that switches new calls to the fast model; 0 disables
+        latency_window: Seconds of recent calls kept per model
+        queue_depth: Returns the number of LLM calls waiting for capacity
+    """
+
+    def __init__(self, primary_model: str, fast_model: str, simple_max_words: int = 12,
+                 synthesis_on_fast: bool = True, max_queue_depth: int = 4, latency_slo: float = 10.0,
+                 latency_window: float = 60.0, queue_depth: Callable[[], int] = lambda: 0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.primary_model = primary_model
+        self.fast_model = fast_model
+        self.simple_max_words = simple_max_words
+        self.synthesis_on_fast = synthesis_on_fast
+        self.max_queue_depth = max_queue_depth
+        self.latency_slo = latency_slo
+        self.latency_window = latency_window
+        self.queue_depth = queue_depth
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._recent: Dict[str, Deque[Tuple[float, float]]] = {primary_model: deque(), fast_model: deque()}
+        self._calls: Dict[str, int] = {primary_model: 0, fast_model: 0}
+        self.decisions: Dict[str, int] = {}
+
+    def choose(self, stage: str, query: str, has_history: bool = False, synthesis: bool = False) -> Tuple[str, str]:
+        """
+        Model for one call.
+
+        Args:
+            stage: "llm_call" for the first call of a request, "llm_followup" after tool use
+            query: The user's question
+            has_history: Whether earlier conversation is sent with the call
+            synthesis: Whether the call answers from tool results or retrieved context
+
+        Returns:
+            Tuple of (model, reason)
+        """
+        if synthesis and self.synthesis_on_fast:
+            reason = "synthesis"
+        elif self.max_queue_depth and self.queue_depth() >= self.max_queue_depth:
+            reason = "queue_depth"
+        elif self.latency_slo and self._primary_p95() > self.latency_slo:
+            reason = "latency_slo"
+        elif (stage == "llm_call" and not has_history and self.simple_max_words
+              and is_simple_query(query, self.simple_max_words)):
+            reason = "simple_query"
+        else:
+            reason = "default"
+        model = self.primary_model if reason == "default" else self.fast_model
+        LLM_ROUTES.inc(model, reason)
+        with self._lock:
+            self.decisions[reason] = self.decisions.get(reason, 0) + 1
+        return model, reason
+
+    def record(self, model: str, seconds: float):
+        """Record the duration of a successful call"""
+        LLM_MODEL_SECONDS.observe(seconds, model)
+        now = self.clock()
+        with self._lock:
+            recent = self._recent.setdefault(model, deque())
+            recent.append((now, seconds))
+            self._calls[model] = self._calls.get(model, 0) + 1
+            self._prune(recent, now)
+
+    def _prune(self, recent: Deque[Tuple[float, float]], now: float):
+        while recent and recent[0][0] < now - self.latency_window:
+            recent.popleft()
+
+    def _latencies(self, model: str):
+        """Sorted durations of the model's calls in the window"""
+        with self._lock:
+            recent = self._recent.get(model, deque())
+            self._prune(recent, self.clock())
+            return sorted(seconds for _, seconds in recent)
+
+    def _primary_p95(self) -> float:
+        latencies = self._latencies(self.primary_model)
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+
+    def get_stats(self) -> Dict:
+        """Routing decisions by reason, and call counts and recent latency per model"""
+        models = {}
+        for model in list(self._calls):
+            latencies = self._latencies(model)
+
+            def at(fraction: float) -> Optional[float]:
+                if not latencies:
+                    return None
+                return round(1000 * latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 1)
+
+            with self._lock:
+                calls = self._calls[model]
+            models[model] = {"calls": calls, "recent_calls": len(latencies), "p50_ms": at(0.5), "p95_ms": at(0.95)}
+        with self._lock:
+            decisions = dict(self.decisions)
+        return {"primary_model": self.primary_model, "fast_model": self.fast_model,
+                "decisions": decisions, "models": models}
@@ -0,0 +1,127 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+from vector_store import VectorStore, SearchResults
+
+
+@dataclass
+class RouteDecision:
+    """Outcome of routing a single query"""
+    course_specific: bool
+    course_title: Optional[str] = None  # Catalog title detected in the query, if any
+    reason: str = ""                    # "catalog", "keyword", "embedding" or "general"
+    results: Optional[SearchResults] = None  # Unfiltered search already run for an "embedding" decision
+
+
+class QueryRouter:
+    """
+    Cheap local router that decides, before any LLM call, whether a query needs
+    course content. Checks run from cheapest to most expensive:
+
+    1. Catalog-name detection against the known course titles
+    2. Course vocabulary keywords ("lesson", "instructor", ...)
+    3. Embedding distance of the closest content chunk
+
+    The embedding check runs the same unfiltered search the answer needs
+    (`search_limit` results, None for the store default) and returns it in
+    the decision, so the routed pipeline doesn't search twice.
+    """
+
+    COURSE_KEYWORDS = {
+        "course", "courses", "lesson", "lessons", "instructor", "instructors",
+        "module", "outline", "syllabus", "curriculum", "taught", "teaches"
+    }
+
+    STOPWORDS = {
+        "a", "an", "and", "the", "of", "for", "to", "in", "on", "with", "by",
+        "from", "at", "or", "is", "are", "use", "using", "build", "building",
+        "towards", "toward", "into", "your"
+    }
+
+    def __init__(self, vector_store: VectorStore, distance_threshold: float = 1.0,
+                 search_limit: Optional[int] = None):
+        self.store = vector_store
+        self.distance_threshold = distance_threshold
+        self.search_limit = search_limit
+        self._loaded = False  # Catalog read at least once; ingestion refreshes it explicitly
+        # (course title -> distinctive tokens, upper-case acronym -> course title), replaced as one
+        self._index: Tuple[Dict[str, Set[str]], Dict[str, str]] = ({}, {})
+
+    def refresh_catalog(self):
+        """
+        Rebuild the title index from the course catalog.
+
+        The new index is built aside and swapped in whole, so queries routed
+        on other threads during ingestion see either the old or the new one.
+        """
+        titles = self.store.get_existing_course_titles()
+        title_tokens = {title: self._tokenize(title) for title in titles}
+
+        # Tokens shared by several titles (e.g. "AI", "Anthropic") don't identify a course
+        token_counts: Dict[str, int] = {}
+        for tokens in title_tokens.values():
+            for token in tokens:
+                token_counts[token] = token_counts.get(token, 0) + 1
+
+        catalog = {
+            title: {t for t in tokens if token_counts[t] == 1}
+            for title, tokens in title_tokens.items()
+        }
+        acronyms = {}
+        for title in titles:
+            for word in re.findall(r"\b[A-Z]{2,}\b", title):
+                if token_counts.get(word.lower(), 0) == 1:
+                    acronyms[word] = title
+
+        self._index = (catalog, acronyms)
+        self._loaded = True
+
+    def route(self, query: str) -> RouteDecision:
+        """
+        Decide whether a query is course-specific.
+
+        Args:
+            query: User's question
+
+        Returns:
+            RouteDecision with the detected course title when one was named
+        """
+        if not self._loaded:
+            self.refresh_catalog()
+
+        course_title = self._match_catalog(query)
+        if course_title:
+            return RouteDecision(True, course_title=course_title, reason="catalog")
+
+        if self._tokenize(query) & self.COURSE_KEYWORDS:
+            return RouteDecision(True, reason="keyword")
+
+        search_kwargs = {"limit": self.search_limit} if self.search_limit else {}
+        results = self.store.search(query=query, **search_kwargs)
+        if not results.error and results.distances and results.distances[0] <= self.distance_threshold:
+            return RouteDecision(True, reason="embedding", results=results)
+
+        return RouteDecision(False, reason="general")
+
+    def _match_catalog(self, query: str) -> Optional[str]:
+        """Return the catalog title the query names, if any"""
+        catalog, acronyms = self._index
+        for acronym, title in acronyms.items():
+            if re.search(rf"\b{re.escape(acronym)}\b", query, re.IGNORECASE):
+                return title
+
+        query_tokens = self._tokenize(query)
+        best_title, best_score = None, 0.0
+        for title, tokens in catalog.items():
+            if not tokens:
+                continue
+            matched = len(tokens & query_tokens)
+            score = matched / len(tokens)
+            # Require two distinctive words, or all of them for short titles
+            if (matched >= 2 or score == 1.0) and score > best_score:
+                best_title, best_score = title, score
+        return best_title
+
+    def _tokenize(self, text: str) -> Set[str]:
+        """Lower-case word tokens without stopwords"""
+        return {t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in self.STOPWORDS}
@@ -1,12 +1,32 @@
 from typing import List, Tuple, Optional, Dict
+import asyncio
 import os
+import threading
+import time
 from document_processor import DocumentProcessor
-from vector_store import VectorStore
+from vector_store import VectorStore, AdaptiveRetrieval
 from ai_generator import AIGenerator
+from llm_scheduler import LLMScheduler
+from model_router import ModelRouter
+from llm_connections import LLMConnectionPool
 from session_manager import SessionManager
+from history_summarizer import ExtractiveSummarizer
+from session_store import create_session_store
 from search_tools import ToolManager, CourseSearchTool
+from query_router import QueryRouter
+from singleflight import SingleFlight
+from request_context import RequestCancelled, RequestContext, request_scope
+from context_budget import ContextAssembler, estimate_tokens
+from chunk_merger import ChunkMerger
+from executors import StageExecutors
+from metrics import QUERY_SECONDS
+from tracing import JsonlTraceExporter, SlowRequestProfiler, Tracer
+from usage import UsageLedger
+from ingestion import CourseAlreadyIndexed, IngestionProgress
 from models import Course, Lesson, CourseChunk
 
+DEFAULT_ANTHROPIC_URL = "https://api.anthropic.com"
+
 class RAGSystem:
     """Main orchestrator for the Retrieval-Augmented Generation system"""
     
@@ -15,14 +35,94 @@ class RAGSystem:
         
         # Initialize core components
         self.document_processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
-        self.vector_store = VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
-        self.ai_generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL)
-        self.session_manager = SessionManager(config.MAX_HISTORY)
+        adaptive = None
+        if config.ADAPTIVE_RETRIEVAL:
+            adaptive = AdaptiveRetrieval(
+                candidates=config.ADAPTIVE_CANDIDATES,
+                min_results=config.ADAPTIVE_MIN_RESULTS,
+                max_results=config.ADAPTIVE_MAX_RESULTS,
+                max_distance=config.ADAPTIVE_MAX_DISTANCE,
+                max_gap=config.ADAPTIVE_MAX_GAP
+            )
+        self.executors = StageExecutors(
+            config.EMBEDDING_WORKERS, config.SEARCH_WORKERS, config.INGEST_WORKERS, config.STAGE_QUEUE_LIMIT
+        )
+        self.vector_store = VectorStore(
+            config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS, adaptive, self.executors
+        )
+        self.llm_scheduler = LLMScheduler(
+            config.LLM_REQUESTS_PER_MINUTE, config.LLM_INPUT_TOKENS_PER_MINUTE, config.LLM_INTERACTIVE_RESERVE,
+            config.LLM_MAX_RETRIES, max_wait=config.LLM_MAX_QUEUE_WAIT
+        )
+        self.model_router = None
+        if config.ANTHROPIC_FAST_MODEL and config.ANTHROPIC_FAST_MODEL != config.ANTHROPIC_MODEL:
+            self.model_router = ModelRouter(
+                config.ANTHROPIC_MODEL, config.ANTHROPIC_FAST_MODEL, config.ROUTE_SIMPLE_MAX_WORDS,
+                config.ROUTE_SYNTHESIS_TO_FAST, config.ROUTE_QUEUE_DEPTH, config.ROUTE_LATENCY_SLO,
+                config.ROUTE_LATENCY_WINDOW, self.llm_scheduler.queue_depth
+            )
+        self.llm_connections = LLMConnectionPool(
+            config.ANTHROPIC_BASE_URL or DEFAULT_ANTHROPIC_URL, config.LLM_HTTP_MAX_CONNECTIONS,
+            config.LLM_HTTP_KEEPALIVE_CONNECTIONS, config.LLM_HTTP_KEEPALIVE_EXPIRY, config.LLM_HTTP2,
+            config.LLM_WARM_CONNECTIONS, config.LLM_WARM_INTERVAL, config.ANTHROPIC_CA_BUNDLE or True
+        )
+        self.ai_generator = AIGenerator(
+            config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL, config.ANTHROPIC_BASE_URL or None,
+            self.llm_scheduler, self.model_router, self.llm_connections.http_client
+        )
+        self.context_assembler = ContextAssembler(config.RESULTS_TOKEN_BUDGET, config.HISTORY_TOKEN_BUDGET)
+        session_store = create_session_store(
+            config.SESSION_BACKEND,
+            max_messages=config.MAX_HISTORY * 2,
+            max_sessions=config.MAX_SESSIONS,
+            ttl_seconds=config.SESSION_TTL_SECONDS,
+            db_path=config.SESSION_DB_PATH
+        )
+        summarizer = ExtractiveSummarizer(config.HISTORY_SUMMARY_TOKENS) if config.HISTORY_SUMMARY else None
+        self.session_manager = SessionManager(config.MAX_HISTORY, self.context_assembler, session_store, summarizer)
         
         # Initialize search tools
         self.tool_manager = ToolManager()
-        self.search_tool = CourseSearchTool(self.vector_store)
+        chunk_merger = None
+        if config.MERGE_ADJACENT_CHUNKS:
+            chunk_merger = ChunkMerger(config.MMR_LAMBDA, config.MAX_RESULTS, config.MAX_RESULTS * 2)
+        self.search_tool = CourseSearchTool(self.vector_store, self.context_assembler, chunk_merger)
         self.tool_manager.register_tool(self.search_tool)
+        
+        # Local router for the single-call "routed" pipeline
+        if config.QUERY_MODE not in ("tools", "routed"):
+            raise ValueError(f"Unknown QUERY_MODE '{config.QUERY_MODE}'")
+        self.query_router = QueryRouter(
+            self.vector_store, config.ROUTER_DISTANCE_THRESHOLD, self.search_tool.search_limit
+        )
+        
+        # Coalesces identical in-flight first-turn queries
+        self.query_flight = SingleFlight()
+        
+        # Per-request trace spans, and stack profiles of slow requests
+        profiler = None
+        if config.PROFILE_SLOW_REQUESTS:
+            profiler = SlowRequestProfiler(config.SLOW_REQUEST_SECONDS, config.PROFILE_DIR)
+        exporter = JsonlTraceExporter(config.TRACE_PATH) if config.TRACE_PATH else None
+        self.tracer = Tracer(exporter, config.TRACE_SAMPLE_RATE, profiler)
+        
+        # Billed tokens per request, stage and session
+        prices = {
+            "input_tokens": config.INPUT_TOKEN_PRICE,
+            "output_tokens": config.OUTPUT_TOKEN_PRICE,
+            "cache_creation_input_tokens": config.CACHE_WRITE_TOKEN_PRICE,
+            "cache_read_input_tokens": config.CACHE_READ_TOKEN_PRICE,
+        }
+        self.usage_ledger = UsageLedger(prices, config.USAGE_LOG_PATH or None, config.MAX_SESSIONS)
+        
+        # Serialises uploads' duplicate check with their indexing
+        self._add_lock = threading.Lock()
+        
+        # Requests abandoned by cancellation or deadline, and the stage each stopped before
+        self._cancel_lock = threading.Lock()
+        self.cancelled_requests = {"client_disconnected": 0, "deadline_exceeded": 0}
+        self.cancelled_stages: Dict[str, int] = {}
+        self.cancelled_seconds = 0.0  # Time spent on requests before they were abandoned
     
     def add_course_document(self, file_path: str) -> Tuple[Course, int]:
         """
@@ -33,29 +133,39 @@ class RAGSystem:
             
         Returns:
             Tuple of (Course object, number of chunks created)
+            
+        Raises:
+            CourseAlreadyIndexed: If a course with the same title is already indexed
         """
-        try:
-            # Process the document
-            course, course_chunks = self.document_processor.process_course_document(file_path)
+        # Process the document
+        course, course_chunks = self.document_processor.process_course_document(file_path)
+        
+        # Check and add together, so concurrent uploads of one course add it once
+        with self._add_lock:
+            if course.title in self.vector_store.get_existing_course_titles():
+                raise CourseAlreadyIndexed(course.title)
             
             # Add course metadata to vector store for semantic search
             self.vector_store.add_course_metadata(course)
             
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
-            
-            return course, len(course_chunks)
-        except Exception as e:
-            print(f"Error processing course document {file_path}: {e}")
-            return None, 0
+        self.query_router.refresh_catalog()
+        
+        return course, len(course_chunks)
     
-    def add_course_folder(self, folder_path: str, clear_existing: bool = False) -> Tuple[int, int]:
+    def add_course_folder(self, folder_path: str, clear_existing: bool = False,
+                          progress: Optional[IngestionProgress] = None) -> Tuple[int, int]:
         """
         Add all course documents from a folder.
         
+        Each course becomes searchable (and known to the router) as soon as it
+        is added, so queries can be served while the rest is still loading.
+        
         Args:
             folder_path: Path to folder containing course documents
             clear_existing: Whether to clear existing data first
+            progress: Optional tracker updated as files are processed
             
         Returns:
             Tuple of (total courses added, total chunks created)
@@ -70,74 +180,242 @@ class RAGSystem:
         
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
+            if progress:
+                progress.start(0)
             return 0, 0
         
         # Get existing course titles to avoid re-processing
         existing_course_titles = set(self.vector_store.get_existing_course_titles())
         
+        file_names = [
+            file_name for file_name in sorted(os.listdir(folder_path))
+            if os.path.isfile(os.path.join(folder_path, file_name))
+            and file_name.lower().endswith(('.pdf', '.docx', '.txt'))
+        ]
+        if progress:
+            progress.start(len(file_names))
+        
         # Process each file in the folder
-        for file_name in os.listdir(folder_path):
+        for file_name in file_names:
             file_path = os.path.join(folder_path, file_name)
-            if os.path.isfile(file_path) and file_name.lower().endswith(('.pdf', '.docx', '.txt')):
-                try:
-                    # Check if this course might already exist
-                    # We'll process the document to get the course ID, but only add if new
-                    course, course_chunks = self.document_processor.process_course_document(file_path)
-                    
-                    if course and course.title not in existing_course_titles:
-                        # This is a new course - add it to the vector store
-                        self.vector_store.add_course_metadata(course)
-                        self.vector_store.add_course_content(course_chunks)
-                        total_courses += 1
-                        total_chunks += len(course_chunks)
-                        print(f"Added new course: {course.title} ({len(course_chunks)} chunks)")
-                        existing_course_titles.add(course.title)
-                    elif course:
-                        print(f"Course already exists: {course.title} - skipping")
-                except Exception as e:
-                    print(f"Error processing {file_name}: {e}")
+            if progress:
+                progress.file_started(file_name)
+            added = False
+            added_chunks = 0
+            failed = False
+            try:
+                # Check if this course might already exist
+                # We'll process the document to get the course ID, but only add if new
+                course, course_chunks = self.document_processor.process_course_document(file_path)
+                
+                if course and course.title not in existing_course_titles:
+                    # This is a new course - add it to the vector store
+                    self.vector_store.add_course_metadata(course)
+                    self.vector_store.add_course_content(course_chunks)
+                    total_courses += 1
+                    total_chunks += len(course_chunks)
+                    added = True
+                    added_chunks = len(course_chunks)
+                    print(f"Added new course: {course.title} ({len(course_chunks)} chunks)")
+                    existing_course_titles.add(course.title)
+                    self.query_router.refresh_catalog()
+                elif course:
+                    print(f"Course already exists: {course.title} - skipping")
+            except Exception as e:
+                print(f"Error processing {file_name}: {e}")
+                failed = True
+            if progress:
+                progress.file_done(added_chunks, added=added, failed=failed)
         
         return total_courses, total_chunks
     
-    def query(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[str]]:
+    def query(self, query: str, session_id: Optional[str] = None,
+              request_context: Optional[RequestContext] = None) -> Tuple[str, List[str]]:
         """
         Process a user query using the RAG system with tool-based search.
         
+        Identical concurrent queries without prior conversation are coalesced
+        into a single computation whose answer and sources are shared.
+        
         Args:
             query: User's question
             session_id: Optional session ID for conversation context
+            request_context: Optional context carrying the request's deadline
+                and cancellation; remaining stages are skipped once it ends
             
         Returns:
             Tuple of (response, sources list - empty for tool-based approach)
+            
+        Raises:
+            RequestCancelled: If the request was cancelled or ran out of time
         """
-        # Create prompt for the AI with clear instructions
-        prompt = f"""Answer this question about course materials: {query}"""
-        
         # Get conversation history if session exists
         history = None
         if session_id:
             history = self.session_manager.get_conversation_history(session_id)
         
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager
-        )
-        
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
-
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+        if self._can_coalesce(history):
+            response, sources = self.query_flight.do(
+                self._flight_key(query),
+                lambda: self._answer(query, None, self._shared_context(request_context), session_id)
+            )
+        else:
+            response, sources = self._answer(query, history, request_context, session_id)
         
         # Update conversation history
         if session_id:
             self.session_manager.add_exchange(session_id, query, response)
         
         # Return response with sources from tool searches
-        return response, sources
+        return response, list(sources)
+    
+    async def aquery(self, query: str, session_id: Optional[str] = None,
+                     request_context: Optional[RequestContext] = None) -> Tuple[str, List[str]]:
+        """
+        Async variant of `query` for the event loop: blocking work runs in a
+        worker thread and coalesced callers await the shared result.
+        """
+        history = None
+        if session_id:
+            history = await asyncio.to_thread(self.session_manager.get_conversation_history, session_id)
+        
+        if self._can_coalesce(history):
+            response, sources = await self.query_flight.do_async(
+                self._flight_key(query),
+                lambda: self._answer(query, None, self._shared_context(request_context), session_id)
+            )
+        else:
+            response, sources = await asyncio.to_thread(
+                self._answer, query, history, request_context, session_id
+            )
+        
+        if session_id:
+            await asyncio.to_thread(self.session_manager.add_exchange, session_id, query, response)
+        
+        return response, list(sources)
+    
+    def _can_coalesce(self, history: Optional[str]) -> bool:
+        """Only first-turn queries have an answer independent of the session"""
+        return self.config.COALESCE_QUERIES and not history
+    
+    @staticmethod
+    def _shared_context(request_context: Optional[RequestContext]) -> Optional[RequestContext]:
+        """
+        Context for a coalesced computation: it keeps the caller's deadline and
+        priority, but one caller disconnecting must not cancel the answer others
+        are waiting for.
+        """
+        if request_context is None:
+            return None
+        return RequestContext(deadline=request_context.deadline, priority=request_context.priority)
+    
+    @staticmethod
+    def _flight_key(query: str) -> str:
+        """Normalise a query so trivially different spellings coalesce"""
+        return " ".join(query.lower().split()).rstrip("?!. ")
+    
+    def _answer(self, query: str, history: Optional[str], request_context: Optional[RequestContext] = None,
+                session_id: Optional[str] = None) -> Tuple[str, List[str]]:
+        """
+        Generate the response and collect its sources.
+        
+        Tokens billed for the request are accounted to session_id, including
+        those spent before a cancellation; a coalesced computation is billed
+        to the session that started it.
+        """
+        # Create prompt for the AI with clear instructions
+        prompt = f"""Answer this question about course materials: {query}"""
+        
+        # Tools record sources and timings for this request only
+        with (
+            request_scope(request_context) as context,
+            QUERY_SECONDS.time(self.config.QUERY_MODE),
+            self.tracer.trace("rag.query", query_chars=len(query), mode=self.config.QUERY_MODE,
+                              history_chars=len(history or "")) as trace_span,
+        ):
+            try:
+                if self.config.QUERY_MODE == "routed":
+                    response = self._generate_routed(query, prompt, history)
+                else:
+                    # Generate response using AI with tools
+                    response = self.ai_generator.generate_response(
+                        query=prompt,
+                        conversation_history=history,
+                        tools=self.tool_manager.get_tool_definitions(),
+                        tool_manager=self.tool_manager
+                    )
+            except RequestCancelled as e:
+                self._record_cancellation(e, context)
+                raise
+            finally:
+                self.usage_ledger.record(
+                    session_id, context.llm_usage, mode=self.config.QUERY_MODE,
+                    context_tokens=context.context_tokens, sources=len(context.sources),
+                    tool_calls=len(context.tool_calls)
+                )
+            # Estimated input tokens and tool time, on the trace rather than stdout
+            trace_span.set(sources=len(context.sources), context_tokens=context.context_tokens,
+                           prompt_tokens=estimate_tokens(prompt), history_tokens=estimate_tokens(history),
+                           tool_calls=len(context.tool_calls), tool_seconds=round(context.tool_seconds(), 3))
+        
+        return response, context.sources
+    
+    def _record_cancellation(self, error: RequestCancelled, context: RequestContext):
+        elapsed = time.perf_counter() - context.started
+        with self._cancel_lock:
+            self.cancelled_requests[error.reason] = self.cancelled_requests.get(error.reason, 0) + 1
+            self.cancelled_stages[error.stage] = self.cancelled_stages.get(error.stage, 0) + 1
+            self.cancelled_seconds += elapsed
+        print(f"Request cancelled ({error.reason}) before {error.stage} after {elapsed:.3f}s")
+    
+    def _generate_routed(self, query: str, prompt: str, history: Optional[str]) -> str:
+        """
+        Answer with a single LLM call: retrieve up front for course-specific
+        queries, answer general ones directly without tools.
+        """
+        decision = self.query_router.route(query)
+        if not decision.course_specific:
+            return self.ai_generator.generate_response(query=prompt, conversation_history=history)
+        
+        # Same search and formatting as the tool, so sources are tracked identically;
+        # an embedding decision already ran the unfiltered search, so reuse it
+        context = self.tool_manager.execute_tool(
+            "search_course_content", query=query, course_name=decision.course_title,
+            results=decision.results
+        )
+        return self.ai_generator.generate_response(
+            query=prompt,
+            conversation_history=history,
+            context=context
+        )
+    
+    def get_runtime_stats(self) -> Dict:
+        """Get counters describing query processing in this process"""
+        flight = self.query_flight.get_stats()
+        sessions = self.session_manager.get_stats()
+        return {
+            "queries_executed": flight["executions"],
+            "queries_coalesced": flight["coalesced"],
+            "queries_in_flight": flight["in_flight"],
+            "sessions_live": sessions["live_sessions"],
+            "sessions_evicted": sessions["evicted_sessions"],
+            "sessions_expired": sessions["expired_sessions"],
+            "session_bytes": sessions["approx_bytes"],
+            "executors": self.executors.get_stats(),
+            "cancellations": self.get_cancellation_stats(),
+            "llm_scheduler": self.llm_scheduler.get_stats(),
+            "model_routing": self.model_router.get_stats() if self.model_router else None,
+            "llm_connections": self.llm_connections.get_stats(),
+        }
+    
+    def get_cancellation_stats(self) -> Dict:
+        """Abandoned requests by reason, the stages they skipped, and time spent on them"""
+        with self._cancel_lock:
+            return {
+                "requests": dict(self.cancelled_requests),
+                "skipped_stages": dict(self.cancelled_stages),
+                "seconds_before_cancel": self.cancelled_seconds,
+            }
     
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
@@ -0,0 +1,143 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from usage import TokenUsage
+
+
+class RequestCancelled(Exception):
+    """The request was cancelled or ran out of time; remaining work is skipped"""
+
+    def __init__(self, reason: str, stage: str):
+        super().__init__(f"Request {reason.replace('_', ' ')} before {stage}")
+        self.reason = reason  # "client_disconnected" or "deadline_exceeded"
+        self.stage = stage
+
+
+# Priority classes for shared upstream capacity such as the LLM rate limits, highest first
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PRIORITIES = (INTERACTIVE, BULK)
+
+
+@dataclass
+class ToolCall:
+    """One tool execution within a request"""
+    name: str
+    seconds: float
+    error: Optional[str] = None
+
+
+@dataclass
+class RequestContext:
+    """
+    State collected while answering a single request.
+
+    Tools write their sources and result sizes here instead of onto shared
+    tool instances, so concurrent requests never see each other's results.
+
+    A request may also carry a deadline (a `time.monotonic` timestamp) and be
+    cancelled from another thread, e.g. when the client disconnects. Each
+    stage calls `check` before starting, and in-flight work registered with
+    `on_cancel` (such as a streaming LLM response) is aborted.
+    """
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    context_tokens: int = 0  # Estimated tokens of tool results sent to the model
+    llm_usage: Dict[str, TokenUsage] = field(default_factory=dict)  # Billed tokens per LLM stage
+    started: float = field(default_factory=time.perf_counter)
+    deadline: Optional[float] = None
+    cancellable: bool = False  # Whether cancel() may be called while the request runs
+    cancel_reason: Optional[str] = None
+    priority: str = INTERACTIVE  # One of PRIORITIES; bulk work yields to interactive requests
+    _callbacks: List[Callable[[], None]] = field(default_factory=list, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def tool_seconds(self) -> float:
+        """Total time spent executing tools"""
+        return sum(call.seconds for call in self.tool_calls)
+
+    def record_usage(self, stage: str, usage: TokenUsage):
+        """Add the billed tokens of an LLM call made for this request"""
+        with self._lock:
+            self.llm_usage.setdefault(stage, TokenUsage()).add(usage)
+
+    @property
+    def interruptible(self) -> bool:
+        """Whether the request can end early, by deadline or cancellation"""
+        return self.cancellable or self.deadline is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (never negative), or None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "client_disconnected"):
+        """Cancel the request and abort its registered in-flight work"""
+        with self._lock:
+            if self.cancel_reason is not None:
+                return
+            self.cancel_reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Error aborting cancelled request work: {e}")
+
+    def check(self, stage: str):
+        """
+        Raise RequestCancelled if the request was cancelled or its deadline passed.
+
+        Args:
+            stage: The stage about to start, reported in the exception
+        """
+        if self.cancel_reason is None and self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline_exceeded")
+        if self.cancel_reason is not None:
+            raise RequestCancelled(self.cancel_reason, stage)
+
+    @contextmanager
+    def on_cancel(self, callback: Callable[[], None]) -> Iterator[None]:
+        """Call `callback` if the request is cancelled during the enclosed block"""
+        with self._lock:
+            registered = self.cancel_reason is None
+            if registered:
+                self._callbacks.append(callback)
+        if not registered:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+
+_current: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar(
+    "request_context", default=None
+)
+
+
+def current_context() -> Optional[RequestContext]:
+    """The context of the request being handled, or None outside a request"""
+    return _current.get()
+
+
+@contextmanager
+def request_scope(context: Optional[RequestContext] = None) -> Iterator[RequestContext]:
+    """
+    Make a request context current for the enclosed block.
+
+    The context follows the code through calls and `asyncio.to_thread`, which
+    copies context variables; other threads and tasks keep their own.
+    """
+    context = context or RequestContext()
+    token = _current.set(context)
+    try:
+        yield context
+    finally:
+        _current.reset(token)
@@ -1,6 +1,12 @@
+import time
 from typing import Dict, Any, Optional, Protocol
 from abc import ABC, abstractmethod
+from request_context import RequestContext, ToolCall, current_context, request_scope
 from vector_store import VectorStore, SearchResults
+from context_budget import ContextAssembler, estimate_tokens
+from metrics import time_stage
+from tracing import span
+from chunk_merger import ChunkMerger
 
 
 class Tool(ABC):
@@ -20,9 +26,21 @@ class Tool(ABC):
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
     
-    def __init__(self, vector_store: VectorStore):
+    def __init__(self, vector_store: VectorStore,
+                 context_assembler: Optional[ContextAssembler] = None,
+                 chunk_merger: Optional[ChunkMerger] = None):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
+        self.context_assembler = context_assembler  # Optional token budget for results
+        self.chunk_merger = chunk_merger  # Optional merging of adjacent chunks
+        # Results of the last search in any request; request_context holds per-request ones
+        self.last_sources = []
+        self.last_context_tokens = 0
+    
+    @property
+    def search_limit(self) -> Optional[int]:
+        """Result count to request from the vector store, None for its default"""
+        # Retrieve a larger candidate pool when the merger diversifies results
+        return self.chunk_merger.search_limit if self.chunk_merger else None
     
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
@@ -49,7 +67,8 @@ class CourseSearchTool(Tool):
             }
         }
     
-    def execute(self, query: str, course_name: Optional[str] = None, lesson_number: Optional[int] = None) -> str:
+    def execute(self, query: str, course_name: Optional[str] = None, lesson_number: Optional[int] = None,
+                results: Optional[SearchResults] = None) -> str:
         """
         Execute the search tool with given parameters.
         
@@ -57,17 +76,21 @@ class CourseSearchTool(Tool):
             query: What to search for
             course_name: Optional course filter
             lesson_number: Optional lesson filter
+            results: Search already run for these parameters (with search_limit), reused as is
             
         Returns:
             Formatted search results or error message
         """
         
         # Use the vector store's unified search interface
-        results = self.store.search(
-            query=query,
-            course_name=course_name,
-            lesson_number=lesson_number
-        )
+        if results is None:
+            search_kwargs = {"limit": self.search_limit} if self.search_limit else {}
+            results = self.store.search(
+                query=query,
+                course_name=course_name,
+                lesson_number=lesson_number,
+                **search_kwargs
+            )
         
         # Handle errors
         if results.error:
@@ -82,8 +105,21 @@ class CourseSearchTool(Tool):
                 filter_info += f" in lesson {lesson_number}"
             return f"No relevant content found{filter_info}."
         
+        # Merge neighbouring chunks so overlapping text is sent once
+        if self.chunk_merger:
+            results = self.chunk_merger.process(results)
+        
+        # Fit results into the token budget
+        if self.context_assembler:
+            results = self.context_assembler.fit_results(results)
+        
         # Format and return results
-        return self._format_results(results)
+        formatted = self._format_results(results)
+        self.last_context_tokens = estimate_tokens(formatted)
+        context = current_context()
+        if context is not None:
+            context.context_tokens += self.last_context_tokens
+        return formatted
     
     def _format_results(self, results: SearchResults) -> str:
         """Format search results with course and lesson context"""
@@ -107,11 +143,12 @@ class CourseSearchTool(Tool):
 
             # Get the lesson link if we have both course title and lesson number
             url = None
-            if lesson_num is not None:
-                url = self.store.get_lesson_link(course_title, lesson_num)
-            else:
-                # If no lesson number, get course link instead
-                url = self.store.get_course_link(course_title)
+            with time_stage("link_lookup"):
+                if lesson_num is not None:
+                    url = self.store.get_lesson_link(course_title, lesson_num)
+                else:
+                    # If no lesson number, get course link instead
+                    url = self.store.get_course_link(course_title)
 
             # Store structured source data
             source_item = {
@@ -124,8 +161,11 @@ class CourseSearchTool(Tool):
 
             formatted.append(f"{header}\n{doc}")
 
-        # Store sources for retrieval
+        # Store sources for retrieval, per request when one is active
         self.last_sources = sources
+        context = current_context()
+        if context is not None:
+            context.sources.extend(sources)
 
         return "\n\n".join(formatted)
 
@@ -148,15 +188,41 @@ class ToolManager:
         """Get all tool definitions for Anthropic tool calling"""
         return [tool.get_tool_definition() for tool in self.tools.values()]
     
-    def execute_tool(self, tool_name: str, **kwargs) -> str:
-        """Execute a tool by name with given parameters"""
+    def execute_tool(self, tool_name: str, request_context: Optional[RequestContext] = None, **kwargs) -> str:
+        """
+        Execute a tool by name with given parameters.
+        
+        Sources and timings are recorded in request_context, or in the current
+        request's context if none is passed.
+        
+        Raises:
+            RequestCancelled: If that request was cancelled or is past its deadline
+        """
         if tool_name not in self.tools:
             return f"Tool '{tool_name}' not found"
         
-        return self.tools[tool_name].execute(**kwargs)
+        context = request_context or current_context()
+        if context is None:
+            return self.tools[tool_name].execute(**kwargs)
+        
+        # Don't start a search for a request that has been abandoned
+        context.check(f"tool:{tool_name}")
+        with request_scope(context), span("tool.execute", tool=tool_name):
+            start = time.perf_counter()
+            error = None
+            try:
+                return self.tools[tool_name].execute(**kwargs)
+            except Exception as e:
+                error = str(e)
+                raise
+            finally:
+                context.tool_calls.append(ToolCall(tool_name, time.perf_counter() - start, error))
     
     def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
+        """Get sources from the current request, or from the last search outside a request"""
+        context = current_context()
+        if context is not None:
+            return list(context.sources)
         # Check all tools for last_sources attribute
         for tool in self.tools.values():
             if hasattr(tool, 'last_sources') and tool.last_sources:
@@ -164,7 +230,10 @@ class ToolManager:
         return []
 
     def reset_sources(self):
-        """Reset sources from all tools that track sources"""
+        """Reset sources of the current request and from all tools that track sources"""
+        context = current_context()
+        if context is not None:
+            context.sources.clear()
         for tool in self.tools.values():
             if hasattr(tool, 'last_sources'):
                 tool.last_sources = []
\ No newline at end of file
@@ -1,61 +1,131 @@
-from typing import Dict, List, Optional
-from dataclasses import dataclass
-
-@dataclass
-class Message:
-    """Represents a single message in a conversation"""
-    role: str     # "user" or "assistant"
-    content: str  # The message content
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from context_budget import ContextAssembler, estimate_tokens
+from history_summarizer import ExtractiveSummarizer
+from session_store import SessionStore, InMemorySessionStore, Message
 
 class SessionManager:
     """Manages conversation sessions and message history"""
     
-    def __init__(self, max_history: int = 5):
+    def __init__(self, max_history: int = 5, context_assembler: Optional[ContextAssembler] = None,
+                 store: Optional[SessionStore] = None, summarizer: Optional[ExtractiveSummarizer] = None,
+                 max_cached: int = 1024):
+        if summarizer and context_assembler and summarizer.max_tokens >= context_assembler.history_budget:
+            # Compaction reserves the summary's cap out of the history budget
+            raise ValueError(
+                f"HISTORY_SUMMARY_TOKENS ({summarizer.max_tokens}) must be below "
+                f"HISTORY_TOKEN_BUDGET ({context_assembler.history_budget}) to keep any recent turns"
+            )
         self.max_history = max_history
-        self.sessions: Dict[str, List[Message]] = {}
-        self.session_counter = 0
+        self.context_assembler = context_assembler  # Optional token budget for history
+        self.sessions = store if store is not None else InMemorySessionStore(max_messages=max_history * 2)
+        self.summarizer = summarizer  # Folds turns leaving the history into a summary
+        # Formatted history per session, valid while the store's version matches
+        self.max_cached = max_cached
+        self._cache: "OrderedDict[str, Tuple[int, Optional[str]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
     
     def create_session(self) -> str:
         """Create a new conversation session"""
-        self.session_counter += 1
-        session_id = f"session_{self.session_counter}"
-        self.sessions[session_id] = []
+        # Random ids stay unique across worker processes sharing a store
+        session_id = f"session_{uuid.uuid4().hex}"
+        self.sessions.create(session_id)
         return session_id
     
     def add_message(self, session_id: str, role: str, content: str):
         """Add a message to the conversation history"""
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        
         message = Message(role=role, content=content)
-        self.sessions[session_id].append(message)
-        
-        # Keep conversation history within limits
-        if len(self.sessions[session_id]) > self.max_history * 2:
-            self.sessions[session_id] = self.sessions[session_id][-self.max_history * 2:]
+        self.sessions.append(session_id, message)
     
     def add_exchange(self, session_id: str, user_message: str, assistant_message: str):
         """Add a complete question-answer exchange"""
-        self.add_message(session_id, "user", user_message)
-        self.add_message(session_id, "assistant", assistant_message)
+        exchange = (
+            Message(role="user", content=user_message),
+            Message(role="assistant", content=assistant_message)
+        )
+        if not self.summarizer:
+            # One store call, so concurrent exchanges on a session never interleave
+            self.sessions.append(session_id, *exchange)
+            return
+        # Retry when another exchange changed the session since we read it;
+        # each retry means that exchange was stored, so this always finishes
+        while not self._fold_and_append(session_id, exchange):
+            pass
+    
+    def _fold_and_append(self, session_id: str, incoming: Tuple[Message, ...]) -> bool:
+        """
+        Fold the oldest stored messages into the session summary when the
+        incoming exchange would push them past max_history or the history
+        token budget, then append it. The store applies both together only if
+        the session is unchanged since it was read; returns False if it was.
+        """
+        history = self.sessions.get_history(session_id)
+        if history is None:
+            self.sessions.append(session_id, *incoming)
+            return True
+        
+        messages = history.messages
+        drop = max(0, len(messages) + len(incoming) - self.max_history * 2)
+        if self.context_assembler:
+            # Leave room for the summary line so fit_history keeps it
+            budget = self.context_assembler.history_budget - self.summarizer.max_tokens
+            costs = [estimate_tokens(self._format(m)) for m in messages]
+            used = sum(costs[drop:]) + sum(estimate_tokens(self._format(m)) for m in incoming)
+            while drop < len(messages) and used > budget:
+                used -= costs[drop]
+                drop += 1
+        summary = self.summarizer.summarize(history.summary, messages[:drop]) if drop else history.summary
+        return self.sessions.compact(session_id, summary, drop, history.version, *incoming)
+    
+    @staticmethod
+    def _format(message: Message) -> str:
+        return f"{message.role.title()}: {message.content}"
     
     def get_conversation_history(self, session_id: Optional[str]) -> Optional[str]:
         """Get formatted conversation history for a session"""
-        if not session_id or session_id not in self.sessions:
+        if not session_id:
+            return None
+        
+        version = self.sessions.get_version(session_id)
+        if version is None:
             return None
+        with self._cache_lock:
+            cached = self._cache.get(session_id)
+            if cached is not None and cached[0] == version:
+                self._cache.move_to_end(session_id)
+                return cached[1]
         
-        messages = self.sessions[session_id]
-        if not messages:
+        history = self.sessions.get_history(session_id)
+        if history is None:
             return None
         
         # Format messages for context
         formatted_messages = []
-        for msg in messages:
-            formatted_messages.append(f"{msg.role.title()}: {msg.content}")
+        if history.summary:
+            formatted_messages.append(f"Summary of earlier conversation: {history.summary}")
+        for msg in history.messages:
+            formatted_messages.append(self._format(msg))
         
-        return "\n".join(formatted_messages)
+        # Drop the oldest messages that don't fit the token budget
+        if self.context_assembler:
+            formatted_messages = self.context_assembler.fit_history(formatted_messages)
+        
+        formatted = "\n".join(formatted_messages) or None
+        with self._cache_lock:
+            self._cache[session_id] = (history.version, formatted)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return formatted
     
     def clear_session(self, session_id: str):
         """Clear all messages from a session"""
-        if session_id in self.sessions:
-            self.sessions[session_id] = []
\ No newline at end of file
+        self.sessions.clear(session_id)
+        with self._cache_lock:
+            self._cache.pop(session_id, None)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """Live session count, evictions and approximate memory held"""
+        return self.sessions.get_stats()
@@ -0,0 +1,577 @@
+import os
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set
+
+# Rough per-object overheads used for the memory estimate
+SESSION_OVERHEAD_BYTES = 400
+MESSAGE_OVERHEAD_BYTES = 120
+
+
+@dataclass
+class Message:
+    """Represents a single message in a conversation"""
+    role: str     # "user" or "assistant"
+    content: str  # The message content
+
+
+@dataclass
+class SessionHistory:
+    """Stored conversation state of a session"""
+    summary: str             # Running summary of turns compacted out of messages
+    messages: List[Message]  # Recent messages, oldest first
+    version: int             # Changes whenever summary or messages change
+
+
+class _Session:
+    """Messages of one session plus bookkeeping for eviction"""
+    __slots__ = ("messages", "summary", "version", "last_access", "size_bytes")
+
+    def __init__(self, max_messages: int, last_access: float):
+        self.messages: Deque[Message] = deque(maxlen=max_messages)
+        self.summary = ""
+        self.version = 0
+        self.last_access = last_access
+        self.size_bytes = SESSION_OVERHEAD_BYTES
+
+
+def _message_bytes(message: Message) -> int:
+    return MESSAGE_OVERHEAD_BYTES + sys.getsizeof(message.content)
+
+
+def _summary_bytes(summary: str) -> int:
+    return sys.getsizeof(summary) if summary else 0
+
+
+class SessionStore(ABC):
+    """Interface for session persistence backends"""
+
+    @abstractmethod
+    def create(self, session_id: str):
+        """Create an empty session"""
+        pass
+
+    @abstractmethod
+    def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """Summary and recent messages of a live session, or None if unknown/expired"""
+        pass
+
+    @abstractmethod
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Cheap change marker of a live session's history, or None if unknown/expired"""
+        pass
+
+    @abstractmethod
+    def append(self, session_id: str, *messages: Message):
+        """Atomically append messages, creating the session if it is missing or expired"""
+        pass
+
+    @abstractmethod
+    def compact(self, session_id: str, summary: str, drop: int, expected_version: int,
+                *messages: Message) -> bool:
+        """
+        Atomically replace the running summary, remove the `drop` oldest
+        messages and append `messages`, but only if the session is live and
+        still at `expected_version`. Returns False, changing nothing, otherwise.
+        """
+        pass
+
+    @abstractmethod
+    def clear(self, session_id: str):
+        """Remove all messages and the summary from a session but keep it alive"""
+        pass
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, int]:
+        """Live session count, eviction counters and approximate bytes held"""
+        pass
+
+    def get_messages(self, session_id: str) -> Optional[List[Message]]:
+        """Recent messages of a live session, oldest first, or None if unknown/expired"""
+        history = self.get_history(session_id)
+        return history.messages if history else None
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get_version(session_id) is not None
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Bounded, thread-safe in-memory session store with LRU and idle-TTL eviction.
+
+    Sessions live in an OrderedDict kept in access order, so the least recently
+    used session is always at the front: touching, inserting and evicting are
+    all O(1). Because access order is also idle-time order, expired sessions
+    sit at the front too and are swept a few at a time on each write instead
+    of by a background thread.
+
+    Each session's messages are a deque with maxlen=max_messages, so appends
+    drop the oldest message without re-slicing. Locking is two-level: a short
+    global lock guards the OrderedDict, counters and byte accounting, while
+    reads and appends of a session's deque hold one of `stripes` locks chosen
+    by session id, so threads working on different sessions rarely contend.
+    A stripe lock is always taken before the global lock, never after.
+    """
+
+    def __init__(self, max_messages: int = 10, max_sessions: int = 10000, ttl_seconds: float = 3600,
+                 sweep_batch: int = 32, clock: Callable[[], float] = time.monotonic, stripes: int = 64):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.sweep_batch = sweep_batch
+        self.clock = clock
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._bytes = 0
+        self.evicted = 0  # Sessions dropped to stay under max_sessions
+        self.expired = 0  # Sessions dropped after ttl_seconds idle
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._live(session_id) is not None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _stripe(self, session_id: str) -> threading.Lock:
+        return self._stripes[hash(session_id) % len(self._stripes)]
+
+    def create(self, session_id: str):
+        """Create an empty session, evicting old ones if needed"""
+        with self._lock:
+            self._create(session_id)
+
+    def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """Summary and messages of a live session (marking it used), or None"""
+        with self._stripe(session_id):
+            with self._lock:
+                session = self._live(session_id)
+            if session is None:
+                return None
+            return SessionHistory(session.summary, list(session.messages), session.version)
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Change marker of a live session (marking it used), or None"""
+        with self._lock:
+            session = self._live(session_id)
+            return session.version if session else None
+
+    def append(self, session_id: str, *messages: Message):
+        """Append messages, creating the session if it is missing or expired"""
+        with self._stripe(session_id):
+            with self._lock:
+                session = self._live(session_id)
+                if session is None:
+                    session = self._create(session_id)
+                else:
+                    self._sweep()
+
+            delta = self._push(session, messages)
+            session.version += 1
+            self._account(session_id, session, delta)
+
+    def compact(self, session_id: str, summary: str, drop: int, expected_version: int,
+                *messages: Message) -> bool:
+        """Fold, trim and append under the session's stripe lock if the version still matches"""
+        with self._stripe(session_id):
+            with self._lock:
+                session = self._live(session_id)
+            if session is None or session.version != expected_version:
+                return False
+            delta = _summary_bytes(summary) - _summary_bytes(session.summary)
+            for _ in range(min(drop, len(session.messages))):
+                delta -= _message_bytes(session.messages.popleft())
+            delta += self._push(session, messages)
+            session.summary = summary
+            session.version += 1
+            self._account(session_id, session, delta)
+            return True
+
+    @staticmethod
+    def _push(session: _Session, messages: Sequence[Message]) -> int:
+        """Append under the stripe lock and return the size change"""
+        # Keep conversation history within limits: a full deque drops its oldest message
+        delta = 0
+        for message in messages:
+            if len(session.messages) == session.messages.maxlen:
+                delta -= _message_bytes(session.messages[0])
+            session.messages.append(message)
+            delta += _message_bytes(message)
+        return delta
+
+    def clear(self, session_id: str):
+        """Remove all messages and the summary from a session but keep it alive"""
+        with self._stripe(session_id):
+            with self._lock:
+                session = self._live(session_id)
+                if session:
+                    session.messages.clear()
+                    session.summary = ""
+                    session.version += 1
+                    self._bytes -= session.size_bytes - SESSION_OVERHEAD_BYTES
+                    session.size_bytes = SESSION_OVERHEAD_BYTES
+
+    def _account(self, session_id: str, session: _Session, delta: int):
+        """Apply a size change made under the session's stripe lock"""
+        with self._lock:
+            # Skip accounting if another thread evicted the session meanwhile
+            if self._sessions.get(session_id) is session:
+                session.size_bytes += delta
+                self._bytes += delta
+
+    def get_stats(self) -> Dict[str, int]:
+        """Live session count, eviction counters and approximate bytes held"""
+        with self._lock:
+            return {
+                "live_sessions": len(self._sessions),
+                "evicted_sessions": self.evicted,
+                "expired_sessions": self.expired,
+                "approx_bytes": self._bytes,
+            }
+
+    # The helpers below expect the global lock to be held
+
+    def _create(self, session_id: str) -> _Session:
+        self._sweep()
+        if session_id in self._sessions:
+            self._drop(session_id)
+        while len(self._sessions) >= self.max_sessions:
+            oldest_id = next(iter(self._sessions))
+            self._drop(oldest_id)
+            self.evicted += 1
+        session = _Session(self.max_messages, self.clock())
+        self._sessions[session_id] = session
+        self._bytes += session.size_bytes
+        return session
+
+    def _live(self, session_id: str) -> Optional[_Session]:
+        """Return the session if present and not expired, marking it used"""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        now = self.clock()
+        if now - session.last_access > self.ttl_seconds:
+            self._drop(session_id)
+            self.expired += 1
+            return None
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _sweep(self):
+        """Drop up to sweep_batch expired sessions from the LRU end"""
+        deadline = self.clock() - self.ttl_seconds
+        for _ in range(self.sweep_batch):
+            if not self._sessions:
+                return
+            oldest_id, oldest = next(iter(self._sessions.items()))
+            if oldest.last_access >= deadline:
+                return
+            self._drop(oldest_id)
+            self.expired += 1
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size_bytes
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Session store in a SQLite database shared by all worker processes.
+
+    The database runs in WAL mode so readers never block the single writer.
+    Messages are only ever inserted; reads fetch the newest max_messages rows
+    for a session, and compaction just moves the session's `history_start`
+    past the folded messages. Trimming old rows, TTL expiry and the
+    max_sessions bound are applied by a maintenance pass every
+    `maintenance_interval` writes, run on a background thread rather than the
+    request that triggered it. Each pass does at most `maintenance_batch`
+    sessions' worth of work in short transactions, and only trims sessions
+    this process wrote to since the previous pass, so its cost does not grow
+    with the database. Sessions' idle time is measured from their last write.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            last_access REAL NOT NULL,
+            summary TEXT NOT NULL DEFAULT '',
+            version INTEGER NOT NULL DEFAULT 0,
+            history_start INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+    """
+
+    def __init__(self, db_path: str, max_messages: int = 10, max_sessions: int = 10000,
+                 ttl_seconds: float = 3600, maintenance_interval: int = 1000,
+                 maintenance_batch: int = 500, clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.maintenance_interval = maintenance_interval
+        self.maintenance_batch = maintenance_batch
+        self.clock = clock  # Wall clock, comparable across processes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._touched: Set[str] = set()  # Sessions written since the last maintenance pass
+        self._maintaining = False
+        self.evicted = 0  # Sessions this process dropped to stay under max_sessions
+        self.expired = 0  # Sessions this process dropped after ttl_seconds idle
+        self._migrate()
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, reopened after a fork"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _migrate(self):
+        """Create the schema, adding columns missing from older databases"""
+        conn = self._connection()
+        conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        for column, definition in [
+            ("summary", "TEXT NOT NULL DEFAULT ''"),
+            ("version", "INTEGER NOT NULL DEFAULT 0"),
+            ("history_start", "INTEGER NOT NULL DEFAULT 0"),
+        ]:
+            if column not in columns:
+                conn.execute(f"ALTER TABLE sessions ADD COLUMN {column} {definition}")
+
+    def create(self, session_id: str):
+        """Create an empty session"""
+        self._connection().execute(
+            "INSERT OR REPLACE INTO sessions (id, last_access) VALUES (?, ?)",
+            (session_id, self.clock())
+        )
+        self._after_write(session_id)
+
+    def get_history(self, session_id: str) -> Optional[SessionHistory]:
+        """Summary and newest max_messages messages of a live session"""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT last_access, summary, version, history_start FROM sessions WHERE id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None or self.clock() - row[0] > self.ttl_seconds:
+            return None
+        _, summary, version, history_start = row
+        rows = conn.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? AND id >= ? ORDER BY id DESC LIMIT ?",
+            (session_id, history_start, self.max_messages)
+        ).fetchall()
+        messages = [Message(role=role, content=content) for role, content in reversed(rows)]
+        return SessionHistory(summary, messages, version)
+
+    def get_version(self, session_id: str) -> Optional[int]:
+        """Change marker of a live session, or None"""
+        row = self._connection().execute(
+            "SELECT last_access, version FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+        if row is None or self.clock() - row[0] > self.ttl_seconds:
+            return None
+        return row[1]
+
+    def append(self, session_id: str, *messages: Message):
+        """Insert messages in one transaction and refresh the session's last access time"""
+        conn = self._connection()
+        now = self.clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # An expired session starts over rather than resurfacing old messages
+            row = conn.execute("SELECT last_access FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is not None and now - row[0] > self.ttl_seconds:
+                conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("UPDATE sessions SET summary = '' WHERE id = ?", (session_id,))
+            conn.execute(
+                "INSERT INTO sessions (id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET last_access = excluded.last_access, version = version + 1",
+                (session_id, now)
+            )
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                [(session_id, message.role, message.content) for message in messages]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write(session_id)
+
+    def compact(self, session_id: str, summary: str, drop: int, expected_version: int,
+                *messages: Message) -> bool:
+        """
+        In one transaction: store the new summary, move history_start past the
+        `drop` oldest visible messages and insert `messages`, if the version matches.
+        """
+        conn = self._connection()
+        now = self.clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT last_access, version, history_start FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None or now - row[0] > self.ttl_seconds or row[1] != expected_version:
+                conn.execute("ROLLBACK")
+                return False
+            history_start = row[2]
+            visible = conn.execute(
+                "SELECT id FROM messages WHERE session_id = ? AND id >= ? ORDER BY id DESC LIMIT ?",
+                (session_id, history_start, self.max_messages)
+            ).fetchall()
+            visible.reverse()
+            if drop < len(visible):
+                history_start = visible[drop][0]
+            elif visible:
+                history_start = visible[-1][0] + 1
+            conn.execute(
+                "UPDATE sessions SET summary = ?, history_start = ?, last_access = ?, version = version + 1 "
+                "WHERE id = ?",
+                (summary, history_start, now, session_id)
+            )
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                [(session_id, message.role, message.content) for message in messages]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write(session_id)
+        return True
+
+    def clear(self, session_id: str):
+        """Remove all messages and the summary from a session, in one transaction, but keep it alive"""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("UPDATE sessions SET summary = '', version = version + 1 WHERE id = ?", (session_id,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_stats(self) -> Dict[str, int]:
+        """Live session count, this process's eviction counters and database size"""
+        conn = self._connection()
+        live = conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_access >= ?",
+            (self.clock() - self.ttl_seconds,)
+        ).fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            "live_sessions": live,
+            "evicted_sessions": self.evicted,
+            "expired_sessions": self.expired,
+            "approx_bytes": page_count * page_size,
+        }
+
+    def _after_write(self, session_id: str):
+        """Note the write and start a background maintenance pass when one is due"""
+        with self._writes_lock:
+            self._touched.add(session_id)
+            self._writes += 1
+            due = self._writes % self.maintenance_interval == 0 and not self._maintaining
+            if due:
+                self._maintaining = True
+        if due:
+            threading.Thread(target=self._maintain_in_background, daemon=True).start()
+
+    def _maintain_in_background(self):
+        try:
+            self.maintain()
+        except sqlite3.Error as e:
+            print(f"Session store maintenance failed: {e}")
+        finally:
+            with self._writes_lock:
+                self._maintaining = False
+
+    def maintain(self):
+        """
+        Expire idle sessions, enforce max_sessions and drop rows no read can
+        return, touching at most maintenance_batch sessions per step.
+        """
+        conn = self._connection()
+        batch = self.maintenance_batch
+        expired = [row[0] for row in conn.execute(
+            "SELECT id FROM sessions WHERE last_access < ? LIMIT ?",
+            (self.clock() - self.ttl_seconds, batch)
+        )]
+        self.expired += self._delete_sessions(expired, "last_access < ?", self.clock() - self.ttl_seconds)
+        evicted = [row[0] for row in conn.execute(
+            "SELECT id FROM sessions ORDER BY last_access DESC LIMIT ? OFFSET ?",
+            (batch, self.max_sessions)
+        )]
+        self.evicted += self._delete_sessions(evicted)
+
+        with self._writes_lock:
+            touched = list(self._touched)[:batch]
+            self._touched.difference_update(touched)
+        for session_id in touched:
+            self._trim(session_id)
+
+    def _delete_sessions(self, session_ids: List[str], condition: str = "1", *params) -> int:
+        """Delete sessions (still matching condition) and their messages; returns sessions deleted"""
+        deleted = 0
+        conn = self._connection()
+        for session_id in session_ids:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = conn.execute(
+                    f"DELETE FROM sessions WHERE id = ? AND {condition}", (session_id, *params)
+                ).rowcount
+                if count:
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            deleted += count
+        return deleted
+
+    def _trim(self, session_id: str):
+        """Delete a session's folded rows and those older than its newest max_messages"""
+        conn = self._connection()
+        row = conn.execute("SELECT history_start FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            return
+        oldest_kept = conn.execute(
+            "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?",
+            (session_id, self.max_messages - 1)
+        ).fetchone()
+        cutoff = max(row[0], oldest_kept[0] if oldest_kept else 0)
+        conn.execute("DELETE FROM messages WHERE session_id = ? AND id < ?", (session_id, cutoff))
+
+def create_session_store(backend: str, max_messages: int, max_sessions: int,
+                         ttl_seconds: float, db_path: Optional[str] = None) -> SessionStore:
+    """Build the session store selected by configuration ("memory" or "sqlite")"""
+    if backend == "memory":
+        return InMemorySessionStore(max_messages, max_sessions, ttl_seconds)
+    if backend == "sqlite":
+        if not db_path:
+            raise ValueError("The sqlite session backend needs a database path")
+        return SQLiteSessionStore(db_path, max_messages, max_sessions, ttl_seconds)
+    raise ValueError(f"Unknown session backend '{backend}'")
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class _Call:
+    """An in-flight computation that callers can attach to"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for and share its result (or exception). Sync callers
+    (`do`) and async callers (`do_async`) share the same in-flight table, so a
+    thread and a coroutine asking the same thing are coalesced too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.executions = 0  # Calls that ran the function
+        self.coalesced = 0   # Calls that attached to an in-flight execution
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        """Return the call for key and whether the caller leads it"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.executions += 1
+            return call, True
+
+    def _run(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        """Execute fn as the leader and publish the outcome to all waiters"""
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waiters = call.waiters
+                call.done.set()
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(self._resolve, future, call)
+
+    @staticmethod
+    def _resolve(future: asyncio.Future, call: _Call):
+        if future.done():
+            return
+        if call.error is not None:
+            future.set_exception(call.error)
+        else:
+            future.set_result(call.result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, or wait for an identical in-flight call to finish.
+
+        Args:
+            key: Identity of the computation
+            fn: Zero-argument callable to run if nothing is in flight for key
+
+        Returns:
+            The (possibly shared) result of fn
+        """
+        call, leader = self._join(key)
+        if leader:
+            return self._run(key, call, fn)
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Async variant of `do`. The leader runs the blocking fn in a worker
+        thread so the event loop stays free; followers await without blocking.
+        """
+        call, leader = self._join(key)
+        if leader:
+            return await asyncio.to_thread(self._run, key, call, fn)
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if not call.done.is_set():
+                call.waiters.append((loop, future))
+        if call.done.is_set():
+            self._resolve(future, call)
+        return await future
+
+    def get_stats(self) -> Dict[str, int]:
+        """Counts of executed and coalesced calls, plus those in flight now"""
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
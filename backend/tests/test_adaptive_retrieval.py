@@ -0,0 +1,101 @@
+"""Tests for distance-driven adaptive result selection"""
+from unittest.mock import Mock
+from vector_store import AdaptiveRetrieval, HASHING_EMBEDDING_MODEL, SearchResults, VectorStore
+
+
+def results_with(distances):
+    return SearchResults(
+        documents=[f"doc {i}" for i in range(len(distances))],
+        metadata=[{"i": i} for i in range(len(distances))],
+        distances=list(distances)
+    )
+
+
+class TestAdaptiveRetrievalSelect:
+    """Tests for AdaptiveRetrieval.select()"""
+
+    def test_keeps_close_cluster_and_stops_at_gap(self):
+        """Selection ends at the first large jump in distance"""
+        adaptive = AdaptiveRetrieval(min_results=1, max_results=8, max_distance=1.5, max_gap=0.15)
+
+        selected = adaptive.select(results_with([0.40, 0.45, 0.52, 0.90, 0.95]))
+
+        assert selected.distances == [0.40, 0.45, 0.52]
+        assert selected.documents == ["doc 0", "doc 1", "doc 2"]
+
+    def test_min_results_kept_despite_gap(self):
+        """Gaps don't cut below min_results"""
+        adaptive = AdaptiveRetrieval(min_results=2, max_distance=1.5, max_gap=0.1)
+
+        selected = adaptive.select(results_with([0.3, 0.9, 1.0]))
+
+        assert selected.distances == [0.3, 0.9, 1.0]
+
+    def test_within_cutoff_ignores_gaps_and_cap(self):
+        """Explicitly sized pools only lose hits past max_distance"""
+        adaptive = AdaptiveRetrieval(max_results=2, max_distance=1.0, max_gap=0.1)
+
+        selected = adaptive.within_cutoff(results_with([0.1, 0.6, 0.9, 1.2]))
+
+        assert selected.distances == [0.1, 0.6, 0.9]
+
+    def test_max_results_caps_selection(self):
+        adaptive = AdaptiveRetrieval(max_results=3, max_distance=2.0, max_gap=1.0)
+
+        selected = adaptive.select(results_with([0.1, 0.2, 0.3, 0.4, 0.5]))
+
+        assert len(selected.documents) == 3
+
+    def test_nothing_under_cutoff_returns_empty(self):
+        """Irrelevant candidates produce an empty, error-free result"""
+        adaptive = AdaptiveRetrieval(min_results=2, max_distance=1.0)
+
+        selected = adaptive.select(results_with([1.2, 1.3]))
+
+        assert selected.is_empty()
+        assert selected.error is None
+
+    def test_cutoff_overrides_min_results(self):
+        """min_results never pulls in hits beyond the absolute cutoff"""
+        adaptive = AdaptiveRetrieval(min_results=3, max_distance=1.0)
+
+        selected = adaptive.select(results_with([0.5, 1.1, 1.2]))
+
+        assert selected.distances == [0.5]
+
+    def test_errors_pass_through(self):
+        error = SearchResults.empty("Search error: boom")
+
+        assert AdaptiveRetrieval().select(error) is error
+
+
+class TestVectorStoreAdaptiveSearch:
+    """Tests for adaptive selection inside VectorStore.search()"""
+
+    def make_store(self, tmp_path, distances):
+        adaptive = AdaptiveRetrieval(candidates=10, max_results=2, max_distance=1.0, max_gap=0.1)
+        store = VectorStore(str(tmp_path), HASHING_EMBEDDING_MODEL, 5, adaptive)
+        store.course_content = Mock()
+        store.course_content.query.return_value = {
+            "documents": [[f"doc {i}" for i in range(len(distances))]],
+            "metadatas": [[{"i": i} for i in range(len(distances))]],
+            "distances": [list(distances)],
+        }
+        return store
+
+    def test_default_search_uses_full_selection(self, tmp_path):
+        store = self.make_store(tmp_path, [0.1, 0.15, 0.2, 1.2])
+
+        results = store.search("q")
+
+        assert results.distances == [0.1, 0.15]
+        assert store.course_content.query.call_args.kwargs["n_results"] == 10
+
+    def test_explicit_limit_keeps_distance_cutoff(self, tmp_path):
+        """MMR candidate pools still lose hits past the cutoff"""
+        store = self.make_store(tmp_path, [0.1, 0.5, 0.9, 1.2])
+
+        results = store.search("q", limit=4)
+
+        assert results.distances == [0.1, 0.5, 0.9]
+        assert store.course_content.query.call_args.kwargs["n_results"] == 4
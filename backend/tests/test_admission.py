@@ -0,0 +1,138 @@
+"""Tests for query admission control and per-client rate limiting"""
+import asyncio
+import pytest
+from admission import AdmissionController, ClientRateLimiter, Overloaded, RateLimited
+from metrics import ADMISSION_REJECTIONS, ADMISSION_REQUESTS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def hold(controller, release: asyncio.Event, log: list, name: str):
+    async with controller.admit():
+        log.append(name)
+        await release.wait()
+
+
+class TestAdmissionController:
+    """Tests for AdmissionController"""
+
+    def test_queue_full_is_rejected_immediately(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+            release = asyncio.Event()
+            log = []
+            running = asyncio.create_task(hold(controller, release, log, "first"))
+            waiting = asyncio.create_task(hold(controller, release, log, "second"))
+            await asyncio.sleep(0)
+
+            with pytest.raises(Overloaded) as rejected:
+                async with controller.admit():
+                    pass
+
+            release.set()
+            await asyncio.gather(running, waiting)
+            return controller, log, rejected.value
+
+        controller, log, rejected = asyncio.run(scenario())
+
+        assert log == ["first", "second"]
+        assert rejected.retry_after_header == "2"
+        stats = controller.get_stats()
+        assert stats["rejected_queue_full"] == 1
+        assert stats["admitted"] == 2
+        assert stats["in_flight"] == 0
+
+    def test_wait_deadline_rejects_and_frees_queue_slot(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(controller, release, [], "first"))
+            await asyncio.sleep(0)
+
+            with pytest.raises(Overloaded):
+                async with controller.admit():
+                    pass
+            waiting_after_timeout = controller.get_stats()["waiting"]
+
+            release.set()
+            await running
+            async with controller.admit():
+                pass
+            return controller, waiting_after_timeout
+
+        controller, waiting = asyncio.run(scenario())
+
+        assert waiting == 0
+        assert controller.get_stats()["rejected_timeout"] == 1
+        assert controller.get_stats()["in_flight"] == 0
+
+    def test_cancelled_waiter_does_not_leak_a_slot(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(controller, release, [], "first"))
+            await asyncio.sleep(0)
+            abandoned = asyncio.create_task(hold(controller, release, [], "gone"))
+            await asyncio.sleep(0)
+            abandoned.cancel()
+
+            release.set()
+            await running
+            await asyncio.gather(abandoned, return_exceptions=True)
+            return controller
+
+        assert asyncio.run(scenario()).get_stats()["in_flight"] == 0
+
+
+    def test_queue_depth_and_rejections_are_exported(self):
+        async def scenario():
+            controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+            release = asyncio.Event()
+            running = asyncio.create_task(hold(controller, release, [], "first"))
+            waiting = asyncio.create_task(hold(controller, release, [], "second"))
+            await asyncio.sleep(0)
+            depth = (ADMISSION_REQUESTS.value("in_flight"), ADMISSION_REQUESTS.value("waiting"))
+            with pytest.raises(Overloaded):
+                async with controller.admit():
+                    pass
+            release.set()
+            await asyncio.gather(running, waiting)
+            return depth
+
+        rejected = ADMISSION_REJECTIONS.value("queue_full")
+
+        assert asyncio.run(scenario()) == (1, 1)
+        assert ADMISSION_REJECTIONS.value("queue_full") == rejected + 1
+        assert ADMISSION_REQUESTS.value("in_flight") == ADMISSION_REQUESTS.value("waiting") == 0
+
+
+class TestClientRateLimiter:
+    """Tests for ClientRateLimiter"""
+
+    def test_burst_then_refill(self):
+        clock = FakeClock()
+        limiter = ClientRateLimiter(per_minute=60, burst=2, clock=clock)
+
+        limiter.check("s1")
+        limiter.check("s1")
+        with pytest.raises(RateLimited) as limited:
+            limiter.check("s1")
+        assert limited.value.retry_after == pytest.approx(1.0)
+
+        clock.now = 1.0
+        limiter.check("s1")
+
+    def test_keys_are_independent_and_bounded(self):
+        limiter = ClientRateLimiter(per_minute=1, burst=1, max_keys=2, clock=FakeClock())
+
+        limiter.check("a")
+        limiter.check("b")
+        limiter.check("c")
+
+        assert limiter.get_stats() == {"tracked_keys": 2, "rate_limited": 0}
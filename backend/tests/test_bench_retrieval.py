@@ -0,0 +1,49 @@
+"""Tests for the synthetic corpus generator and benchmark baseline comparison"""
+from benchmarks.bench_retrieval import compare
+from benchmarks.synthetic_corpus import generate_course, write_corpus
+from document_processor import DocumentProcessor
+
+
+class TestSyntheticCorpus:
+    """Generated documents parse like the real course scripts"""
+
+    def test_documents_parse_into_courses_and_lessons(self, tmp_path):
+        probes = write_corpus(str(tmp_path), courses=3, lessons=2, words_per_lesson=120)
+        processor = DocumentProcessor(800, 100)
+
+        course, chunks = processor.process_course_document(str(tmp_path / "course_00001.txt"))
+
+        assert course.title == probes[2].course_title
+        assert course.instructor == "Lin Osei"
+        assert [lesson.lesson_number for lesson in course.lessons] == [0, 1]
+        assert course.lessons[1].lesson_link.endswith("/lesson/1")
+        assert {chunk.lesson_number for chunk in chunks} == {0, 1}
+        assert any(probes[3].term in chunk.content for chunk in chunks if chunk.lesson_number == 1)
+
+    def test_generation_is_deterministic(self):
+        assert generate_course(7, 3, 100, seed=1) == generate_course(7, 3, 100, seed=1)
+        assert generate_course(7, 3, 100, seed=1)[0] != generate_course(7, 3, 100, seed=2)[0]
+
+
+class TestBaselineComparison:
+    """Regressions are flagged in the direction that matters for each metric"""
+
+    @staticmethod
+    def report(chunks_per_second, p95_ms):
+        return {"results": {"100": {
+            "ingest": {"chunks_per_second": chunks_per_second},
+            "search": {"course": {"p95_ms": p95_ms}},
+        }}}
+
+    def test_flags_slower_search_and_ingestion(self):
+        regressions = compare(self.report(70, 13), self.report(100, 10), tolerance=0.2)
+
+        assert {(scale, path) for scale, path, _, _ in regressions} == {
+            ("100", "ingest.chunks_per_second"), ("100", "search.course.p95_ms")
+        }
+
+    def test_improvements_and_noise_pass(self):
+        assert compare(self.report(150, 11), self.report(100, 10), tolerance=0.2) == []
+
+    def test_scales_missing_from_the_baseline_are_skipped(self):
+        assert compare(self.report(1, 1000), {"results": {}}, tolerance=0.2) == []
@@ -0,0 +1,132 @@
+"""Tests for the offline bulk query runner"""
+import asyncio
+import json
+import time
+import pytest
+from bulk_query import BulkQuery, BulkQueryRunner, completed_ids, read_queries
+from request_context import RequestCancelled
+
+
+def write_lines(path, items):
+    path.write_text("".join((item if isinstance(item, str) else json.dumps(item)) + "\n" for item in items))
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+class FakeAnswers:
+    """Answers after `delay` seconds, failing queries listed in `fail`, and tracks concurrency"""
+
+    def __init__(self, delay=0.01, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.calls = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def __call__(self, query, session_id, context):
+        self.calls.append((query, session_id, time.monotonic()))
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            if query in self.fail:
+                raise RuntimeError("LLM unavailable")
+            return f"answer to {query}", [{"course_title": "Course", "lesson_number": 1}]
+        finally:
+            self.in_flight -= 1
+
+
+class TestInputAndCheckpoint:
+    """Queries parse from JSON lines and earlier output marks what is done"""
+
+    def test_read_queries_defaults_ids_to_line_numbers(self, tmp_path):
+        path = tmp_path / "queries.jsonl"
+        write_lines(path, [{"query": "a"}, "", {"id": "x", "query": "b", "session_id": "s1"}])
+
+        assert read_queries(str(path)) == [BulkQuery("1", "a"), BulkQuery("x", "b", "s1")]
+
+    @pytest.mark.parametrize("lines", [["not json"], [{"id": 1}], [{"id": 1, "query": "a"}, {"id": 1, "query": "b"}]])
+    def test_read_queries_reports_bad_lines(self, tmp_path, lines):
+        path = tmp_path / "queries.jsonl"
+        write_lines(path, lines)
+
+        with pytest.raises(ValueError, match=f"{path}:"):
+            read_queries(str(path))
+
+    def test_completed_ids_ignores_failures_and_truncated_lines(self, tmp_path):
+        path = tmp_path / "answers.jsonl"
+        write_lines(path, [
+            {"id": "1", "answer": "ok"},
+            {"id": "2", "error": "boom"},
+            {"id": "3", "error": "boom"},
+            {"id": "3", "answer": "retried"},
+            '{"id": "4", "ans',
+        ])
+
+        assert completed_ids(str(path)) == {"1", "3"}
+        assert completed_ids(str(tmp_path / "missing.jsonl")) == set()
+
+
+class TestBulkQueryRunner:
+    """Bounded, rate-limited runs that resume where they stopped"""
+
+    def test_writes_answers_and_errors(self, tmp_path):
+        output = tmp_path / "answers.jsonl"
+        answers = FakeAnswers(fail={"q2"})
+        queries = [BulkQuery(str(i), f"q{i}", "s" if i == 0 else None) for i in range(4)]
+
+        stats = asyncio.run(BulkQueryRunner(answers, concurrency=2, progress_every=0).run(queries, str(output)))
+
+        records = {record["id"]: record for record in read_records(output)}
+        assert records["0"]["answer"] == "answer to q0"
+        assert records["0"]["sources"] == [{"course_title": "Course", "lesson_number": 1}]
+        assert records["0"]["latency_ms"] > 0
+        assert records["2"]["error"] == "RuntimeError: LLM unavailable"
+        assert ("q0", "s") in [(query, session) for query, session, _ in answers.calls]
+        summary = stats.summary()
+        assert (summary["answered"], summary["failed"], summary["skipped"]) == (3, 1, 0)
+
+    def test_concurrency_is_bounded(self, tmp_path):
+        answers = FakeAnswers(delay=0.02)
+        queries = [BulkQuery(str(i), f"q{i}") for i in range(12)]
+
+        asyncio.run(BulkQueryRunner(answers, concurrency=3, progress_every=0).run(queries, str(tmp_path / "out.jsonl")))
+
+        assert answers.peak == 3
+        assert len(answers.calls) == 12
+
+    def test_rate_limits_query_starts(self, tmp_path):
+        answers = FakeAnswers(delay=0)
+        queries = [BulkQuery(str(i), f"q{i}") for i in range(6)]
+
+        asyncio.run(BulkQueryRunner(answers, concurrency=6, rate=50, progress_every=0)
+                    .run(queries, str(tmp_path / "out.jsonl")))
+
+        starts = [started for _, _, started in answers.calls]
+        # The first starts at once, the other five are paced at 50 per second
+        assert starts[-1] - starts[0] >= 5 / 50 * 0.9
+
+    def test_resumes_skipping_answered_and_retrying_failed(self, tmp_path):
+        output = tmp_path / "answers.jsonl"
+        queries = [BulkQuery(str(i), f"q{i}") for i in range(5)]
+        asyncio.run(BulkQueryRunner(FakeAnswers(fail={"q1", "q3"}), 2, progress_every=0).run(queries, str(output)))
+
+        retry = FakeAnswers()
+        stats = asyncio.run(BulkQueryRunner(retry, 2, progress_every=0).run(queries, str(output)))
+
+        assert sorted(query for query, _, _ in retry.calls) == ["q1", "q3"]
+        assert stats.skipped == 3
+        assert completed_ids(str(output)) == {"0", "1", "2", "3", "4"}
+
+    def test_deadline_passed_to_each_query(self, tmp_path):
+        async def slow(query, session_id, context):
+            await asyncio.sleep(0.05)
+            context.check("llm_call")
+            return "late", []
+
+        output = tmp_path / "answers.jsonl"
+        asyncio.run(BulkQueryRunner(slow, 1, timeout=0.01, progress_every=0).run([BulkQuery("1", "q")], str(output)))
+
+        assert read_records(output)[0]["error"].startswith(RequestCancelled.__name__)
@@ -0,0 +1,217 @@
+"""Tests for request deadlines and cancellation"""
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import Mock
+import pytest
+from ai_generator import AIGenerator
+from config import Config
+from executors import BoundedExecutor
+from rag_system import RAGSystem
+from request_context import RequestCancelled, RequestContext, current_context, request_scope
+from search_tools import CourseSearchTool, ToolManager
+from vector_store import HASHING_EMBEDDING_MODEL
+
+
+def text_message(text):
+    return SimpleNamespace(stop_reason="end_turn", content=[SimpleNamespace(type="text", text=text)])
+
+
+class FakeStream:
+    """Streams `events` events, cancelling `cancel_on` after the given event index"""
+
+    def __init__(self, events=5, cancel_on=None, at=None):
+        self.events = events
+        self.cancel_on = cancel_on
+        self.at = at
+        self.delivered = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+    def __iter__(self):
+        for index in range(self.events):
+            if self.closed:
+                raise RuntimeError("stream closed")
+            self.delivered += 1
+            yield SimpleNamespace(type="content_block_delta")
+            if index == self.at and self.cancel_on is not None:
+                self.cancel_on.cancel("client_disconnected")
+
+    def get_final_message(self):
+        return text_message("streamed")
+
+
+def generator_with(client):
+    return AIGenerator("test-key", "test", client=client)
+
+
+class TestRequestContext:
+    """Tests for deadline and cancellation state"""
+
+    def test_check_passes_until_cancelled(self):
+        context = RequestContext(cancellable=True)
+        context.check("llm_call")
+
+        context.cancel("client_disconnected")
+
+        with pytest.raises(RequestCancelled) as error:
+            context.check("llm_call")
+        assert (error.value.reason, error.value.stage) == ("client_disconnected", "llm_call")
+
+    def test_expired_deadline_cancels(self):
+        context = RequestContext(deadline=time.monotonic() - 1)
+
+        with pytest.raises(RequestCancelled) as error:
+            context.check("search")
+        assert error.value.reason == "deadline_exceeded"
+        assert context.remaining() == 0.0
+
+    def test_on_cancel_runs_only_while_registered(self):
+        context = RequestContext(cancellable=True)
+        aborted = []
+        with context.on_cancel(lambda: aborted.append("inside")):
+            pass
+        with context.on_cancel(lambda: aborted.append("during")):
+            context.cancel()
+        context.cancel()  # A second cancel is a no-op
+
+        assert aborted == ["during"]
+
+
+class TestGeneratorCancellation:
+    """AIGenerator stops calling the API once its request is abandoned"""
+
+    def test_plain_create_outside_interruptible_requests(self):
+        client = Mock()
+        client.messages.create.return_value = text_message("plain")
+
+        with request_scope():
+            assert generator_with(client).generate_response("q") == "plain"
+        client.messages.stream.assert_not_called()
+
+    def test_cancelled_request_skips_the_call(self):
+        client = Mock()
+        context = RequestContext(cancellable=True)
+        context.cancel()
+
+        with request_scope(context), pytest.raises(RequestCancelled):
+            generator_with(client).generate_response("q")
+        client.messages.create.assert_not_called()
+        client.messages.stream.assert_not_called()
+
+    def test_cancel_mid_stream_aborts_the_response(self):
+        context = RequestContext(cancellable=True)
+        stream = FakeStream(events=5, cancel_on=context, at=1)
+        client = Mock()
+        client.messages.stream.return_value = stream
+
+        with request_scope(context), pytest.raises(RequestCancelled) as error:
+            generator_with(client).generate_response("q")
+
+        assert error.value.stage == "llm_call"
+        assert stream.delivered == 2
+        assert stream.closed
+
+    def test_deadline_bounds_the_call_timeout(self):
+        context = RequestContext(deadline=time.monotonic() + 30)
+        client = Mock()
+        client.messages.stream.return_value = FakeStream()
+
+        with request_scope(context):
+            assert generator_with(client).generate_response("q") == "streamed"
+        assert 0 < client.messages.stream.call_args.kwargs["timeout"] <= 30
+
+
+class TestSkippedStages:
+    """Work that hasn't started yet is skipped for abandoned requests"""
+
+    def test_tool_is_not_executed(self, mock_vector_store):
+        manager = ToolManager()
+        manager.register_tool(CourseSearchTool(mock_vector_store))
+        context = RequestContext(cancellable=True)
+        context.cancel()
+
+        with pytest.raises(RequestCancelled) as error:
+            manager.execute_tool("search_course_content", request_context=context, query="MCP")
+
+        assert error.value.stage == "tool:search_course_content"
+        mock_vector_store.search.assert_not_called()
+
+    def test_queued_stage_work_is_skipped(self):
+        pool = BoundedExecutor("search", workers=1, max_queue=4)
+        release = threading.Event()
+        context = RequestContext(cancellable=True)
+        ran = []
+        try:
+            blocker = pool.submit(release.wait, 5)
+            with request_scope(context):
+                queued = pool.submit(ran.append, "search")
+            context.cancel()
+            release.set()
+
+            blocker.result(timeout=5)
+            with pytest.raises(RequestCancelled):
+                queued.result(timeout=5)
+            assert ran == []
+        finally:
+            release.set()
+            pool.shutdown()
+
+
+class CancellingGenerator:
+    """Stands in for AIGenerator: the client leaves during the first LLM call"""
+
+    def generate_response(self, query, conversation_history=None, tools=None, tool_manager=None, context=None):
+        current_context().cancel("client_disconnected")
+        tool_manager.execute_tool("search_course_content", query=query)
+        return "unreachable"
+
+
+class TestRAGSystemCancellation:
+    """RAGSystem counts abandoned requests and doesn't store their exchange"""
+
+    def test_cancellation_is_counted(self, tmp_path):
+        config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                        ANTHROPIC_API_KEY="test", QUERY_MODE="tools")
+        system = RAGSystem(config)
+        system.ai_generator = CancellingGenerator()
+        session_id = system.session_manager.create_session()
+
+        with pytest.raises(RequestCancelled):
+            system.query("What is MCP?", session_id, RequestContext(cancellable=True))
+
+        stats = system.get_runtime_stats()["cancellations"]
+        assert stats["requests"]["client_disconnected"] == 1
+        assert stats["skipped_stages"] == {"tool:search_course_content": 1}
+        assert system.session_manager.get_conversation_history(session_id) is None
+
+    def test_cancellation_during_search_stops_the_query(self, tmp_path):
+        config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                        ANTHROPIC_API_KEY="test", QUERY_MODE="tools")
+        system = RAGSystem(config)
+        embed = system.vector_store.embedding_function
+
+        def embed_then_disconnect(texts):
+            # The client leaves while the query is embedded, before the Chroma lookup
+            current_context().cancel("client_disconnected")
+            return embed(texts)
+
+        system.vector_store.embedding_function = embed_then_disconnect
+        generator = Mock()
+        generator.generate_response.side_effect = (
+            lambda query, tool_manager, **kwargs: tool_manager.execute_tool("search_course_content", query="MCP")
+        )
+        system.ai_generator = generator
+
+        with pytest.raises(RequestCancelled) as error:
+            system.query("What is MCP?", None, RequestContext(cancellable=True))
+
+        assert error.value.stage == "search stage"
@@ -0,0 +1,102 @@
+"""Tests for ChunkMerger post-retrieval merging and MMR"""
+from vector_store import SearchResults
+from chunk_merger import ChunkMerger
+
+
+def meta(chunk_index, lesson=1, course="Course A"):
+    return {"course_title": course, "lesson_number": lesson, "chunk_index": chunk_index}
+
+
+class TestChunkMergerMerge:
+    """Tests for merging adjacent chunks"""
+
+    def test_adjacent_chunks_merge_without_repeated_sentences(self):
+        """Overlapping sentences between neighbours appear once"""
+        results = SearchResults(
+            documents=["Beta two. Gamma three. Delta four.", "Lesson 1 content: Alpha one. Beta two."],
+            metadata=[meta(6), meta(5)],
+            distances=[0.2, 0.4]
+        )
+
+        merged = ChunkMerger().process(results)
+
+        assert merged.documents == ["Alpha one. Beta two. Gamma three. Delta four."]
+        assert merged.metadata[0]["chunk_index"] == 5
+        assert merged.metadata[0]["merged_chunks"] == 2
+        assert merged.distances == [0.2]
+
+    def test_non_adjacent_chunks_stay_separate(self):
+        """A gap in chunk_index keeps passages apart"""
+        results = SearchResults(
+            documents=["First.", "Third."],
+            metadata=[meta(1), meta(3)],
+            distances=[0.1, 0.2]
+        )
+
+        merged = ChunkMerger().process(results)
+
+        assert merged.documents == ["First.", "Third."]
+        assert "merged_chunks" not in merged.metadata[0]
+
+    def test_different_lessons_never_merge(self):
+        """Neighbouring indices from different lessons are distinct passages"""
+        results = SearchResults(
+            documents=["End of one.", "Start of two."],
+            metadata=[meta(4, lesson=1), meta(5, lesson=2)],
+            distances=[0.1, 0.2]
+        )
+
+        assert len(ChunkMerger().process(results).documents) == 2
+
+    def test_passages_ordered_by_best_rank(self):
+        """A merged passage takes the position of its best-ranked chunk"""
+        results = SearchResults(
+            documents=["Other course.", "Second.", "First."],
+            metadata=[meta(9, course="Course B"), meta(2), meta(1)],
+            distances=[0.3, 0.1, 0.5]
+        )
+
+        merged = ChunkMerger().process(results)
+
+        assert merged.documents == ["Other course.", "First. Second."]
+        assert merged.distances == [0.3, 0.1]
+
+    def test_chunks_without_index_pass_through(self):
+        """Results lacking chunk_index are left alone"""
+        results = SearchResults(
+            documents=["Loose text."],
+            metadata=[{"course_title": "Course A"}],
+            distances=[]
+        )
+
+        merged = ChunkMerger().process(results)
+
+        assert merged.documents == ["Loose text."]
+        assert merged.distances == []
+
+
+class TestChunkMergerMMR:
+    """Tests for MMR diversification"""
+
+    def test_mmr_disabled_uses_default_search_limit(self):
+        assert ChunkMerger().search_limit is None
+        assert ChunkMerger(mmr_lambda=0.5, candidate_pool=12).search_limit == 12
+
+    def test_mmr_prefers_diverse_passages(self):
+        """A near-duplicate loses to a slightly less relevant distinct passage"""
+        results = SearchResults(
+            documents=[
+                "Vector databases store embeddings for search.",
+                "Vector databases store embeddings for fast search.",
+                "Prompt compression reduces token cost.",
+            ],
+            metadata=[meta(1, lesson=1), meta(10, lesson=2), meta(20, lesson=3)],
+            distances=[0.10, 0.11, 0.30]
+        )
+
+        merged = ChunkMerger(mmr_lambda=0.5, max_results=2).process(results)
+
+        assert merged.documents == [
+            "Vector databases store embeddings for search.",
+            "Prompt compression reduces token cost.",
+        ]
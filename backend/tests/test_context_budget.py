@@ -0,0 +1,117 @@
+"""Tests for token-budgeted context assembly"""
+from vector_store import SearchResults
+from context_budget import (
+    ContextAssembler, estimate_tokens, strip_chunk_prefix, truncate_to_tokens
+)
+
+
+def sentence_doc(word: str, sentences: int) -> str:
+    """Document of identical short sentences, ~6 tokens each"""
+    return " ".join(f"This is {word} sentence {i}." for i in range(sentences))
+
+
+class TestTokenHelpers:
+    """Tests for estimate_tokens(), strip_chunk_prefix() and truncate_to_tokens()"""
+
+    def test_estimate_counts_words_and_punctuation(self):
+        assert estimate_tokens("Hello, world!") == 4
+        assert estimate_tokens("") == 0
+        assert estimate_tokens(None) == 0
+
+    def test_estimate_charges_long_words_extra(self):
+        assert estimate_tokens("internationalization") > estimate_tokens("word")
+
+    def test_strip_course_and_lesson_prefix(self):
+        assert strip_chunk_prefix("Course MCP Lesson 3 content: Servers expose tools.") == "Servers expose tools."
+        assert strip_chunk_prefix("Lesson 0 content: Welcome.") == "Welcome."
+        assert strip_chunk_prefix("No prefix here. Lesson 2 content: x") == "No prefix here. Lesson 2 content: x"
+
+    def test_truncate_keeps_whole_sentences(self):
+        text = sentence_doc("a", 10)
+
+        truncated = truncate_to_tokens(text, 20)
+
+        assert estimate_tokens(truncated) <= 20
+        assert truncated.endswith(".")
+        assert text.startswith(truncated)
+
+    def test_truncate_leaves_short_text_alone(self):
+        assert truncate_to_tokens("Short.", 100) == "Short."
+
+
+class TestFitResults:
+    """Tests for ContextAssembler.fit_results()"""
+
+    def test_everything_fits_within_budget(self):
+        """Results under budget are kept, prefixes stripped"""
+        assembler = ContextAssembler(results_budget=1000, history_budget=100)
+        results = SearchResults(
+            documents=["Lesson 1 content: First.", "Second."],
+            metadata=[{"lesson_number": 1}, {"lesson_number": 2}],
+            distances=[0.2, 0.3]
+        )
+
+        fitted = assembler.fit_results(results)
+
+        assert fitted.documents == ["First.", "Second."]
+        assert fitted.distances == [0.2, 0.3]
+
+    def test_lowest_scoring_chunks_dropped_first(self):
+        """The furthest chunk goes, the rest keep retrieval order"""
+        doc = sentence_doc("x", 10)
+        cost = estimate_tokens(doc) + 12
+        assembler = ContextAssembler(results_budget=cost * 2, history_budget=100)
+        results = SearchResults(
+            documents=[doc + " A", doc + " B", doc + " C"],
+            metadata=[{"i": 0}, {"i": 1}, {"i": 2}],
+            distances=[0.5, 0.9, 0.1]
+        )
+
+        fitted = assembler.fit_results(results)
+
+        assert [m["i"] for m in fitted.metadata] == [0, 2]
+        assert fitted.distances == [0.5, 0.1]
+
+    def test_partial_chunk_trimmed_into_remaining_budget(self):
+        """Leftover budget is filled with a sentence-trimmed chunk"""
+        doc = sentence_doc("y", 20)
+        assembler = ContextAssembler(results_budget=estimate_tokens(doc) + 12 + 60, history_budget=100)
+        results = SearchResults(documents=[doc, doc], metadata=[{}, {}], distances=[0.1, 0.2])
+
+        fitted = assembler.fit_results(results)
+
+        assert len(fitted.documents) == 2
+        assert fitted.documents[0] == doc
+        assert estimate_tokens(fitted.documents[1]) <= 60
+
+    def test_results_without_distances_use_retrieval_order(self):
+        """Missing distances fall back to the order results came in"""
+        doc = sentence_doc("z", 10)
+        assembler = ContextAssembler(results_budget=estimate_tokens(doc) + 12, history_budget=100)
+        results = SearchResults(documents=[doc, doc], metadata=[{"i": 0}, {"i": 1}], distances=[])
+
+        fitted = assembler.fit_results(results)
+
+        assert [m["i"] for m in fitted.metadata] == [0]
+        assert fitted.distances == []
+
+
+class TestFitHistory:
+    """Tests for ContextAssembler.fit_history()"""
+
+    def test_keeps_most_recent_lines(self):
+        lines = [f"User: {sentence_doc('h', 5)}" for _ in range(4)] + ["Assistant: latest"]
+        assembler = ContextAssembler(results_budget=100, history_budget=estimate_tokens(lines[0]) + 10)
+
+        fitted = assembler.fit_history(lines)
+
+        assert fitted == [lines[-2], lines[-1]]
+
+    def test_oversized_latest_line_is_truncated(self):
+        line = "Assistant: " + sentence_doc("long", 50)
+        assembler = ContextAssembler(results_budget=100, history_budget=60)
+
+        fitted = assembler.fit_history([line])
+
+        assert len(fitted) == 1
+        assert estimate_tokens(fitted[0]) <= 60
@@ -0,0 +1,71 @@
+"""Tests for the retrieval evaluation golden set and scoring"""
+from benchmarks.eval_retrieval import build_golden_set, evaluate, recommend, relevant_chunks
+from benchmarks.synthetic_corpus import write_corpus
+from models import CourseChunk
+
+
+def chunk(course, lesson, index, content):
+    return CourseChunk(content=content, course_title=course, lesson_number=lesson, chunk_index=index)
+
+
+class TestGoldenSet:
+    """Golden questions come from lesson text and are reproducible"""
+
+    def test_passages_come_from_their_lesson(self, tmp_path):
+        write_corpus(str(tmp_path), courses=2, lessons=2, words_per_lesson=200)
+
+        golden = build_golden_set(str(tmp_path), per_lesson=3, seed=1)
+
+        per_lesson = {(q.course_title, q.lesson_number) for q in golden}
+        assert len(per_lesson) == 4 and len(golden) <= 2 * 2 * 3
+        for question in golden:
+            assert 8 <= len(question.passage.split()) <= 12
+            text = (tmp_path / f"course_{int(question.course_title[-5:]):05d}.txt").read_text()
+            lesson_text = text.split(f"Lesson {question.lesson_number}:", 1)[1].split("\n\n", 1)[0]
+            assert question.passage in " ".join(lesson_text.split())
+
+    def test_sampling_is_deterministic(self, tmp_path):
+        write_corpus(str(tmp_path), courses=1, lessons=2, words_per_lesson=200)
+
+        assert build_golden_set(str(tmp_path), seed=3) == build_golden_set(str(tmp_path), seed=3)
+        assert build_golden_set(str(tmp_path), seed=3) != build_golden_set(str(tmp_path), seed=4)
+
+
+class TestScoring:
+    """Relevance follows the chunking under evaluation"""
+
+    def test_relevant_chunks_contain_the_passage_in_the_right_lesson(self, tmp_path):
+        write_corpus(str(tmp_path), courses=1, lessons=1, words_per_lesson=100)
+        question = build_golden_set(str(tmp_path), per_lesson=1)[0]
+        course = question.course_title
+        chunks = [
+            chunk(course, 0, 0, f"Lesson 0 content: before {question.passage} after"),
+            chunk(course, 0, 1, "unrelated text"),
+            chunk(course, 1, 2, question.passage),  # Same text in another lesson doesn't count
+        ]
+
+        assert relevant_chunks(chunks, [question]) == [{(course, 0)}]
+
+    def test_evaluate_reports_recall_and_latency_per_k(self, tmp_path):
+        docs = tmp_path / "docs"
+        write_corpus(str(docs), courses=3, lessons=2, words_per_lesson=150)
+        golden = build_golden_set(str(docs), per_lesson=2)
+
+        rows = evaluate(golden, "hashing", 400, 50, [1, 5], str(docs))
+
+        assert [row["max_results"] for row in rows] == [1, 5]
+        assert rows[0]["judged_questions"] > 0
+        assert rows[1]["chunk_recall"] >= rows[0]["chunk_recall"]
+        assert rows[1]["lesson_recall"] >= rows[0]["lesson_recall"]
+        assert 0 < rows[1]["mrr"] <= 1
+        assert rows[0]["p95_ms"] > 0 and rows[0]["disk_mb"] > 0
+
+    def test_recommend_picks_fastest_configuration_meeting_the_bar(self):
+        rows = [
+            {"chunk_recall": 0.95, "p95_ms": 9.0, "p50_ms": 5.0},
+            {"chunk_recall": 0.85, "p95_ms": 4.0, "p50_ms": 3.0},
+            {"chunk_recall": 0.60, "p95_ms": 1.0, "p50_ms": 1.0},
+        ]
+
+        assert recommend(rows, 0.8) is rows[1]
+        assert recommend(rows, 0.99) is None
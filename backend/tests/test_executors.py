@@ -0,0 +1,89 @@
+"""Tests for the bounded per-stage executors"""
+import contextvars
+import threading
+import pytest
+from executors import BoundedExecutor, ExecutorSaturated, StageExecutors, run_in_stage
+
+
+def blocker():
+    """Event-gated task that reports when it has started"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def task():
+        started.set()
+        release.wait(timeout=5)
+        return "done"
+
+    return task, started, release
+
+
+class TestBoundedExecutor:
+    """Tests for BoundedExecutor"""
+
+    def test_rejects_beyond_queue_limit(self):
+        pool = BoundedExecutor("test", workers=1, max_queue=1)
+        task, started, release = blocker()
+        running = pool.submit(task)
+        started.wait(timeout=5)
+        queued = pool.submit(task)
+
+        with pytest.raises(ExecutorSaturated):
+            pool.submit(task)
+
+        release.set()
+        assert running.result() == queued.result() == "done"
+        stats = pool.get_stats()
+        assert stats["rejected"] == 1
+        assert stats["completed"] == 2
+        assert stats["max_wait_ms"] > 0
+        pool.shutdown()
+
+    def test_context_variables_follow_the_task(self):
+        var = contextvars.ContextVar("var", default="unset")
+        pool = BoundedExecutor("test", workers=1, max_queue=4)
+        var.set("request-1")
+
+        assert pool.run(var.get) == "request-1"
+        pool.shutdown()
+
+    def test_nested_submission_runs_inline(self):
+        """A task waiting on its own pool can't deadlock a single worker"""
+        pool = BoundedExecutor("test", workers=1, max_queue=0)
+
+        assert pool.run(lambda: pool.run(lambda: 42)) == 42
+        pool.shutdown()
+
+    def test_errors_propagate_and_free_the_slot(self):
+        pool = BoundedExecutor("test", workers=1, max_queue=0)
+
+        def fail():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            pool.run(fail)
+        assert pool.run(lambda: "ok") == "ok"
+        pool.shutdown()
+
+
+class TestStageExecutors:
+    """Tests for stage isolation"""
+
+    def test_saturated_ingest_does_not_block_search(self):
+        executors = StageExecutors(embedding_workers=1, search_workers=1, ingest_workers=1, max_queue=0)
+        task, started, release = blocker()
+        executors.ingest.submit(task)
+        started.wait(timeout=5)
+
+        with pytest.raises(ExecutorSaturated):
+            executors.ingest.submit(task)
+        assert run_in_stage(executors, "search", lambda: "results") == "results"
+
+        release.set()
+        stats = executors.get_stats()
+        assert set(stats) == {"embedding", "search", "ingest"}
+        assert stats["ingest"]["rejected"] == 1
+        executors.shutdown()
+
+    def test_runs_inline_without_executors(self):
+        assert run_in_stage(None, "search", lambda x: x * 2, 21) == 42
@@ -0,0 +1,110 @@
+"""Tests for the local Messages API stand-in and the load generator summary"""
+import anthropic
+import pytest
+from benchmarks.fake_anthropic_server import FakeAnthropicServer, LatencyModel, ScriptedReplies
+from benchmarks.loadgen import LoadResult, percentile
+
+TOOLS = [{"name": "search_course_content", "description": "Search",
+          "input_schema": {"type": "object", "properties": {"query": {"type": "string"}}}}]
+
+
+@pytest.fixture
+def server():
+    with FakeAnthropicServer(latency=LatencyModel("fixed:0.01")) as server:
+        yield server
+
+
+def client_for(server, **kwargs):
+    return anthropic.Anthropic(api_key="fake", base_url=server.url, **kwargs)
+
+
+def request(**extra):
+    return {"model": "fake-model", "max_tokens": 100,
+            "messages": [{"role": "user", "content": "Answer this: What is MCP?"}], **extra}
+
+
+class TestFakeAnthropicServer:
+    """The unmodified SDK talks to the stand-in"""
+
+    def test_tool_use_then_answer(self, server):
+        client = client_for(server)
+
+        first = client.messages.create(**request(tools=TOOLS))
+        assert first.stop_reason == "tool_use"
+        assert first.content[0].input == {"query": "What is MCP?"}
+
+        messages = request()["messages"] + [
+            {"role": "assistant", "content": first.content},
+            {"role": "user", "content": [{"type": "tool_result", "tool_use_id": first.content[0].id,
+                                          "content": "results"}]},
+        ]
+        final = client.messages.create(**request(messages=messages, tools=TOOLS))
+        assert final.stop_reason == "end_turn"
+        assert final.usage.input_tokens > 0
+
+    def test_streaming_matches_the_sdk_protocol(self, server):
+        with client_for(server).messages.stream(**request()) as stream:
+            text = "".join(stream.text_stream)
+            message = stream.get_final_message()
+
+        assert text == message.content[0].text
+        assert message.stop_reason == "end_turn"
+        assert message.usage.output_tokens == 20
+        assert server.stats["streamed"] == 1
+
+    def test_streamed_tool_use(self, server):
+        with client_for(server).messages.stream(**request(tools=TOOLS)) as stream:
+            message = stream.get_final_message()
+
+        assert message.content[0].type == "tool_use"
+        assert message.content[0].input == {"query": "What is MCP?"}
+
+    def test_scripted_replies(self):
+        script = ScriptedReplies([{"type": "text", "text": "first"}, {"type": "text", "text": "second"}])
+        with FakeAnthropicServer(latency=LatencyModel("fixed:0"), script=script) as server:
+            client = client_for(server)
+            texts = [client.messages.create(**request()).content[0].text for _ in range(3)]
+
+        assert texts == ["first", "second", "first"]
+
+    def test_injected_errors(self):
+        with FakeAnthropicServer(latency=LatencyModel("fixed:0"), error_rate=1.0, error_status=529) as server:
+            with pytest.raises(anthropic.APIStatusError) as error:
+                client_for(server, max_retries=0).messages.create(**request())
+
+        assert error.value.status_code == 529
+        assert error.value.response.headers["retry-after"] == "1"
+
+    def test_connections_are_kept_alive(self, server):
+        client = client_for(server)
+        for _ in range(3):
+            client.messages.create(**request())
+
+        assert server.stats["connections"] == 1
+
+
+class TestLatencyModel:
+    def test_specs(self):
+        assert LatencyModel("fixed:0.5").sample() == 0.5
+        assert 0.2 <= LatencyModel("uniform:0.2,0.4", seed=1).sample() <= 0.4
+        assert LatencyModel("lognormal:0.5,0.3", seed=1).sample() > 0
+
+    def test_invalid_spec(self):
+        with pytest.raises(ValueError):
+            LatencyModel("normal:1")
+
+
+class TestLoadSummary:
+    def test_percentiles_and_error_rate(self):
+        result = LoadResult()
+        for ms in range(1, 101):
+            result.record("200", ms / 1000)
+        result.record("503", 0.001)
+        result.finished = result.started + 10
+
+        summary = result.summary()
+
+        assert percentile([], 0.5) == 0.0
+        assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+        assert summary["error_rate"] == round(1 / 101, 4)
+        assert summary["throughput_rps"] == 10.0
@@ -0,0 +1,223 @@
+"""Tests for background ingestion, progress tracking and readiness"""
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from config import Config
+import pytest
+from ingestion import (
+    BackgroundIngestor, CourseAlreadyIndexed, IngestionJobQueue, IngestionProgress, IngestQueueFull, check_readiness
+)
+from rag_system import RAGSystem
+from vector_store import HASHING_EMBEDDING_MODEL
+
+DOCS = Path(__file__).resolve().parents[2] / "docs"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestIngestionProgress:
+    """Tests for IngestionProgress"""
+
+    def test_rate_and_eta(self):
+        clock = FakeClock()
+        progress = IngestionProgress(clock)
+        progress.start(4)
+        clock.now = 10
+        progress.file_done(chunks=50, added=True)
+
+        snapshot = progress.snapshot()
+
+        assert snapshot["chunks_per_second"] == 5.0
+        assert snapshot["eta_seconds"] == 30.0
+        assert snapshot["files_done"] == 1
+
+    def test_finished_run_has_no_eta(self):
+        progress = IngestionProgress(FakeClock())
+        progress.start(1)
+        progress.file_done(failed=True)
+        progress.finish()
+
+        snapshot = progress.snapshot()
+        assert snapshot["state"] == "done"
+        assert snapshot["eta_seconds"] is None
+        assert snapshot["files_failed"] == 1
+
+
+class TestBackgroundIngestor:
+    """Tests for BackgroundIngestor"""
+
+    def test_start_returns_before_ingestion_finishes(self):
+        release = threading.Event()
+
+        def slow_ingest(folder, clear_existing, progress):
+            progress.start(1)
+            release.wait(timeout=5)
+            progress.file_done(chunks=3, added=True)
+            return 1, 3
+
+        ingestor = BackgroundIngestor(slow_ingest)
+        progress = ingestor.start("docs")
+        assert not progress.complete
+
+        release.set()
+        ingestor.join(timeout=5)
+        assert progress.snapshot()["state"] == "done"
+
+    def test_failure_is_reported(self):
+        def broken(folder, clear_existing, progress):
+            raise OSError("disk gone")
+
+        ingestor = BackgroundIngestor(broken)
+        ingestor.start("docs")
+        ingestor.join(timeout=5)
+
+        assert ingestor.progress.state == "failed"
+        assert ingestor.progress.error == "disk gone"
+
+    def test_folder_ingestion_tracks_every_file(self, tmp_path):
+        docs = tmp_path / "docs"
+        docs.mkdir()
+        for source in sorted(DOCS.glob("*.txt"))[:2]:
+            shutil.copy(source, docs / source.name)
+        (docs / "broken.txt").write_bytes(b"\xff\xfe not a course")
+        config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                        ANTHROPIC_API_KEY="test")
+        system = RAGSystem(config)
+
+        ingestor = BackgroundIngestor(system.add_course_folder)
+        ingestor.start(str(docs))
+        ingestor.join(timeout=60)
+
+        snapshot = ingestor.progress.snapshot()
+        assert snapshot["files_total"] == 3
+        assert snapshot["files_done"] == 3
+        assert snapshot["courses_added"] == 2
+        assert snapshot["chunks_embedded"] > 0
+        assert system.vector_store.get_course_count() == 2
+
+    def test_adding_an_indexed_course_again_raises(self, tmp_path):
+        config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                        ANTHROPIC_API_KEY="test")
+        system = RAGSystem(config)
+        source = str(sorted(DOCS.glob("*.txt"))[0])
+        system.add_course_document(source)
+
+        with pytest.raises(CourseAlreadyIndexed):
+            system.add_course_document(source)
+        assert system.vector_store.get_course_count() == 1
+
+
+def wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} never reached {status}: {queue.get(job_id)}")
+
+
+class FakeCourse:
+    def __init__(self, title):
+        self.title = title
+
+
+class TestIngestionJobQueue:
+    """Tests for the upload job queue"""
+
+    def upload(self, tmp_path, name="course.txt"):
+        directory = tmp_path / name.replace(".", "_")
+        directory.mkdir()
+        path = directory / name
+        path.write_text("Course Title: Test")
+        return name, str(path)
+
+    def test_job_reports_course_chunks_and_timings(self, tmp_path):
+        queue = IngestionJobQueue(lambda path: (FakeCourse("Test"), 12))
+        name, path = self.upload(tmp_path)
+
+        job = queue.submit([(name, path)])[0]
+        status = wait_for(queue, job.id, "done")
+
+        assert status["course_title"] == "Test"
+        assert status["chunks"] == 12
+        assert status["processing_ms"] >= 0
+        assert not os.path.exists(path)
+
+    def test_full_queue_rejects_whole_upload(self, tmp_path):
+        release = threading.Event()
+
+        def slow(path):
+            release.wait(timeout=5)
+            return FakeCourse("Test"), 1
+
+        queue = IngestionJobQueue(slow, workers=1, max_queue=2)
+        first = queue.submit([self.upload(tmp_path, "a.txt")])[0]
+        wait_for(queue, first.id, "running")
+        queue.submit([self.upload(tmp_path, "b.txt"), self.upload(tmp_path, "c.txt")])
+
+        assert not queue.has_room()
+        with pytest.raises(IngestQueueFull):
+            queue.submit([self.upload(tmp_path, "d.txt")])
+
+        release.set()
+        assert queue.get_stats()["rejected"] == 1
+
+    def test_unparseable_document_fails(self, tmp_path):
+        queue = IngestionJobQueue(lambda path: (None, 0))
+
+        job = queue.submit([self.upload(tmp_path)])[0]
+        status = wait_for(queue, job.id, "failed")
+
+        assert status["error"] == "Could not parse the document as a course"
+        assert queue.get("unknown") is None
+
+    def test_already_indexed_course_is_skipped(self, tmp_path):
+        def duplicate(path):
+            raise CourseAlreadyIndexed("Test")
+
+        queue = IngestionJobQueue(duplicate)
+        job = queue.submit([self.upload(tmp_path)])[0]
+        status = wait_for(queue, job.id, "skipped")
+
+        assert (status["course_title"], status["error"]) == ("Test", "Course already indexed: Test")
+        assert queue.get_stats()["skipped"] == 1
+
+    def test_processing_errors_reach_the_job(self, tmp_path):
+        def broken(path):
+            raise OSError("disk full")
+
+        queue = IngestionJobQueue(broken)
+        job = queue.submit([self.upload(tmp_path)])[0]
+
+        assert wait_for(queue, job.id, "failed")["error"] == "OSError: disk full"
+
+
+class TestReadiness:
+    """Tests for check_readiness()"""
+
+    def test_ready_once_enough_courses_are_indexed(self):
+        progress = IngestionProgress()
+        progress.start(4)
+
+        assert check_readiness(progress, 0, 1, False)[0] is False
+        assert check_readiness(progress, 1, 1, False) == (True, [])
+
+    def test_can_require_finished_ingestion(self):
+        progress = IngestionProgress()
+        progress.start(4)
+
+        ready, reasons = check_readiness(progress, 3, 1, True)
+        assert not ready
+        assert reasons == ["startup ingestion running"]
+
+        progress.finish()
+        assert check_readiness(progress, 3, 1, True)[0]
@@ -0,0 +1,89 @@
+"""Tests for the pooled, warmed HTTP connections to the LLM API"""
+import shutil
+import subprocess
+import time
+import pytest
+from ai_generator import AIGenerator
+from benchmarks.fake_anthropic_server import FakeAnthropicServer, LatencyModel
+from llm_connections import LLMConnectionPool
+
+pytestmark = pytest.mark.skipif(shutil.which("openssl") is None, reason="needs openssl to make a certificate")
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    """Self-signed certificate for 127.0.0.1; returns (certfile, keyfile)"""
+    directory = tmp_path_factory.mktemp("tls")
+    certfile, keyfile = str(directory / "cert.pem"), str(directory / "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=127.0.0.1",
+         "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True
+    )
+    return certfile, keyfile
+
+
+@pytest.fixture
+def https_server(certificate):
+    with FakeAnthropicServer(latency=LatencyModel("fixed:0.01"), certfile=certificate[0],
+                             keyfile=certificate[1]) as server:
+        yield server
+
+
+def pool_for(server, certificate, **kwargs):
+    kwargs.setdefault("http2", False)
+    return LLMConnectionPool(server.url, verify=certificate[0], **kwargs)
+
+
+def ask(pool, server, times):
+    generator = AIGenerator("fake-key", "test-model", server.url, http_client=pool.http_client)
+    for _ in range(times):
+        assert generator.generate_response("What is MCP?")
+
+
+class TestConnectionReuse:
+    """Requests share keep-alive connections over HTTPS"""
+
+    def test_only_the_first_request_pays_for_a_connection(self, https_server, certificate):
+        pool = pool_for(https_server, certificate, warm_connections=0)
+
+        ask(pool, https_server, 4)
+
+        stats = pool.get_stats()
+        assert (stats["requests"], stats["new_connections"], stats["tls_handshakes"]) == (4, 1, 1)
+        assert stats["reuse_rate"] == 0.75
+        assert stats["http_versions"] == {"HTTP/1.1": 4}
+        assert https_server.stats["tls_handshakes"] == 1
+        pool.close()
+
+    def test_warmed_connections_serve_the_first_requests(self, https_server, certificate):
+        pool = pool_for(https_server, certificate, warm_connections=2)
+
+        assert pool.warm() == 2
+        ask(pool, https_server, 3)
+
+        stats = pool.get_stats()
+        assert (stats["new_connections"], stats["reuse_rate"], stats["warm_requests"]) == (0, 1.0, 2)
+        assert https_server.stats["tls_handshakes"] == 2
+        pool.close()
+
+
+class TestWarming:
+    def test_idle_pool_is_rewarmed(self, https_server, certificate):
+        pool = pool_for(https_server, certificate, warm_connections=1, warm_interval=0.2)
+
+        pool.start_warmer()
+        time.sleep(0.7)
+        pool.close()
+
+        assert pool.get_stats()["warm_requests"] >= 2
+
+    def test_unreachable_api_counts_a_failure(self):
+        with FakeAnthropicServer() as server:
+            url = server.url
+        # Nothing listens on the port now
+        pool = LLMConnectionPool(url, warm_connections=1)
+
+        assert pool.warm() == 0
+        assert pool.get_stats()["warm_failures"] == 1
+        pool.close()
@@ -0,0 +1,202 @@
+"""Tests for rate-limit-aware scheduling of LLM calls"""
+import threading
+import time
+from types import SimpleNamespace
+import anthropic
+import httpx
+import pytest
+from admission import TokenBucket
+from llm_scheduler import LLMRateLimited, LLMScheduler, estimate_request_tokens
+from request_context import BULK, RequestContext
+
+SMALL = {"messages": [{"role": "user", "content": "hi"}]}
+LARGE = {"messages": [{"role": "user", "content": "word " * 1000}]}
+
+
+def api_error(cls, status, headers=None):
+    response = httpx.Response(status, headers=headers or {},
+                              request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+    return cls("failed", response=response, body=None)
+
+
+PARAMS = {"model": "test", "max_tokens": 10, **SMALL}
+
+
+def api_client(*statuses):
+    """A real client whose HTTP requests get each status in turn; also returns the statuses sent"""
+    remaining, sent = list(statuses), []
+
+    def handle(request):
+        status = remaining.pop(0)
+        sent.append(status)
+        if status != 200:
+            return httpx.Response(status, headers={"retry-after": "0"},
+                                  json={"type": "error", "error": {"type": "overloaded_error", "message": "busy"}})
+        return httpx.Response(200, json={
+            "id": "msg_1", "type": "message", "role": "assistant", "model": "test",
+            "content": [{"type": "text", "text": "ok"}], "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": 5, "output_tokens": 1},
+        })
+
+    client = anthropic.Anthropic(api_key="test", max_retries=0,
+                                 http_client=httpx.Client(transport=httpx.MockTransport(handle)))
+    return client, sent
+
+
+def failing(*errors, result="ok"):
+    """A call raising each error in turn, then returning result"""
+    remaining = list(errors)
+    calls = []
+
+    def call():
+        calls.append(time.monotonic())
+        if remaining:
+            raise remaining.pop(0)
+        return result
+
+    call.calls = calls
+    return call
+
+
+class TestTokenBucketCost:
+    """Buckets charge variable costs, e.g. tokens per call"""
+
+    def test_ready_in_takes_nothing_and_take_charges_cost(self):
+        bucket = TokenBucket(rate=10, burst=100, now=0.0)
+
+        assert bucket.ready_in(0.0, 60) == 0.0
+        assert bucket.take(0.0, 60) == 0.0
+        assert bucket.ready_in(0.0, 60) == pytest.approx(2.0)
+        assert bucket.take(0.0, 60) == pytest.approx(2.0)
+        assert bucket.tokens == pytest.approx(40)
+
+    def test_cost_above_burst_waits_for_a_full_bucket(self):
+        bucket = TokenBucket(rate=10, burst=100, now=0.0)
+        bucket.take(0.0, 50)
+
+        assert bucket.ready_in(0.0, 500) == pytest.approx(5.0)
+
+
+class TestEstimate:
+    def test_counts_system_messages_and_tools(self):
+        base = estimate_request_tokens(SMALL)
+        tool_use = SimpleNamespace(type="tool_use", input={"query": "retrieval augmented generation"})
+
+        assert estimate_request_tokens({**SMALL, "system": "You answer questions"}) > base
+        assert estimate_request_tokens({**SMALL, "tools": [{"name": "search", "description": "Search"}]}) > base
+        assert estimate_request_tokens({"messages": [
+            {"role": "assistant", "content": [tool_use]},
+            {"role": "user", "content": [{"type": "tool_result", "content": "lesson text " * 50}]},
+        ]}) > 100
+
+
+class TestScheduling:
+    """Calls start in priority order once the buckets have room"""
+
+    def test_interactive_calls_overtake_waiting_bulk_calls(self):
+        scheduler = LLMScheduler(input_tokens_per_minute=600, interactive_reserve=0)
+        scheduler.run(lambda: "drain", LARGE)  # Empties the 600-token bucket; refills at 10/s
+        order = []
+
+        def submit(priority):
+            scheduler.run(lambda: order.append(priority), SMALL, RequestContext(priority=priority))
+
+        bulk = threading.Thread(target=submit, args=(BULK,))
+        bulk.start()
+        time.sleep(0.02)
+        assert scheduler.get_stats()["waiting"][BULK] == 1
+        interactive = threading.Thread(target=submit, args=("interactive",))
+        interactive.start()
+        bulk.join(5)
+        interactive.join(5)
+
+        assert order == ["interactive", BULK]
+        stats = scheduler.get_stats()
+        assert stats["started"] == {"interactive": 2, BULK: 1}
+        assert stats["max_wait_ms"][BULK] > stats["max_wait_ms"]["interactive"] > 0
+
+    def test_bulk_calls_leave_the_reserve_to_interactive_ones(self):
+        scheduler = LLMScheduler(requests_per_minute=10, interactive_reserve=0.5, max_wait=0.1)
+        for _ in range(5):
+            scheduler.run(lambda: None, SMALL, RequestContext(priority=BULK))
+
+        with pytest.raises(LLMRateLimited):
+            scheduler.run(lambda: None, SMALL, RequestContext(priority=BULK))
+        assert scheduler.run(lambda: "served", SMALL) == "served"
+        assert scheduler.get_stats()["rejected"] == 1
+
+    def test_wait_beyond_the_request_deadline_is_rejected_at_once(self):
+        scheduler = LLMScheduler(requests_per_minute=1)
+        scheduler.run(lambda: None, SMALL)
+
+        started = time.monotonic()
+        with pytest.raises(LLMRateLimited) as raised:
+            scheduler.run(lambda: None, SMALL, RequestContext(deadline=time.monotonic() + 5))
+
+        assert time.monotonic() - started < 0.5
+        assert raised.value.retry_after > 5
+
+    def test_billed_tokens_correct_the_estimate(self):
+        scheduler = LLMScheduler(input_tokens_per_minute=1000)
+        billed = SimpleNamespace(usage=SimpleNamespace(input_tokens=900))
+
+        scheduler.run(lambda: billed, SMALL)
+
+        assert scheduler.get_stats()["available"]["input_tokens"] == pytest.approx(100, abs=1)
+
+
+class TestRetries:
+    """Retryable failures back off, honouring retry-after"""
+
+    def test_rate_limited_call_waits_retry_after_and_succeeds(self):
+        scheduler = LLMScheduler(backoff_base=0.01)
+        call = failing(api_error(anthropic.RateLimitError, 429, {"retry-after": "0.2"}))
+
+        assert scheduler.run(call, SMALL) == "ok"
+
+        assert call.calls[1] - call.calls[0] >= 0.2
+        stats = scheduler.get_stats()
+        assert (stats["rate_limited_responses"], stats["retries"]) == (1, 1)
+
+    def test_rate_limit_pauses_other_calls(self):
+        scheduler = LLMScheduler(backoff_base=0.01)
+        first = threading.Thread(target=scheduler.run, args=(
+            failing(api_error(anthropic.RateLimitError, 429, {"retry-after-ms": "300"})), SMALL))
+        first.start()
+        time.sleep(0.05)
+
+        started = time.monotonic()
+        scheduler.run(lambda: None, SMALL)
+        first.join(5)
+
+        assert time.monotonic() - started >= 0.2
+
+    def test_overloaded_responses_from_the_api_are_retried(self):
+        scheduler = LLMScheduler(max_retries=2, backoff_base=0.01)
+        client, statuses = api_client(529, 529, 200)
+
+        response = scheduler.run(lambda: client.messages.create(**PARAMS), PARAMS)
+
+        assert response.content[0].text == "ok"
+        assert statuses == [529, 529, 200]
+        assert scheduler.get_stats()["retries"] == 2
+
+    def test_persistent_overload_raises_rate_limited(self):
+        scheduler = LLMScheduler(max_retries=2, backoff_base=0.01)
+        client, statuses = api_client(529, 529, 529)
+
+        with pytest.raises(LLMRateLimited):
+            scheduler.run(lambda: client.messages.create(**PARAMS), PARAMS)
+
+        assert statuses == [529, 529, 529]
+        assert scheduler.get_stats()["rejected"] == 1
+
+    def test_connection_errors_retry_and_client_errors_do_not(self):
+        scheduler = LLMScheduler(backoff_base=0.01)
+        request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+
+        assert scheduler.run(failing(anthropic.APIConnectionError(request=request)), SMALL) == "ok"
+        bad_request = failing(api_error(anthropic.BadRequestError, 400))
+        with pytest.raises(anthropic.BadRequestError):
+            scheduler.run(bad_request, SMALL)
+        assert len(bad_request.calls) == 1
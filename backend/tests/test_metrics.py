@@ -0,0 +1,127 @@
+"""Tests for the metrics registry and Prometheus rendering"""
+import os
+import threading
+import pytest
+from metrics import MetricsRegistry, STAGE_ERRORS, STAGE_SECONDS, render_prometheus, time_stage
+from search_tools import CourseSearchTool
+
+# Live processes standing in for two workers: the test runner's parent and the runner itself
+WORKER_PID, SCRAPER_PID = os.getppid(), os.getpid()
+
+
+class TestHistogram:
+    """Tests for histogram observations"""
+
+    def test_observations_fill_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            latency.observe(value, "search")
+
+        text = registry.render()
+
+        assert 'latency_seconds_bucket{stage="search",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{stage="search",le="1"} 3' in text
+        assert 'latency_seconds_bucket{stage="search",le="+Inf"} 4' in text
+        assert 'latency_seconds_sum{stage="search"} 6.05' in text
+        assert 'latency_seconds_count{stage="search"} 4' in text
+        assert "# TYPE latency_seconds histogram" in text
+
+    def test_stage_timer_counts_errors(self):
+        before = (STAGE_SECONDS.count("test_stage"), STAGE_ERRORS.value("test_stage"))
+
+        with pytest.raises(RuntimeError):
+            with time_stage("test_stage"):
+                raise RuntimeError("down")
+
+        assert STAGE_SECONDS.count("test_stage") == before[0] + 1
+        assert STAGE_ERRORS.value("test_stage") == before[1] + 1
+
+    def test_concurrent_observations_are_not_lost(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram("latency_seconds", "Latency")
+        threads = [
+            threading.Thread(target=lambda: [latency.observe(0.01) for _ in range(1000)])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert latency.count() == 4000
+
+    def test_duplicate_names_are_rejected(self):
+        registry = MetricsRegistry()
+        registry.counter("queries_total", "Queries")
+        with pytest.raises(ValueError):
+            registry.counter("queries_total", "Queries")
+
+
+class TestMultiProcess:
+    """Snapshots written by several processes are summed on scrape"""
+
+    def test_snapshots_are_merged(self, tmp_path, monkeypatch):
+        worker = MetricsRegistry(str(tmp_path))
+        worker.counter("queries_total", "Queries", ("mode",)).inc("tools", amount=2)
+        worker.histogram("latency_seconds", "Latency", buckets=(1.0,)).observe(0.5)
+        monkeypatch.setattr("os.getpid", lambda: WORKER_PID)
+        worker.flush()
+
+        scraper = MetricsRegistry(str(tmp_path))
+        scraper.counter("queries_total", "Queries", ("mode",)).inc("tools")
+        scraper.histogram("latency_seconds", "Latency", buckets=(1.0,)).observe(2.0)
+        monkeypatch.setattr("os.getpid", lambda: SCRAPER_PID)
+
+        text = scraper.render()
+
+        assert 'queries_total{mode="tools"} 3' in text
+        assert 'latency_seconds_bucket{le="1"} 1' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+        assert "latency_seconds_count 2" in text
+
+    def test_gauges_render_and_sum_across_processes(self, tmp_path, monkeypatch):
+        worker = MetricsRegistry(str(tmp_path))
+        worker.gauge("waiting", "Waiting").set(2)
+        monkeypatch.setattr("os.getpid", lambda: WORKER_PID)
+        worker.flush()
+
+        scraper = MetricsRegistry(str(tmp_path))
+        scraper.gauge("waiting", "Waiting").set(3)
+        monkeypatch.setattr("os.getpid", lambda: SCRAPER_PID)
+
+        text = scraper.render()
+
+        assert "# TYPE waiting gauge" in text
+        assert "waiting 5" in text
+
+    def test_snapshots_of_exited_processes_are_removed(self, tmp_path, monkeypatch):
+        exited = MetricsRegistry(str(tmp_path))
+        exited.counter("queries_total", "Queries").inc(amount=5)
+        monkeypatch.setattr("os.getpid", lambda: 2 ** 22 + 1)  # Above Linux's pid_max, so never running
+        exited.flush()
+        monkeypatch.undo()
+
+        scraper = MetricsRegistry(str(tmp_path))
+        scraper.counter("queries_total", "Queries").inc()
+
+        assert "queries_total 1" in scraper.render()
+        assert [path.name for path in tmp_path.iterdir()] == [f"metrics-{os.getpid()}.json"]
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("errors_total", "Errors", ("stage",)).inc('say "hi"\n')
+
+        assert 'errors_total{stage="say \\"hi\\"\\n"} 1' in render_prometheus(registry.snapshot())
+
+
+class TestStageTimers:
+    """Query stages record into the process-wide stage histogram"""
+
+    def test_link_lookups_are_timed(self, mock_vector_store, sample_search_results):
+        mock_vector_store.search.return_value = sample_search_results(num_docs=2)
+        before = STAGE_SECONDS.count("link_lookup")
+
+        CourseSearchTool(mock_vector_store).execute("query")
+
+        assert STAGE_SECONDS.count("link_lookup") == before + 2
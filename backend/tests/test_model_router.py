@@ -0,0 +1,109 @@
+"""Tests for routing LLM calls between the primary and fast models"""
+from types import SimpleNamespace
+from unittest.mock import Mock
+import pytest
+from ai_generator import AIGenerator
+from model_router import ModelRouter, is_simple_query
+
+PRIMARY, FAST = "primary", "fast"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def router(**kwargs):
+    return ModelRouter(PRIMARY, FAST, **kwargs)
+
+
+class TestComplexity:
+    @pytest.mark.parametrize("query", ["What is the capital of France?", "Who teaches the MCP course?"])
+    def test_short_plain_questions_are_simple(self, query):
+        assert is_simple_query(query, 12)
+
+    @pytest.mark.parametrize("query", [
+        "Compare lesson 1 and lesson 2",
+        "Why does chunk overlap help?",
+        "Explain tool use",
+        "What is MCP? Who built it?",
+        "What are all of the topics covered across every lesson of the retrieval course in order",
+    ])
+    def test_long_multi_part_or_reasoning_questions_are_not(self, query):
+        assert not is_simple_query(query, 12)
+
+
+class TestChoose:
+    """Each signal sends calls to the fast model, in order of precedence"""
+
+    def test_default_and_simple_queries(self):
+        models = router()
+
+        assert models.choose("llm_call", "Explain how retrieval works in lesson 3") == (PRIMARY, "default")
+        assert models.choose("llm_call", "Who teaches MCP?") == (FAST, "simple_query")
+        assert models.choose("llm_call", "Who teaches MCP?", has_history=True) == (PRIMARY, "default")
+        assert models.choose("llm_followup", "Who teaches MCP?") == (PRIMARY, "default")
+
+    def test_synthesis_uses_fast_model_unless_disabled(self):
+        assert router().choose("llm_followup", "Explain lesson 3", synthesis=True) == (FAST, "synthesis")
+        assert router(synthesis_on_fast=False).choose("llm_followup", "Explain", synthesis=True)[0] == PRIMARY
+
+    def test_queue_depth_switches_all_calls(self):
+        depth = [0]
+        models = router(max_queue_depth=3, queue_depth=lambda: depth[0])
+
+        assert models.choose("llm_call", "Explain lesson 3")[0] == PRIMARY
+        depth[0] = 3
+        assert models.choose("llm_call", "Explain lesson 3") == (FAST, "queue_depth")
+
+    def test_slow_primary_switches_until_its_samples_age_out(self):
+        clock = FakeClock()
+        models = router(latency_slo=2.0, latency_window=60, clock=clock)
+        for _ in range(4):
+            models.record(PRIMARY, 5.0)
+        assert models.choose("llm_call", "Explain lesson 3")[0] == PRIMARY  # Too few samples to judge
+
+        models.record(PRIMARY, 5.0)
+        assert models.choose("llm_call", "Explain lesson 3") == (FAST, "latency_slo")
+
+        clock.now += 61
+        assert models.choose("llm_call", "Explain lesson 3") == (PRIMARY, "default")
+
+    def test_stats_report_decisions_and_latency_per_model(self):
+        models = router()
+        models.choose("llm_call", "Who teaches MCP?")
+        models.choose("llm_call", "Explain lesson 3")
+        models.record(FAST, 0.2)
+        models.record(FAST, 0.4)
+
+        stats = models.get_stats()
+
+        assert stats["decisions"] == {"simple_query": 1, "default": 1}
+        assert stats["models"][FAST] == {"calls": 2, "recent_calls": 2, "p50_ms": 400.0, "p95_ms": 400.0}
+        assert stats["models"][PRIMARY]["p95_ms"] is None
+
+
+class TestGeneratorRouting:
+    """AIGenerator sends each call to the routed model and records its latency"""
+
+    def test_tool_flow_answers_with_fast_model(self):
+        tool_use = SimpleNamespace(type="tool_use", name="search_course_content", id="t1", input={"query": "q"})
+        client = Mock()
+        client.messages.create.side_effect = [
+            SimpleNamespace(stop_reason="tool_use", content=[tool_use], usage=None),
+            SimpleNamespace(stop_reason="end_turn", content=[SimpleNamespace(type="text", text="answer")], usage=None),
+        ]
+        generator = AIGenerator("test-key", PRIMARY, router=router(), client=client)
+        tool_manager = Mock()
+        tool_manager.execute_tool.return_value = "results"
+
+        answer = generator.generate_response("Explain lesson 3 of the MCP course", tools=[{}],
+                                             tool_manager=tool_manager)
+
+        assert answer == "answer"
+        assert [call.kwargs["model"] for call in client.messages.create.call_args_list] == [PRIMARY, FAST]
+        models = generator.router.get_stats()["models"]
+        assert models[PRIMARY]["calls"] == 1 and models[FAST]["calls"] == 1
@@ -0,0 +1,117 @@
+"""Tests for QueryRouter routing decisions"""
+import pytest
+from vector_store import SearchResults
+from query_router import QueryRouter
+
+
+@pytest.fixture
+def router(mock_vector_store):
+    """QueryRouter over a two-course catalog"""
+    mock_vector_store.get_existing_course_titles.return_value = [
+        "MCP: Build Rich-Context AI Apps with Anthropic",
+        "Advanced Retrieval for AI with Chroma",
+    ]
+    return QueryRouter(mock_vector_store, distance_threshold=1.0)
+
+
+class TestQueryRouter:
+    """Tests for QueryRouter.route()"""
+
+    def test_acronym_matches_course(self, router, mock_vector_store):
+        """Acronyms from course titles identify the course"""
+        decision = router.route("What is an MCP server?")
+
+        assert decision.course_specific
+        assert decision.course_title == "MCP: Build Rich-Context AI Apps with Anthropic"
+        assert decision.reason == "catalog"
+        mock_vector_store.search.assert_not_called()
+
+    def test_distinctive_title_words_match_course(self, router):
+        """Two distinctive title words are enough to name a course"""
+        decision = router.route("summarise advanced retrieval techniques")
+
+        assert decision.course_title == "Advanced Retrieval for AI with Chroma"
+
+    def test_shared_title_words_do_not_match(self, router, mock_vector_store):
+        """Words common to several titles don't select a course"""
+        mock_vector_store.search.return_value = SearchResults(["doc"], [{}], [1.8])
+
+        decision = router.route("What is Anthropic doing in AI?")
+
+        assert not decision.course_specific
+        assert decision.course_title is None
+
+    def test_course_keyword_routes_without_course(self, router, mock_vector_store):
+        """Course vocabulary marks the query as course-specific without a filter"""
+        decision = router.route("Which lesson explains embeddings?")
+
+        assert decision.course_specific
+        assert decision.course_title is None
+        assert decision.reason == "keyword"
+        mock_vector_store.search.assert_not_called()
+
+    def test_close_embedding_routes_to_course(self, router, mock_vector_store):
+        """A chunk within the distance threshold makes the query course-specific"""
+        mock_vector_store.search.return_value = SearchResults(["doc"], [{}], [0.6])
+
+        decision = router.route("how do reranking models work")
+
+        assert decision.course_specific
+        assert decision.reason == "embedding"
+        mock_vector_store.search.assert_called_once_with(query="how do reranking models work")
+        assert decision.results is mock_vector_store.search.return_value
+
+    def test_distant_embedding_is_general(self, router, mock_vector_store):
+        """Nothing within the threshold means a general question"""
+        mock_vector_store.search.return_value = SearchResults(["doc"], [{}], [1.4])
+
+        decision = router.route("What is the capital of France?")
+
+        assert not decision.course_specific
+        assert decision.reason == "general"
+
+    def test_search_error_is_general(self, router, mock_vector_store):
+        """Search errors fall back to answering directly"""
+        mock_vector_store.search.return_value = SearchResults.empty("Search error: boom")
+
+        assert not router.route("anything at all").course_specific
+
+    def test_catalog_loaded_once(self, router, mock_vector_store):
+        """The catalog is read lazily on first use and then cached"""
+        router.route("MCP")
+        router.route("MCP again")
+
+        mock_vector_store.get_existing_course_titles.assert_called_once()
+
+    def test_empty_catalog_not_reread_per_query(self, mock_vector_store):
+        """An empty catalog is cached too; ingestion refreshes it explicitly"""
+        mock_vector_store.get_existing_course_titles.return_value = []
+        router = QueryRouter(mock_vector_store)
+
+        router.route("lesson one")
+        router.route("lesson two")
+
+        mock_vector_store.get_existing_course_titles.assert_called_once()
+
+    def test_search_limit_matches_the_tool(self, mock_vector_store):
+        mock_vector_store.get_existing_course_titles.return_value = []
+        router = QueryRouter(mock_vector_store, search_limit=10)
+
+        router.route("how do reranking models work")
+
+        mock_vector_store.search.assert_called_once_with(query="how do reranking models work", limit=10)
+
+    def test_queries_during_refresh_use_the_previous_catalog(self, router, mock_vector_store):
+        """A refresh in progress never exposes an empty or partial catalog"""
+        router.route("What is an MCP server?")
+        seen = []
+
+        def titles_read_mid_refresh():
+            seen.append(router.route("What is an MCP server?").course_title)
+            return ["MCP: Build Rich-Context AI Apps with Anthropic", "Chroma Deep Dive"]
+
+        mock_vector_store.get_existing_course_titles.side_effect = titles_read_mid_refresh
+        router.refresh_catalog()
+
+        assert seen == ["MCP: Build Rich-Context AI Apps with Anthropic"]
+        assert router.route("Tell me about the Chroma deep dive").course_title == "Chroma Deep Dive"
@@ -0,0 +1,81 @@
+"""Tests for RAGSystem request handling"""
+import asyncio
+import threading
+import pytest
+from config import Config
+from rag_system import RAGSystem
+from vector_store import HASHING_EMBEDDING_MODEL, SearchResults
+
+REQUESTS = 4  # Fits the default executor even on one CPU
+
+
+class SearchingGenerator:
+    """Stands in for AIGenerator: searches for the course the prompt names"""
+
+    def __init__(self, barrier: threading.Barrier):
+        self.barrier = barrier
+
+    def generate_response(self, query, conversation_history=None, tools=None, tool_manager=None, context=None):
+        course = query.rsplit(" ", 1)[-1]
+        self.barrier.wait(timeout=5)  # Every request is mid-answer at the same time
+        tool_manager.execute_tool("search_course_content", query=course)
+        return f"answer about {course}"
+
+
+@pytest.fixture
+def rag_system(tmp_path):
+    config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                    ANTHROPIC_API_KEY="test", QUERY_MODE="tools")
+    system = RAGSystem(config)
+    system.ai_generator = SearchingGenerator(threading.Barrier(REQUESTS))
+
+    def search(query, course_name=None, lesson_number=None, limit=None):
+        return SearchResults(
+            documents=[f"About {query}"],
+            metadata=[{"course_title": query, "lesson_number": 1}],
+            distances=[0.1]
+        )
+
+    system.vector_store.search = search
+    system.vector_store.get_lesson_link = lambda title, lesson: None
+    return system
+
+
+class TestConcurrentQueries:
+    """Concurrent requests must not see each other's sources"""
+
+    def test_concurrent_aquery_sources_are_isolated(self, rag_system):
+        async def scenario():
+            return await asyncio.gather(*(rag_system.aquery(f"course{i}") for i in range(REQUESTS)))
+
+        results = asyncio.run(scenario())
+
+        for i, (answer, sources) in enumerate(results):
+            assert answer == f"answer about course{i}"
+            assert [s["course_title"] for s in sources] == [f"course{i}"]
+
+
+class TestRoutedQueries:
+    """Tests for the single-call routed pipeline"""
+
+    def test_embedding_route_searches_once(self, tmp_path):
+        config = Config(EMBEDDING_MODEL=HASHING_EMBEDDING_MODEL, CHROMA_PATH=str(tmp_path / "chroma"),
+                        ANTHROPIC_API_KEY="test", QUERY_MODE="routed")
+        system = RAGSystem(config)
+        calls = []
+
+        def search(query, course_name=None, lesson_number=None, limit=None):
+            calls.append(query)
+            return SearchResults(["About reranking"], [{"course_title": "Retrieval", "lesson_number": 2}], [0.4])
+
+        system.vector_store.search = search
+        system.vector_store.get_lesson_link = lambda title, lesson: None
+        system.ai_generator = type("Generator", (), {
+            "generate_response": lambda self, query, conversation_history=None, context=None: context
+        })()
+
+        answer, sources = system.query("how do reranking models work")
+
+        assert calls == ["how do reranking models work"]
+        assert "About reranking" in answer
+        assert [s["course_title"] for s in sources] == ["Retrieval"]
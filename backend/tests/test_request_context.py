@@ -0,0 +1,104 @@
+"""Tests for request-scoped tool results"""
+import asyncio
+import threading
+from unittest.mock import Mock
+from vector_store import SearchResults
+from search_tools import CourseSearchTool, ToolManager
+from request_context import RequestContext, current_context, request_scope
+
+
+def per_query_store(barrier=None):
+    """Mock store whose single result is titled after the query"""
+    store = Mock()
+    store.get_lesson_link.return_value = None
+    store.get_course_link.return_value = None
+
+    def search(query, course_name=None, lesson_number=None):
+        if barrier is not None:
+            barrier.wait(timeout=5)  # Every request is mid-search at the same time
+        return SearchResults(
+            documents=[f"About {query}"],
+            metadata=[{"course_title": query, "lesson_number": 1}],
+            distances=[0.1]
+        )
+
+    store.search.side_effect = search
+    return store
+
+
+def manager_for(store):
+    manager = ToolManager()
+    manager.register_tool(CourseSearchTool(store))
+    return manager
+
+
+class TestRequestContext:
+    """Tests for sources and timings collected per request"""
+
+    def test_execute_tool_records_into_explicit_context(self):
+        manager = manager_for(per_query_store())
+        context = RequestContext()
+
+        manager.execute_tool("search_course_content", request_context=context, query="MCP")
+
+        assert [s["course_title"] for s in context.sources] == ["MCP"]
+        assert [c.name for c in context.tool_calls] == ["search_course_content"]
+        assert context.context_tokens > 0
+        assert current_context() is None
+
+    def test_tool_errors_are_timed(self):
+        manager = manager_for(per_query_store())
+        manager.tools["search_course_content"].store.search.side_effect = RuntimeError("down")
+
+        with request_scope() as context:
+            try:
+                manager.execute_tool("search_course_content", query="MCP")
+            except RuntimeError:
+                pass
+
+        assert context.tool_calls[0].error == "down"
+
+    def test_legacy_api_without_context(self):
+        """get_last_sources/reset_sources still work outside a request"""
+        manager = manager_for(per_query_store())
+
+        manager.execute_tool("search_course_content", query="MCP")
+        assert manager.get_last_sources()[0]["course_title"] == "MCP"
+
+        manager.reset_sources()
+        assert manager.get_last_sources() == []
+
+    def test_concurrent_threads_see_only_their_sources(self):
+        """Searches that overlap in time don't leak sources across requests"""
+        threads = 8
+        manager = manager_for(per_query_store(threading.Barrier(threads)))
+        seen = {}
+
+        def handle(index):
+            query = f"course-{index}"
+            with request_scope():
+                manager.execute_tool("search_course_content", query=query)
+                seen[query] = [s["course_title"] for s in manager.get_last_sources()]
+
+        workers = [threading.Thread(target=handle, args=(i,)) for i in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        assert seen == {f"course-{i}": [f"course-{i}"] for i in range(threads)}
+
+    def test_concurrent_async_requests_are_isolated(self):
+        """Contexts follow asyncio.to_thread and stay separate per task"""
+        requests = 4  # Fits the default executor even on one CPU
+        manager = manager_for(per_query_store(threading.Barrier(requests)))
+
+        async def handle(index):
+            with request_scope() as context:
+                await asyncio.to_thread(manager.execute_tool, "search_course_content", query=f"c{index}")
+            return [s["course_title"] for s in context.sources]
+
+        async def scenario():
+            return await asyncio.gather(*(handle(i) for i in range(requests)))
+
+        assert asyncio.run(scenario()) == [[f"c{i}"] for i in range(requests)]
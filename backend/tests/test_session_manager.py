@@ -0,0 +1,211 @@
+"""Tests for SessionManager history handling and the in-memory session store"""
+import threading
+import pytest
+from context_budget import ContextAssembler, estimate_tokens
+from history_summarizer import ExtractiveSummarizer
+from session_manager import SessionManager
+from session_store import InMemorySessionStore, Message, SESSION_OVERHEAD_BYTES, _message_bytes
+
+THREADS = 16
+EXCHANGES = 200
+
+
+def run_threads(target, count=THREADS):
+    barrier = threading.Barrier(count)
+
+    def wrapped(index):
+        barrier.wait()
+        target(index)
+
+    threads = [threading.Thread(target=wrapped, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+class TestSessionManagerConcurrency:
+    """Stress tests proving no lost or interleaved messages"""
+
+    def test_no_lost_messages_on_shared_session(self):
+        """Every exchange from every thread lands in the session"""
+        capacity = THREADS * EXCHANGES
+        manager = SessionManager(max_history=capacity)
+        session_id = manager.create_session()
+
+        run_threads(lambda i: [
+            manager.add_exchange(session_id, f"q{i}-{n}", f"a{i}-{n}") for n in range(EXCHANGES)
+        ])
+
+        messages = manager.sessions.get_messages(session_id)
+        assert len(messages) == capacity * 2
+        # Exchanges are atomic: each question is directly followed by its answer
+        for question, answer in zip(messages[::2], messages[1::2]):
+            assert question.role == "user" and answer.role == "assistant"
+            assert question.content[1:] == answer.content[1:]
+        # Per-thread order is preserved
+        for i in range(THREADS):
+            own = [m.content for m in messages if m.content.startswith(f"q{i}-")]
+            assert own == [f"q{i}-{n}" for n in range(EXCHANGES)]
+
+    def test_history_bounded_under_contention(self):
+        """The per-session deque never exceeds max_history * 2"""
+        manager = SessionManager(max_history=3)
+        session_id = manager.create_session()
+
+        run_threads(lambda i: [manager.add_exchange(session_id, "q", "a") for _ in range(EXCHANGES)])
+
+        assert len(manager.sessions.get_messages(session_id)) == 6
+
+    def test_concurrent_session_ids_are_unique(self):
+        manager = SessionManager()
+        created = [[] for _ in range(THREADS)]
+
+        run_threads(lambda i: created[i].extend(manager.create_session() for _ in range(EXCHANGES)))
+
+        all_ids = [sid for ids in created for sid in ids]
+        assert len(set(all_ids)) == THREADS * EXCHANGES
+        assert manager.get_stats()["live_sessions"] == THREADS * EXCHANGES
+
+    def test_byte_accounting_consistent_with_eviction(self):
+        """Concurrent writes and LRU eviction keep the byte estimate exact"""
+        store = InMemorySessionStore(max_messages=4, max_sessions=20)
+        manager = SessionManager(max_history=2, store=store)
+        assert manager.sessions is store
+
+        # Hot sessions stay resident and fill their history; one-off cold
+        # sessions keep pushing older sessions out, racing with their writers
+        def session_for(i, n):
+            return f"hot{n % 8}" if n % 2 else f"cold{i}-{n}"
+
+        run_threads(lambda i: [
+            manager.add_exchange(session_for(i, n), "question", "answer" * (n % 5))
+            for n in range(EXCHANGES)
+        ])
+
+        expected = sum(
+            SESSION_OVERHEAD_BYTES + sum(_message_bytes(m) for m in session.messages)
+            for session in store._sessions.values()
+        )
+        stats = store.get_stats()
+        assert stats["live_sessions"] == 20
+        assert stats["evicted_sessions"] > 0
+        assert stats["approx_bytes"] == expected
+
+
+class TestSessionManagerStore:
+    """Tests for the store a SessionManager is given"""
+
+    def test_injected_store_is_used(self):
+        """An empty store (falsy via __len__) must not be swapped for a default"""
+        store = InMemorySessionStore(max_messages=4, max_sessions=7, ttl_seconds=5)
+        manager = SessionManager(max_history=2, store=store)
+
+        sid = manager.create_session()
+
+        assert manager.sessions is store
+        assert sid in store
+
+
+class TestHistorySummary:
+    """Tests for rolling summarisation and the formatted history cache"""
+
+    def test_old_turns_folded_into_summary(self):
+        """Turns leaving max_history survive as a summary line"""
+        manager = SessionManager(max_history=1, summarizer=ExtractiveSummarizer())
+        sid = manager.create_session()
+
+        manager.add_exchange(sid, "What is MCP? Tell me more.", "MCP is a protocol. It links tools.")
+        manager.add_exchange(sid, "Who teaches it?", "Elie does.")
+
+        history = manager.get_conversation_history(sid)
+        assert history.splitlines() == [
+            "Summary of earlier conversation: User asked: What is MCP? "
+            "Assistant answered: MCP is a protocol.",
+            "User: Who teaches it?",
+            "Assistant: Elie does.",
+        ]
+
+    def test_exchanges_from_the_same_snapshot_lose_nothing(self):
+        """An exchange folding from an outdated read retries instead of dropping turns"""
+        manager = SessionManager(max_history=2, summarizer=ExtractiveSummarizer())
+        sid = manager.create_session()
+        manager.add_exchange(sid, "Q1", "A1")
+        manager.add_exchange(sid, "Q2", "A2")
+        snapshot = manager.sessions.get_history(sid)
+        manager.add_exchange(sid, "Q3", "A3")
+
+        # The next exchange first sees the history as it was before Q3
+        reads = [snapshot]
+        original = manager.sessions.get_history
+        manager.sessions.get_history = lambda session_id: reads.pop() if reads else original(session_id)
+        manager.add_exchange(sid, "Q4", "A4")
+
+        history = original(sid)
+        kept = history.summary + " " + " ".join(m.content for m in history.messages)
+        for turn in ["Q1", "A1", "Q2", "A2", "Q3", "A3", "Q4", "A4"]:
+            assert turn in kept
+        assert len(history.messages) <= 4
+
+    def test_concurrent_exchanges_with_summary_keep_every_turn(self):
+        manager = SessionManager(max_history=2, summarizer=ExtractiveSummarizer(max_tokens=10**6))
+        sid = manager.create_session()
+
+        run_threads(lambda i: [manager.add_exchange(sid, f"q{i}-{n}", f"a{i}-{n}") for n in range(20)])
+
+        history = manager.sessions.get_history(sid)
+        kept = set(history.summary.replace(".", "").replace(":", "").split())
+        kept.update(m.content for m in history.messages)
+        expected = {f"{p}{i}-{n}" for p in "qa" for i in range(THREADS) for n in range(20)}
+        assert expected <= kept
+
+    def test_long_answers_compacted_to_token_budget(self):
+        """Compaction keeps verbatim history within the budget left after the summary"""
+        assembler = ContextAssembler(results_budget=1000, history_budget=200)
+        summarizer = ExtractiveSummarizer(max_tokens=50)
+        manager = SessionManager(max_history=10, context_assembler=assembler, summarizer=summarizer)
+        sid = manager.create_session()
+        long_answer = "This lesson covers retrieval. " * 20
+
+        for i in range(5):
+            manager.add_exchange(sid, f"Question {i}?", long_answer)
+
+        stored = manager.sessions.get_history(sid)
+        verbatim = sum(estimate_tokens(f"{m.role.title()}: {m.content}") for m in stored.messages)
+        assert verbatim <= 150
+        assert stored.messages[-1].content == long_answer
+        assert "Question 3?" in stored.summary
+        assert estimate_tokens(stored.summary) <= 50
+
+    def test_summary_cap_must_leave_room_for_recent_turns(self):
+        assembler = ContextAssembler(results_budget=1000, history_budget=100)
+
+        with pytest.raises(ValueError, match="HISTORY_SUMMARY_TOKENS"):
+            SessionManager(context_assembler=assembler, summarizer=ExtractiveSummarizer(max_tokens=100))
+
+    def test_summary_drops_oldest_sentences(self):
+        summarizer = ExtractiveSummarizer(max_tokens=12)
+        summary = ""
+        for i in range(5):
+            summary = summarizer.summarize(summary, [Message(role="user", content=f"Topic {i} please")])
+
+        assert "Topic 4" in summary
+        assert "Topic 0" not in summary
+        assert estimate_tokens(summary) <= 12
+
+    def test_formatted_history_cached_until_next_exchange(self):
+        manager = SessionManager(max_history=2)
+        sid = manager.create_session()
+        manager.add_exchange(sid, "hi", "hello")
+
+        first = manager.get_conversation_history(sid)
+        calls = []
+        original = manager.sessions.get_history
+        manager.sessions.get_history = lambda session_id: calls.append(session_id) or original(session_id)
+
+        assert manager.get_conversation_history(sid) is first
+        assert calls == []
+
+        manager.add_exchange(sid, "again", "sure")
+        assert manager.get_conversation_history(sid).endswith("Assistant: sure")
+        assert calls == [sid]
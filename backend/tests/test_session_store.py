@@ -0,0 +1,321 @@
+"""Tests for the bounded in-memory session store"""
+import threading
+import time
+import pytest
+from session_store import (
+    InMemorySessionStore, Message, SQLiteSessionStore, create_session_store
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def user(text):
+    return Message(role="user", content=text)
+
+
+class TestLRUEviction:
+    """Tests for the max_sessions bound"""
+
+    def test_least_recently_used_session_evicted(self, clock):
+        """Creating past capacity drops the session touched longest ago"""
+        store = InMemorySessionStore(max_sessions=2, clock=clock)
+        store.create("a")
+        store.create("b")
+        store.get_messages("a")  # "b" is now least recently used
+
+        store.create("c")
+
+        assert "a" in store
+        assert "b" not in store
+        assert "c" in store
+        assert store.get_stats()["evicted_sessions"] == 1
+
+    def test_size_never_exceeds_capacity(self, clock):
+        store = InMemorySessionStore(max_sessions=5, clock=clock)
+
+        for i in range(100):
+            store.create(f"s{i}")
+
+        assert len(store) == 5
+        assert store.get_stats()["evicted_sessions"] == 95
+
+
+class TestTTLExpiry:
+    """Tests for idle expiry"""
+
+    def test_idle_session_expires_on_access(self, clock):
+        store = InMemorySessionStore(ttl_seconds=10, clock=clock)
+        store.create("a")
+
+        clock.now = 11
+
+        assert store.get_messages("a") is None
+        assert store.get_stats()["expired_sessions"] == 1
+
+    def test_access_refreshes_ttl(self, clock):
+        store = InMemorySessionStore(ttl_seconds=10, clock=clock)
+        store.create("a")
+        clock.now = 8
+        store.get_messages("a")
+
+        clock.now = 16
+
+        assert store.get_messages("a") == []
+
+    def test_writes_sweep_expired_sessions(self, clock):
+        """Expired sessions are removed without being accessed again"""
+        store = InMemorySessionStore(ttl_seconds=10, sweep_batch=100, clock=clock)
+        for i in range(20):
+            store.create(f"old{i}")
+        clock.now = 20
+
+        store.create("new")
+
+        assert len(store) == 1
+        assert store.get_stats()["expired_sessions"] == 20
+
+    def test_append_recreates_expired_session(self, clock):
+        store = InMemorySessionStore(ttl_seconds=10, clock=clock)
+        store.append("a", user("old"))
+        clock.now = 30
+
+        store.append("a", user("new"))
+
+        assert [m.content for m in store.get_messages("a")] == ["new"]
+
+
+class TestMessagesAndAccounting:
+    """Tests for message limits and the memory estimate"""
+
+    def test_history_trimmed_to_max_messages(self, clock):
+        store = InMemorySessionStore(max_messages=4, clock=clock)
+
+        for i in range(6):
+            store.append("a", user(str(i)))
+
+        assert [m.content for m in store.get_messages("a")] == ["2", "3", "4", "5"]
+
+    def test_bytes_track_additions_and_removals(self, clock):
+        store = InMemorySessionStore(max_sessions=1, clock=clock)
+        empty = store.get_stats()["approx_bytes"]
+
+        store.append("a", user("x" * 1000))
+        grown = store.get_stats()["approx_bytes"]
+        store.clear("a")
+        cleared = store.get_stats()["approx_bytes"]
+        store.create("b")  # evicts "a"
+
+        assert empty == 0
+        assert grown > 1000
+        assert cleared < grown
+        assert store.get_stats()["approx_bytes"] == cleared
+
+
+class TestSQLiteSessionStore:
+    """Tests for the shared SQLite session backend"""
+
+    @pytest.fixture
+    def db_path(self, tmp_path):
+        return str(tmp_path / "sessions.db")
+
+    def test_workers_share_sessions(self, db_path):
+        """A session written through one store is visible through another"""
+        worker_a = SQLiteSessionStore(db_path, max_messages=4)
+        worker_b = SQLiteSessionStore(db_path, max_messages=4)
+
+        worker_a.create("s1")
+        worker_a.append("s1", user("hello"))
+
+        assert [m.content for m in worker_b.get_messages("s1")] == ["hello"]
+        assert "missing" not in worker_b
+
+    def test_reads_return_newest_messages_in_order(self, db_path):
+        store = SQLiteSessionStore(db_path, max_messages=3)
+
+        for i in range(5):
+            store.append("s1", user(str(i)))
+
+        assert [m.content for m in store.get_messages("s1")] == ["2", "3", "4"]
+
+    def test_expired_session_starts_over(self, db_path, clock):
+        store = SQLiteSessionStore(db_path, ttl_seconds=10, clock=clock)
+        store.append("s1", user("old"))
+
+        clock.now = 30
+        assert store.get_messages("s1") is None
+        store.append("s1", user("new"))
+
+        assert [m.content for m in store.get_messages("s1")] == ["new"]
+
+    def test_maintenance_enforces_bounds(self, db_path, clock):
+        """Maintenance expires idle sessions, evicts LRU and trims old rows"""
+        store = SQLiteSessionStore(db_path, max_messages=2, max_sessions=2, ttl_seconds=100,
+                                   maintenance_interval=10**9, clock=clock)
+        store.append("idle", user("x"))
+        clock.now = 200
+        for i, session_id in enumerate(["a", "b", "c"]):
+            clock.now += 1
+            for j in range(3):
+                store.append(session_id, user(f"{session_id}{j}"))
+
+        store.maintain()
+
+        stats = store.get_stats()
+        assert stats["live_sessions"] == 2
+        assert stats["expired_sessions"] == 1
+        assert stats["evicted_sessions"] == 1
+        assert store.get_messages("a") is None
+        remaining = store._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        assert remaining == 4
+
+    def test_maintenance_work_is_bounded_per_pass(self, db_path, clock):
+        """A pass handles at most maintenance_batch sessions per step"""
+        store = SQLiteSessionStore(db_path, ttl_seconds=10, maintenance_interval=10**9,
+                                   maintenance_batch=2, clock=clock)
+        for i in range(5):
+            store.append(f"s{i}", user("x"))
+        clock.now = 100
+
+        store.maintain()
+        assert store.get_stats()["expired_sessions"] == 2
+        store.maintain()
+        store.maintain()
+        assert store.get_stats()["expired_sessions"] == 5
+
+    def test_due_maintenance_runs_off_the_writing_thread(self, db_path, clock):
+        store = SQLiteSessionStore(db_path, max_messages=1, maintenance_interval=3, clock=clock)
+        writer = threading.get_ident()
+        threads = []
+        original = store.maintain
+        store.maintain = lambda: threads.append(threading.get_ident()) or original()
+
+        for i in range(3):
+            store.append("s1", user(str(i)))
+        for _ in range(500):
+            if threads and not store._maintaining:
+                break
+            time.sleep(0.01)
+
+        assert threads and threads[0] != writer
+        remaining = store._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        assert remaining == 1
+
+    def test_clear_keeps_session(self, db_path):
+        store = SQLiteSessionStore(db_path)
+        store.append("s1", user("hello"))
+
+        store.clear("s1")
+
+        assert store.get_messages("s1") == []
+
+
+class TestCompaction:
+    """Tests for summaries and compaction, on both backends"""
+
+    @pytest.fixture(params=["memory", "sqlite"])
+    def store(self, request, tmp_path):
+        return create_session_store(request.param, 4, 10, 60, str(tmp_path / "s.db"))
+
+    def test_compact_drops_oldest_and_stores_summary(self, store):
+        for i in range(4):
+            store.append("s1", user(str(i)))
+
+        store.compact("s1", "earlier turns", 3, store.get_version("s1"))
+
+        history = store.get_history("s1")
+        assert history.summary == "earlier turns"
+        assert [m.content for m in history.messages] == ["3"]
+
+    def test_folded_messages_stay_hidden_after_appends(self, store):
+        for i in range(4):
+            store.append("s1", user(str(i)))
+        store.compact("s1", "summary", 4, store.get_version("s1"))
+
+        store.append("s1", user("4"))
+
+        assert [m.content for m in store.get_messages("s1")] == ["4"]
+
+    def test_compact_appends_in_the_same_step(self, store):
+        for i in range(4):
+            store.append("s1", user(str(i)))
+
+        assert store.compact("s1", "0 and 1", 2, store.get_version("s1"), user("4"), user("5"))
+
+        assert [m.content for m in store.get_messages("s1")] == ["2", "3", "4", "5"]
+
+    def test_stale_version_changes_nothing(self, store):
+        """A compaction based on an outdated read is refused"""
+        store.append("s1", user("0"))
+        stale = store.get_version("s1")
+        store.append("s1", user("1"))
+
+        assert not store.compact("s1", "lost", 2, stale, user("2"))
+
+        history = store.get_history("s1")
+        assert history.summary == ""
+        assert [m.content for m in history.messages] == ["0", "1"]
+        assert not store.compact("missing", "x", 0, 0, user("y"))
+
+    def test_every_change_bumps_version(self, store):
+        store.create("s1")
+        versions = [store.get_version("s1")]
+        store.append("s1", user("a"))
+        versions.append(store.get_version("s1"))
+        store.compact("s1", "a", 1, store.get_version("s1"))
+        versions.append(store.get_version("s1"))
+        store.clear("s1")
+        versions.append(store.get_version("s1"))
+
+        assert versions == sorted(set(versions))
+        assert store.get_history("s1").summary == ""
+        assert store.get_version("missing") is None
+
+    def test_sqlite_maintenance_removes_folded_rows(self, tmp_path):
+        store = SQLiteSessionStore(str(tmp_path / "s.db"), max_messages=4, maintenance_interval=10**9)
+        for i in range(4):
+            store.append("s1", user(str(i)))
+        store.compact("s1", "summary", 2, store.get_version("s1"))
+
+        store.maintain()
+
+        remaining = store._connection().execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        assert remaining == 2
+        assert [m.content for m in store.get_messages("s1")] == ["2", "3"]
+
+    def test_sqlite_migrates_old_schema(self, tmp_path):
+        """Databases created before summaries existed gain the new columns"""
+        import sqlite3
+        db_path = str(tmp_path / "old.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE sessions (id TEXT PRIMARY KEY, last_access REAL NOT NULL)")
+        conn.commit()
+        conn.close()
+
+        store = SQLiteSessionStore(db_path)
+        store.append("s1", user("hello"))
+
+        assert store.get_history("s1").summary == ""
+
+
+class TestCreateSessionStore:
+    """Tests for create_session_store()"""
+
+    def test_builds_configured_backend(self, tmp_path):
+        assert isinstance(create_session_store("memory", 4, 10, 60), InMemorySessionStore)
+        sqlite_store = create_session_store("sqlite", 4, 10, 60, str(tmp_path / "s.db"))
+        assert isinstance(sqlite_store, SQLiteSessionStore)
+
+    def test_rejects_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_session_store("redis", 4, 10, 60)
@@ -0,0 +1,144 @@
+"""Tests for SingleFlight request coalescing"""
+import asyncio
+import threading
+import pytest
+from singleflight import SingleFlight
+
+
+def blocking_fn(release: threading.Event, result="answer"):
+    """Returns a function that counts its calls and blocks until released"""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(timeout=5)
+        return result
+
+    fn.calls = calls
+    return fn
+
+
+class TestSingleFlightSync:
+    """Tests for SingleFlight.do()"""
+
+    def test_sequential_calls_are_not_coalesced(self):
+        """Calls that don't overlap each execute"""
+        flight = SingleFlight()
+
+        assert flight.do("q", lambda: 1) == 1
+        assert flight.do("q", lambda: 2) == 2
+        assert flight.get_stats() == {"executions": 2, "coalesced": 0, "in_flight": 0}
+
+    def test_concurrent_identical_calls_share_one_execution(self):
+        """Threads asking the same key while it's in flight share the result"""
+        flight = SingleFlight()
+        release = threading.Event()
+        fn = blocking_fn(release)
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do("q", fn))) for _ in range(8)]
+        threads[0].start()
+        while flight.get_stats()["in_flight"] == 0:
+            pass
+        for t in threads[1:]:
+            t.start()
+        while flight.get_stats()["coalesced"] < 7:
+            pass
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert results == ["answer"] * 8
+        assert len(fn.calls) == 1
+        assert flight.get_stats() == {"executions": 1, "coalesced": 7, "in_flight": 0}
+
+    def test_different_keys_run_independently(self):
+        """Coalescing is per key"""
+        flight = SingleFlight()
+
+        assert flight.do("a", lambda: "A") == "A"
+        assert flight.do("b", lambda: "B") == "B"
+        assert flight.get_stats()["coalesced"] == 0
+
+    def test_error_is_shared_and_flight_cleared(self):
+        """Followers see the leader's exception and the key can be retried"""
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def failing():
+            release.wait(timeout=5)
+            raise RuntimeError("LLM down")
+
+        def call():
+            try:
+                flight.do("q", failing)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        while flight.get_stats()["in_flight"] == 0:
+            pass
+        for t in threads[1:]:
+            t.start()
+        while flight.get_stats()["coalesced"] < 2:
+            pass
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert errors == ["LLM down"] * 3
+        assert flight.do("q", lambda: "recovered") == "recovered"
+
+
+class TestSingleFlightAsync:
+    """Tests for SingleFlight.do_async()"""
+
+    def test_concurrent_coroutines_share_one_execution(self):
+        """Coroutines awaiting the same key share one threaded execution"""
+        flight = SingleFlight()
+        release = threading.Event()
+        fn = blocking_fn(release)
+
+        async def scenario():
+            tasks = [asyncio.create_task(flight.do_async("q", fn)) for _ in range(5)]
+            while flight.get_stats()["coalesced"] < 4:
+                await asyncio.sleep(0.001)
+            release.set()
+            return await asyncio.gather(*tasks)
+
+        assert asyncio.run(scenario()) == ["answer"] * 5
+        assert len(fn.calls) == 1
+
+    def test_async_follower_attaches_to_sync_leader(self):
+        """A coroutine joins a computation started by a plain thread"""
+        flight = SingleFlight()
+        release = threading.Event()
+        fn = blocking_fn(release)
+        leader = threading.Thread(target=lambda: flight.do("q", fn))
+        leader.start()
+        while flight.get_stats()["in_flight"] == 0:
+            pass
+
+        async def follower():
+            task = asyncio.create_task(flight.do_async("q", fn))
+            while flight.get_stats()["coalesced"] < 1:
+                await asyncio.sleep(0.001)
+            release.set()
+            return await task
+
+        assert asyncio.run(follower()) == "answer"
+        leader.join()
+        assert len(fn.calls) == 1
+
+    def test_async_error_propagates(self):
+        """Exceptions from the leader reach async callers"""
+        flight = SingleFlight()
+
+        def failing():
+            raise ValueError("bad query")
+
+        with pytest.raises(ValueError, match="bad query"):
+            asyncio.run(flight.do_async("q", failing))
+        assert flight.get_stats()["in_flight"] == 0
@@ -0,0 +1,130 @@
+"""Tests for per-request trace spans and the slow-request profiler"""
+import asyncio
+import json
+import threading
+import time
+from executors import BoundedExecutor
+from tracing import JsonlTraceExporter, SlowRequestProfiler, Tracer, current_span, span
+
+
+class RecordingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace.to_dict())
+
+
+class TestSpans:
+    """Tests for span nesting and propagation"""
+
+    def test_spans_nest_under_the_root(self):
+        exporter = RecordingExporter()
+        tracer = Tracer(exporter)
+
+        with tracer.trace("rag.query", query_chars=5):
+            with span("tool.execute", tool="search") as tool_span:
+                with span("vector_store.search") as search_span:
+                    search_span.set(results=3)
+
+        spans = {s["name"]: s for s in exporter.traces[0]["spans"]}
+        assert spans["rag.query"]["parent_id"] is None
+        assert spans["tool.execute"]["parent_id"] == spans["rag.query"]["span_id"]
+        assert spans["vector_store.search"]["parent_id"] == tool_span.span_id
+        assert spans["vector_store.search"]["attributes"] == {"results": 3}
+
+    def test_spans_follow_threads_and_stage_pools(self):
+        exporter = RecordingExporter()
+        tracer = Tracer(exporter)
+        pool = BoundedExecutor("search", workers=1, max_queue=4)
+
+        def search():
+            with span("vector_store.search"):
+                pass
+
+        async def scenario():
+            with tracer.trace("rag.query"):
+                await asyncio.to_thread(lambda: pool.run(search))
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            pool.shutdown()
+
+        names = [s["name"] for s in exporter.traces[0]["spans"]]
+        assert names == ["rag.query", "vector_store.search"]
+
+    def test_spans_are_noops_outside_a_trace(self):
+        with span("vector_store.search") as outside:
+            outside.set(results=1)
+        assert current_span() is outside
+
+    def test_errors_are_recorded(self):
+        exporter = RecordingExporter()
+        try:
+            with Tracer(exporter).trace("rag.query"):
+                raise ValueError("bad")
+        except ValueError:
+            pass
+
+        assert exporter.traces[0]["spans"][0]["attributes"]["error"] == "ValueError: bad"
+
+    def test_unsampled_requests_are_not_traced(self):
+        exporter = RecordingExporter()
+        with Tracer(exporter, sample_rate=0.0).trace("rag.query"):
+            with span("tool.execute"):
+                pass
+        assert exporter.traces == []
+
+    def test_jsonl_export(self, tmp_path):
+        path = tmp_path / "traces" / "traces.jsonl"
+        tracer = Tracer(JsonlTraceExporter(str(path)))
+        for _ in range(2):
+            with tracer.trace("rag.query"):
+                pass
+
+        lines = path.read_text().splitlines()
+        assert len(lines) == 2
+        assert json.loads(lines[0])["spans"][0]["name"] == "rag.query"
+
+
+class TestSlowRequestProfiler:
+    """Only requests over the threshold keep their stack samples"""
+
+    def test_profiles_only_slow_requests(self, tmp_path):
+        profiler = SlowRequestProfiler(threshold=0.05, output_dir=str(tmp_path), interval=0.005)
+        exporter = RecordingExporter()
+        tracer = Tracer(exporter, profiler=profiler)
+
+        def slow_stage():
+            time.sleep(0.1)
+
+        with tracer.trace("rag.query"):
+            pass
+        with tracer.trace("rag.query"):
+            slow_stage()
+
+        fast, slow = exporter.traces
+        assert "profile" not in fast["spans"][0]["attributes"]
+        profile = slow["spans"][0]["attributes"]["profile"]
+        with open(profile) as f:
+            stacks = f.read()
+        assert "slow_stage" in stacks
+        assert profiler.saved == 1
+
+    def test_samples_the_request_threads_only(self, tmp_path):
+        profiler = SlowRequestProfiler(threshold=0.0, output_dir=str(tmp_path))
+        tracer = Tracer(RecordingExporter(), profiler=profiler)
+        stop = threading.Event()
+        other = threading.Thread(target=stop.wait, args=(5,))
+        other.start()
+        try:
+            with tracer.trace("rag.query") as root:
+                profiler.sample()
+                stacks = list(root.trace.samples)
+        finally:
+            stop.set()
+            other.join()
+
+        assert len(stacks) == 1
+        assert "test_samples_the_request_threads_only" in stacks[0]
@@ -0,0 +1,93 @@
+"""Tests for token usage accounting"""
+import json
+from types import SimpleNamespace
+from unittest.mock import Mock
+from ai_generator import AIGenerator
+from request_context import request_scope
+from usage import TokenUsage, UsageLedger
+
+PRICES = {"input_tokens": 3.0, "output_tokens": 15.0,
+          "cache_creation_input_tokens": 3.75, "cache_read_input_tokens": 0.3}
+
+
+def response(stop_reason, content, input_tokens, output_tokens, cache_read=None):
+    usage = SimpleNamespace(input_tokens=input_tokens, output_tokens=output_tokens,
+                            cache_creation_input_tokens=None, cache_read_input_tokens=cache_read)
+    return SimpleNamespace(stop_reason=stop_reason, content=content, usage=usage)
+
+
+class TestGeneratorUsage:
+    """AIGenerator attributes each call's usage to its stage"""
+
+    def test_initial_and_followup_calls_are_recorded(self):
+        tool_use = SimpleNamespace(type="tool_use", name="search_course_content", id="t1", input={"query": "q"})
+        client = Mock()
+        client.messages.create.side_effect = [
+            response("tool_use", [tool_use], 300, 20),
+            response("end_turn", [SimpleNamespace(type="text", text="answer")], 1200, 80, cache_read=100),
+        ]
+        generator = AIGenerator("test-key", "test", client=client)
+        tool_manager = Mock()
+        tool_manager.execute_tool.return_value = "results"
+
+        with request_scope() as context:
+            generator.generate_response("q", tools=[{}], tool_manager=tool_manager)
+
+        assert context.llm_usage["llm_call"] == TokenUsage(300, 20, 0, 0, 1)
+        assert context.llm_usage["llm_followup"] == TokenUsage(1200, 80, 0, 100, 1)
+
+
+class TestUsageLedger:
+    """Tests for aggregation and flushing"""
+
+    def test_totals_by_stage_and_session(self):
+        ledger = UsageLedger(PRICES)
+        ledger.record("s1", {"llm_call": TokenUsage(1000, 100, calls=1),
+                             "llm_followup": TokenUsage(2000, 200, calls=1)})
+        ledger.record("s2", {"llm_call": TokenUsage(500, 50, calls=1)})
+
+        stats = ledger.get_stats()
+
+        assert stats["requests"] == 2
+        assert stats["stages"]["llm_call"]["input_tokens"] == 1500
+        assert stats["total"]["calls"] == 3
+        assert list(stats["top_sessions"]) == ["s1", "s2"]
+        assert ledger.get_session("s1")["cost_usd"] == round((3000 * 3.0 + 300 * 15.0) / 1e6, 6)
+        assert ledger.get_session("unknown") is None
+
+    def test_requests_without_llm_calls_are_ignored(self):
+        ledger = UsageLedger(PRICES)
+        ledger.record("s1", {})
+        assert ledger.get_stats()["requests"] == 0
+
+    def test_session_totals_are_bounded(self):
+        ledger = UsageLedger(PRICES, max_sessions=2)
+        for session_id in ("s1", "s2", "s1", "s3"):
+            ledger.record(session_id, {"llm_call": TokenUsage(10, 1, calls=1)})
+
+        assert ledger.get_session("s2") is None
+        assert ledger.get_session("s1")["calls"] == 2
+
+    def test_flush_appends_request_records(self, tmp_path):
+        path = tmp_path / "usage.jsonl"
+        ledger = UsageLedger(PRICES, str(path))
+        ledger.record("s1", {"llm_call": TokenUsage(10, 1, calls=1)}, context_tokens=250, sources=3)
+
+        assert ledger.flush() == 1
+        assert ledger.flush() == 0
+
+        record = json.loads(path.read_text())
+        assert record["session_id"] == "s1"
+        assert record["stages"]["llm_call"]["input_tokens"] == 10
+        assert (record["context_tokens"], record["sources"]) == (250, 3)
+
+    def test_failed_flush_keeps_records(self, tmp_path):
+        ledger = UsageLedger(PRICES, str(tmp_path))  # A directory can't be opened for append
+        ledger.record("s1", {"llm_call": TokenUsage(10, 1, calls=1)})
+
+        try:
+            ledger.flush()
+        except OSError:
+            pass
+
+        assert ledger.get_stats()["pending_records"] == 1
@@ -0,0 +1,284 @@
+import contextvars
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+
+class Trace:
+    """The spans of one request, plus stack samples taken while it ran"""
+
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List["Span"] = []
+        self.samples: Counter = Counter()  # Folded stack -> sample count
+        self._threads: Dict[int, int] = {}  # Thread id -> spans open on it
+        self._lock = threading.Lock()
+
+    def thread_ids(self) -> List[int]:
+        with self._lock:
+            return list(self._threads)
+
+    def _enter_thread(self):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._threads[thread_id] = self._threads.get(thread_id, 0) + 1
+
+    def _exit_thread(self, span: "Span"):
+        thread_id = threading.get_ident()
+        with self._lock:
+            self.spans.append(span)
+            if self._threads.get(thread_id, 0) <= 1:
+                self._threads.pop(thread_id, None)
+            else:
+                self._threads[thread_id] -= 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        root = spans[0].start if spans else 0.0
+        return {
+            "trace_id": self.trace_id,
+            "spans": [span.to_dict(root) for span in spans],
+        }
+
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+class Span:
+    """
+    A timed operation within a trace. Use as a context manager; attributes
+    can be added while it runs with `set`.
+    """
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start", "end", "wall_time",
+                 "attributes", "_token")
+
+    def __init__(self, trace: Trace, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.start = 0.0
+        self.end = 0.0
+        self.wall_time = 0.0
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    @property
+    def seconds(self) -> float:
+        return self.end - self.start
+
+    def __enter__(self) -> "Span":
+        self.wall_time = time.time()
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        self.trace._enter_thread()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.trace._exit_thread(self)
+        if self.parent_id is None:
+            self.trace.tracer._finish(self.trace, self)
+
+    def to_dict(self, root_start: float) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ms": round(1000 * (self.start - root_start), 3),
+            "duration_ms": round(1000 * self.seconds, 3),
+            "wall_time": self.wall_time,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span outside a sampled trace, at next to no cost"""
+
+    def set(self, **attributes: Any):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Child span of the current span, or a no-op outside a trace.
+
+    Follows the request through `asyncio.to_thread` and the stage pools, which
+    copy context variables.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return Span(parent.trace, name, parent, attributes)
+
+
+def current_span():
+    """The innermost open span, or a no-op span outside a trace"""
+    return _current_span.get() or _NOOP_SPAN
+
+
+class JsonlTraceExporter:
+    """Appends each finished trace to a file as one JSON line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, trace: Trace):
+        line = json.dumps(trace.to_dict(), default=str)
+        with self._lock, open(self.path, "a") as f:
+            f.write(line + "\n")
+
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler that keeps profiles only of slow requests.
+
+    A daemon thread samples the stacks of the threads each traced request is
+    running on every `interval` seconds. When a request finishes in at least
+    `threshold` seconds its samples are written to `output_dir` in the folded
+    stack format (one "frame;frame;frame count" line per stack, readable by
+    flamegraph.pl and speedscope); faster requests' samples are dropped.
+
+    Args:
+        threshold: Request duration, in seconds, above which a profile is saved
+        output_dir: Directory for `<trace_id>.folded` files
+        interval: Seconds between samples
+        max_stacks: Distinct stacks kept per request
+    """
+
+    def __init__(self, threshold: float, output_dir: str, interval: float = 0.01, max_stacks: int = 2000):
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._active: Set[Trace] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.saved = 0
+
+    def begin(self, trace: Trace):
+        with self._lock:
+            self._active.add(trace)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+                self._thread.start()
+
+    def end(self, trace: Trace, seconds: float) -> Optional[str]:
+        """Stop sampling trace; returns the saved profile's path if the request was slow"""
+        with self._lock:
+            self._active.discard(trace)
+        if seconds < self.threshold or not trace.samples:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{trace.trace_id}.folded")
+        with open(path, "w") as f:
+            for stack, count in trace.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        self.saved += 1
+        return path
+
+    def sample(self):
+        """Record one stack sample for every thread of every active request"""
+        with self._lock:
+            traces = list(self._active)
+        if not traces:
+            return
+        frames = sys._current_frames()
+        for trace in traces:
+            for thread_id in trace.thread_ids():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = self._fold(frame)
+                if stack in trace.samples or len(trace.samples) < self.max_stacks:
+                    trace.samples[stack] += 1
+
+    @staticmethod
+    def _fold(frame, max_depth: int = 64) -> str:
+        names = []
+        while frame is not None and len(names) < max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling request stacks: {e}")
+
+
+class Tracer:
+    """
+    Starts per-request traces and hands finished ones to the exporter and
+    profiler.
+
+    Args:
+        exporter: Receives each finished, sampled trace (None to only profile)
+        sample_rate: Fraction of requests traced
+        profiler: Optional profiler for slow requests
+    """
+
+    def __init__(self, exporter: Optional[JsonlTraceExporter] = None, sample_rate: float = 1.0,
+                 profiler: Optional[SlowRequestProfiler] = None):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.profiler = profiler
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None or self.profiler is not None
+
+    def trace(self, name: str, **attributes: Any):
+        """Root span of a new trace, a child span inside an existing one, or a no-op if not sampled"""
+        if _current_span.get() is not None:
+            return span(name, **attributes)
+        if not self.enabled or random.random() >= self.sample_rate:
+            return _NOOP_SPAN
+        trace = Trace(self)
+        if self.profiler is not None:
+            self.profiler.begin(trace)
+        return Span(trace, name, None, attributes)
+
+    def _finish(self, trace: Trace, root: Span):
+        if self.profiler is not None:
+            profile = self.profiler.end(trace, root.seconds)
+            if profile:
+                root.attributes["profile"] = profile
+        if self.exporter is not None:
+            try:
+                self.exporter.export(trace)
+            except OSError as e:
+                print(f"Error exporting trace {trace.trace_id}: {e}")
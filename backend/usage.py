@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class TokenUsage:
+    """Tokens billed for one or more Messages API calls"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    calls: int = 0
+
+    @classmethod
+    def from_response(cls, usage: Any) -> "TokenUsage":
+        """Read the `usage` of an API response; absent cache fields count as 0"""
+        return cls(
+            input_tokens=getattr(usage, "input_tokens", 0) or 0,
+            output_tokens=getattr(usage, "output_tokens", 0) or 0,
+            cache_creation_input_tokens=getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            cache_read_input_tokens=getattr(usage, "cache_read_input_tokens", 0) or 0,
+            calls=1,
+        )
+
+    def add(self, other: "TokenUsage"):
+        self.input_tokens += other.input_tokens
+        self.output_tokens += other.output_tokens
+        self.cache_creation_input_tokens += other.cache_creation_input_tokens
+        self.cache_read_input_tokens += other.cache_read_input_tokens
+        self.calls += other.calls
+
+    def cost(self, prices: Dict[str, float]) -> float:
+        """Cost in USD given per-million-token prices keyed like the fields"""
+        return sum(getattr(self, field) * prices.get(field, 0.0) for field in (
+            "input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"
+        )) / 1_000_000
+
+    def to_dict(self, prices: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        data = asdict(self)
+        if prices is not None:
+            data["cost_usd"] = round(self.cost(prices), 6)
+        return data
+
+
+def total_usage(usages: Dict[str, TokenUsage]) -> TokenUsage:
+    total = TokenUsage()
+    for usage in usages.values():
+        total.add(usage)
+    return total
+
+
+class UsageLedger:
+    """
+    In-memory token accounting by stage and session, with periodic flush of
+    per-request records to a JSON lines file.
+
+    Stages are the API calls of a query: "llm_call" (the first call, with
+    tools or pre-retrieved context) and "llm_followup" (the synthesis after a
+    tool call). Each request record also carries its retrieval size, so usage
+    can be correlated with how much context was sent.
+
+    Args:
+        prices: USD per million tokens, keyed like TokenUsage fields
+        log_path: JSON lines file for request records; None keeps them in memory only
+        max_sessions: Sessions with running totals; the least recently used are dropped
+        max_pending: Records buffered between flushes; the oldest are dropped beyond this
+    """
+
+    def __init__(self, prices: Dict[str, float], log_path: Optional[str] = None,
+                 max_sessions: int = 10000, max_pending: int = 10000):
+        self.prices = prices
+        self.log_path = log_path
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.requests = 0
+        self.dropped_records = 0
+        self._stages: Dict[str, TokenUsage] = {}
+        self._sessions: "OrderedDict[str, TokenUsage]" = OrderedDict()
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+
+    def record(self, session_id: Optional[str], stages: Dict[str, TokenUsage], **details: Any):
+        """
+        Account one request's API usage.
+
+        Args:
+            session_id: Session the request belongs to, if any
+            stages: Usage per stage of the request
+            **details: Extra fields stored in the request record (e.g. context_tokens)
+        """
+        if not stages:
+            return
+        request_total = total_usage(stages)
+        record = {
+            "time": time.time(),
+            "session_id": session_id,
+            "stages": {stage: usage.to_dict() for stage, usage in stages.items()},
+            "cost_usd": round(request_total.cost(self.prices), 6),
+            **details,
+        }
+        with self._lock:
+            self.requests += 1
+            for stage, usage in stages.items():
+                self._stages.setdefault(stage, TokenUsage()).add(usage)
+            if session_id:
+                session = self._sessions.get(session_id)
+                if session is None:
+                    session = self._sessions[session_id] = TokenUsage()
+                    if len(self._sessions) > self.max_sessions:
+                        self._sessions.popitem(last=False)
+                else:
+                    self._sessions.move_to_end(session_id)
+                session.add(request_total)
+            if self.log_path:
+                self._pending.append(record)
+                if len(self._pending) > self.max_pending:
+                    del self._pending[0]
+                    self.dropped_records += 1
+
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Totals of a session, or None if it has no recorded usage"""
+        with self._lock:
+            usage = self._sessions.get(session_id)
+            return usage.to_dict(self.prices) if usage else None
+
+    def get_stats(self, top_sessions: int = 10) -> Dict[str, Any]:
+        """Totals overall and per stage, plus the sessions that used the most tokens"""
+        with self._lock:
+            stages = {stage: usage.to_dict(self.prices) for stage, usage in self._stages.items()}
+            total = total_usage(self._stages).to_dict(self.prices)
+            heaviest = sorted(
+                self._sessions.items(),
+                key=lambda item: item[1].input_tokens + item[1].output_tokens,
+                reverse=True
+            )[:top_sessions]
+            return {
+                "requests": self.requests,
+                "total": total,
+                "stages": stages,
+                "top_sessions": {session_id: usage.to_dict(self.prices) for session_id, usage in heaviest},
+                "tracked_sessions": len(self._sessions),
+                "pending_records": len(self._pending),
+                "dropped_records": self.dropped_records,
+            }
+
+    def flush(self) -> int:
+        """Append buffered request records to the log file; returns how many were written"""
+        if not self.log_path:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                records, self._pending = self._pending, []
+            if not records:
+                return 0
+            directory = os.path.dirname(self.log_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            try:
+                with open(self.log_path, "a") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in records)
+            except OSError:
+                # Keep the records for the next attempt
+                with self._lock:
+                    self._pending[:0] = records
+                raise
+            return len(records)
+
+    def start_flusher(self, interval: float):
+        """Flush every `interval` seconds on a daemon thread (no-op without a log file)"""
+        if not self.log_path or self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except OSError as e:
+                    print(f"Error writing usage records: {e}")
+
+        self._flusher = threading.Thread(target=run, name="usage-flusher", daemon=True)
+        self._flusher.start()
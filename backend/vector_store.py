@@ -1,10 +1,21 @@
 import chromadb
+import hashlib
+import math
+import re
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from chromadb.config import Settings
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
 from models import Course, CourseChunk
+from executors import ExecutorSaturated, StageExecutors, run_in_stage
+from request_context import RequestCancelled
+from metrics import time_stage
+from tracing import span
 from sentence_transformers import SentenceTransformer
 
+# Embedding model name that selects the offline hashing embedder
+HASHING_EMBEDDING_MODEL = "hashing"
+
 @dataclass
 class SearchResults:
     """Container for search results with metadata"""
@@ -31,11 +42,104 @@ class SearchResults:
         """Check if results are empty"""
         return len(self.documents) == 0
 
+@dataclass
+class AdaptiveRetrieval:
+    """
+    Distance-driven result counts: retrieve a candidate pool, then keep between
+    min_results and max_results hits that clear the absolute distance cutoff,
+    stopping early at the first large jump in distance.
+    """
+    candidates: int = 15        # Pool size requested from ChromaDB
+    min_results: int = 1        # Hits to keep (if under the cutoff) before gaps may stop selection
+    max_results: int = 8        # Upper bound on hits returned
+    max_distance: float = 1.5   # Hits further than this are never returned
+    max_gap: float = 0.15       # Distance jump between consecutive hits that ends selection
+    
+    def select(self, results: SearchResults) -> SearchResults:
+        """Trim candidate results according to their distances"""
+        if results.error or not results.distances:
+            return results
+        
+        count = 0
+        for i, distance in enumerate(results.distances[:self.max_results]):
+            if distance > self.max_distance:
+                break
+            if i and count >= self.min_results and distance - results.distances[i - 1] > self.max_gap:
+                break
+            count += 1
+        
+        return self._head(results, count)
+    
+    def within_cutoff(self, results: SearchResults) -> SearchResults:
+        """
+        Drop only the hits beyond max_distance. Used for explicitly sized
+        pools (e.g. MMR candidates) where gaps and max_results shouldn't apply.
+        """
+        if results.error or not results.distances:
+            return results
+        count = sum(1 for distance in results.distances if distance <= self.max_distance)
+        return self._head(results, count)
+    
+    @staticmethod
+    def _head(results: SearchResults, count: int) -> SearchResults:
+        return SearchResults(
+            documents=results.documents[:count],
+            metadata=results.metadata[:count],
+            distances=results.distances[:count]
+        )
+
+
+class HashingEmbeddingFunction(EmbeddingFunction[Documents]):
+    """
+    Deterministic, model-free embedder based on feature hashing of word unigrams
+    and bigrams. Retrieval quality is far below a sentence transformer; it exists
+    so benchmarks and CI can exercise ChromaDB without downloading a model.
+    """
+
+    def __init__(self, dimensions: int = 384):
+        self.dimensions = dimensions
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [self._embed(text) for text in input]
+
+    def _embed(self, text: str) -> List[float]:
+        words = re.findall(r"\w+", text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = [0.0] * self.dimensions
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    @staticmethod
+    def name() -> str:
+        return "hashing"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"dimensions": self.dimensions}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "HashingEmbeddingFunction":
+        return HashingEmbeddingFunction(config.get("dimensions", 384))
+
+
 class VectorStore:
-    """Vector storage using ChromaDB for course content and metadata"""
+    """
+    Vector storage using ChromaDB for course content and metadata.
     
-    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5):
+    With `executors`, query embeddings, Chroma reads and ingestion writes run
+    in their stage's bounded pool instead of the calling thread.
+    """
+    
+    def __init__(self, chroma_path: str, embedding_model: str, max_results: int = 5,
+                 adaptive: Optional[AdaptiveRetrieval] = None,
+                 executors: Optional[StageExecutors] = None):
         self.max_results = max_results
+        self.adaptive = adaptive  # Distance-driven result counts when no explicit limit is given
+        self.executors = executors
         # Initialize ChromaDB client
         self.client = chromadb.PersistentClient(
             path=chroma_path,
@@ -43,9 +147,12 @@ class VectorStore:
         )
         
         # Set up sentence transformer embedding function
-        self.embedding_function = chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=embedding_model
-        )
+        if embedding_model == HASHING_EMBEDDING_MODEL:
+            self.embedding_function = HashingEmbeddingFunction()
+        else:
+            self.embedding_function = chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name=embedding_model
+            )
         
         # Create collections for different types of data
         self.course_catalog = self._create_collection("course_catalog")  # Course titles/instructors
@@ -58,6 +165,11 @@ class VectorStore:
             embedding_function=self.embedding_function
         )
     
+    def _embed_query(self, text: str):
+        """Embed a query in the embedding stage"""
+        with time_stage("embedding"):
+            return run_in_stage(self.executors, "embedding", self.embedding_function, [text])[0]
+    
     def search(self, 
                query: str,
                course_name: Optional[str] = None,
@@ -70,46 +182,73 @@ class VectorStore:
             query: What to search for in course content
             course_name: Optional course name/title to filter by
             lesson_number: Optional lesson number to filter by
-            limit: Maximum results to return
+            limit: Maximum results to return; adaptive selection then applies
+                only its distance cutoff
             
         Returns:
             SearchResults object with documents and metadata
         """
-        # Step 1: Resolve course name if provided
-        course_title = None
-        if course_name:
-            course_title = self._resolve_course_name(course_name)
-            if not course_title:
-                return SearchResults.empty(f"No course found matching '{course_name}'")
-        
-        # Step 2: Build filter for content search
-        filter_dict = self._build_filter(course_title, lesson_number)
-        
-        # Step 3: Search course content
-        # Use provided limit or fall back to configured max_results
-        search_limit = limit if limit is not None else self.max_results
-        
-        try:
-            results = self.course_content.query(
-                query_texts=[query],
-                n_results=search_limit,
-                where=filter_dict
-            )
-            return SearchResults.from_chroma(results)
-        except Exception as e:
-            return SearchResults.empty(f"Search error: {str(e)}")
+        with span("vector_store.search", query_chars=len(query), course_name=course_name,
+                  lesson_number=lesson_number) as search_span:
+            # Step 1: Resolve course name if provided
+            course_title = None
+            if course_name:
+                course_title = self._resolve_course_name(course_name)
+                search_span.set(resolved_course=course_title)
+                if not course_title:
+                    return SearchResults.empty(f"No course found matching '{course_name}'")
+            
+            # Step 2: Build filter for content search
+            filter_dict = self._build_filter(course_title, lesson_number)
+            
+            # Step 3: Search course content
+            # Use provided limit, the adaptive candidate pool, or configured max_results
+            if limit is not None:
+                search_limit = limit
+            elif self.adaptive:
+                search_limit = self.adaptive.candidates
+            else:
+                search_limit = self.max_results
+            
+            try:
+                embedding = self._embed_query(query)
+                with time_stage("chroma_query"):
+                    results = run_in_stage(
+                        self.executors, "search", self.course_content.query,
+                        query_embeddings=[embedding],
+                        n_results=search_limit,
+                        where=filter_dict
+                    )
+                search_results = SearchResults.from_chroma(results)
+                if self.adaptive and limit is None:
+                    search_results = self.adaptive.select(search_results)
+                elif self.adaptive:
+                    search_results = self.adaptive.within_cutoff(search_results)
+                search_span.set(results=len(search_results.documents))
+                return search_results
+            except (RequestCancelled, ExecutorSaturated):
+                # Not a search failure: the request must stop, or be shed, rather than continue
+                raise
+            except Exception as e:
+                search_span.set(error=str(e))
+                return SearchResults.empty(f"Search error: {str(e)}")
     
     def _resolve_course_name(self, course_name: str) -> Optional[str]:
         """Use vector search to find best matching course by name"""
         try:
-            results = self.course_catalog.query(
-                query_texts=[course_name],
-                n_results=1
-            )
+            embedding = self._embed_query(course_name)
+            with time_stage("resolve_course"):
+                results = run_in_stage(
+                    self.executors, "search", self.course_catalog.query,
+                    query_embeddings=[embedding],
+                    n_results=1
+                )
             
             if results['documents'][0] and results['metadatas'][0]:
                 # Return the title (which is now the ID)
                 return results['metadatas'][0][0]['title']
+        except (RequestCancelled, ExecutorSaturated):
+            raise
         except Exception as e:
             print(f"Error resolving course name: {e}")
         
@@ -147,7 +286,8 @@ class VectorStore:
                 "lesson_link": lesson.lesson_link
             })
         
-        self.course_catalog.add(
+        run_in_stage(
+            self.executors, "ingest", self.course_catalog.add,
             documents=[course_text],
             metadatas=[{
                 "title": course.title,
@@ -173,7 +313,8 @@ class VectorStore:
         # Use title with chunk index for unique IDs
         ids = [f"{chunk.course_title.replace(' ', '_')}_{chunk.chunk_index}" for chunk in chunks]
         
-        self.course_content.add(
+        run_in_stage(
+            self.executors, "ingest", self.course_content.add,
             documents=documents,
             metadatas=metadatas,
             ids=ids
@@ -237,7 +378,7 @@ class VectorStore:
         """Get course link for a given course title"""
         try:
             # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
+            results = run_in_stage(self.executors, "search", self.course_catalog.get, ids=[course_title])
             if results and 'metadatas' in results and results['metadatas']:
                 metadata = results['metadatas'][0]
                 return metadata.get('course_link')
@@ -251,7 +392,7 @@ class VectorStore:
         import json
         try:
             # Get course by ID (title is the ID)
-            results = self.course_catalog.get(ids=[course_title])
+            results = run_in_stage(self.executors, "search", self.course_catalog.get, ids=[course_title])
             if results and 'metadatas' in results and results['metadatas']:
                 metadata = results['metadatas'][0]
                 lessons_json = metadata.get('lessons_json')
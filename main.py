@@ -1,6 +1,15 @@
-def main():
-    print("Hello from starting-codebase!")
+"""
+Command line entry point: answer a JSON lines file of queries offline.
 
+See backend/bulk_query.py for the file formats and options:
+    python main.py queries.jsonl answers.jsonl --concurrency 8
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from bulk_query import main  # noqa: E402
 
 if __name__ == "__main__":
     main()